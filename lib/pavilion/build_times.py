@@ -0,0 +1,126 @@
+"""How long builds took, kept under the working_dir so that later builds can be
+scheduled longest first.
+
+Times are recorded both by build hash and by test name. A build that has been done
+before (but has since been deleted or is being rebuilt) uses its own time, and a
+new build of a known test (with a changed source or build script) uses the time of
+the last build of that test.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+TIMES_FN = 'build_times.json'
+
+MAX_ENTRIES = 5000
+"""The maximum number of build hashes (and test names) to remember. The oldest
+entries are dropped first."""
+
+BY_HASH = 'by_hash'
+BY_NAME = 'by_name'
+
+
+class BuildTimes:
+    """Recorded build durations. New times are only written when save() is
+    called, and are merged with whatever other Pavilion processes have saved."""
+
+    def __init__(self, path: Path):
+        """
+        :param path: The file to keep build times in.
+        """
+
+        self.path = path
+        self._times = self._read()
+        self._new = []  # type: List[Tuple[str, str, float, float]]
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, Dict[str, List[float]]]:
+        """Read the times from disk. Missing or broken files are just empty."""
+
+        times = {BY_HASH: {}, BY_NAME: {}}
+
+        try:
+            with self.path.open() as times_file:
+                data = json.load(times_file)
+        except (OSError, ValueError):
+            return times
+
+        if not isinstance(data, dict):
+            return times
+
+        for key in BY_HASH, BY_NAME:
+            entries = data.get(key)
+            if not isinstance(entries, dict):
+                continue
+
+            for name, entry in entries.items():
+                if (isinstance(entry, list) and len(entry) == 2
+                        and all(isinstance(val, (int, float)) for val in entry)):
+                    times[key][name] = entry
+
+        return times
+
+    def estimate(self, build_hash: str, test_name: str) -> Union[float, None]:
+        """Return how long the given build is likely to take, or None if we've never
+        seen it (or the test) before."""
+
+        with self._lock:
+            for key, name in (BY_HASH, build_hash), (BY_NAME, test_name):
+                entry = self._times[key].get(name)
+                if entry is not None:
+                    return entry[0]
+
+        return None
+
+    def record(self, build_hash: str, test_name: str, duration: float):
+        """Record how long a build took."""
+
+        now = time.time()
+        with self._lock:
+            self._new.append((build_hash, test_name, duration, now))
+            self._times[BY_HASH][build_hash] = [duration, now]
+            self._times[BY_NAME][test_name] = [duration, now]
+
+    def save(self):
+        """Merge the newly recorded times into the times file. Failures are
+        ignored; these are just scheduling hints."""
+
+        with self._lock:
+            if not self._new:
+                return
+
+            times = self._read()
+            for build_hash, test_name, duration, when in self._new:
+                times[BY_HASH][build_hash] = [duration, when]
+                times[BY_NAME][test_name] = [duration, when]
+
+            for key in BY_HASH, BY_NAME:
+                if len(times[key]) > MAX_ENTRIES:
+                    newest = sorted(times[key].items(), key=lambda item: item[1][1])
+                    times[key] = dict(newest[-MAX_ENTRIES:])
+
+            tmp_path = self.path.with_name('{}.{}.{}.tmp'.format(
+                self.path.name, os.getpid(), threading.get_ident()))
+            try:
+                with tmp_path.open('w') as tmp_file:
+                    json.dump(times, tmp_file)
+                tmp_path.rename(self.path)
+            except OSError:
+                try:
+                    tmp_path.unlink()
+                except OSError:
+                    pass
+                return
+
+            self._times = times
+            self._new = []
+
+
+def load(pav_cfg) -> BuildTimes:
+    """Load the build times for the given config's working_dir."""
+
+    return BuildTimes(pav_cfg.working_dir/TIMES_FN)
@@ -6,6 +6,7 @@ the TestBuilder class itself."""
 import glob
 import hashlib
 import io
+import json
 import os
 import shutil
 import stat
@@ -14,18 +15,50 @@ import tarfile
 import threading
 import time
 import urllib.parse
+from collections import defaultdict
 from pathlib import Path
-from typing import Union, Dict
+from typing import Any, Union, Dict, Callable
 
 import pavilion.config
 import pavilion.errors
-from pavilion import extract, lockfile, utils, wget, create_files
+from pavilion import extract, hash_cache, lockfile, source_cache, utils, wget, \
+    create_files
 from pavilion.build_tracker import BuildTracker
 from pavilion.errors import TestBuilderError, TestConfigError
 from pavilion.status_file import TestStatusFile, STATES
 from pavilion.test_config import parse_timeout
 from pavilion.test_config.spack import SpackEnvConfig
 
+
+class BuildHashCache:
+    """Shares build hashes between builders whose build inputs are identical, so
+    that a batch of tests with the same build only updates and hashes its sources
+    once. Source directory hashes are shared too, so builders with different
+    builds of the same source tree only walk it once. This should only live as
+    long as the batch of tests it's used for, as sources may change later. This is
+    thread safe."""
+
+    def __init__(self):
+        self._hashes = {}  # type: Dict[Any, Union[str, bytes]]
+        self._lock = threading.Lock()
+        self._key_locks = defaultdict(threading.Lock)
+
+    def get(self, key, create: Callable[[], Union[str, bytes]]) -> Union[str, bytes]:
+        """Return the hash for the given key, calling 'create' to make it if no
+        other builder has yet. Other builders with the same key wait for that to
+        finish rather than repeating the work."""
+
+        with self._lock:
+            key_lock = self._key_locks[key]
+
+        with key_lock:
+            build_hash = self._hashes.get(key)
+            if build_hash is None:
+                build_hash = self._hashes[key] = create()
+
+        return build_hash
+
+
 class TestBuilder:
     """Manages a test build and their organization.
 
@@ -54,7 +87,8 @@ class TestBuilder:
     def __init__(self, pav_cfg: pavilion.config.PavConfig, working_dir: Path, config: dict,
                  script: Path, status: TestStatusFile, download_dest: Path,
                  templates: Dict[Path, Path] = None,
-                 spack_config: dict = None, build_name=None):
+                 spack_config: dict = None, build_name=None,
+                 build_hashes: BuildHashCache = None):
         """Initialize the build object.
 
         :param pav_cfg: The Pavilion config object
@@ -64,6 +98,7 @@ class TestBuilder:
         :param templates: Paths to template files and their destinations.
         :param spack_config: Give a spack config to enable spack builds.
         :param build_name: The build name, if this is a build that already exists.
+        :param build_hashes: Build hashes shared with other builders.
         :raises TestBuilderError: When the builder can't be initialized.
         """
 
@@ -74,6 +109,9 @@ class TestBuilder:
         self._download_dest = download_dest
         self._templates: Dict[Path, Path] = templates or {}
         self._build_hash = None
+        self._build_hashes = build_hashes
+        # How long the build took, if this builder actually performed it.
+        self.build_duration = None  # type: Union[float, None]
 
         try:
             self._timeout = parse_timeout(config.get('timeout'))
@@ -174,10 +212,29 @@ class TestBuilder:
         """Get the cached build hash, if it exists. Otherwise,
         create it and cache it."""
         if self._build_hash is None:
-            self._build_hash = self._create_build_hash()
+            if self._build_hashes is not None:
+                self._build_hash = self._build_hashes.get(
+                    self._build_key(), self._create_build_hash)
+            else:
+                self._build_hash = self._create_build_hash()
 
         return self._build_hash
 
+    def _build_key(self) -> str:
+        """Return a key that is the same for any builders whose build hashes would
+        be the same, given the same source and extra files. Unlike the build hash,
+        this doesn't require looking at (or updating) the sources."""
+
+        hash_obj = hashlib.sha256()
+        hash_obj.update(self._hash_file(self._script_path, save=False))
+        for tmpl_src in sorted(self._templates.keys()):
+            hash_obj.update(self._hash_file(tmpl_src, save=False))
+
+        build_info = [self._config, self._spack_config, str(self._download_dest)]
+        hash_obj.update(json.dumps(build_info, sort_keys=True, default=str).encode())
+
+        return hash_obj.hexdigest()
+
     def _create_build_hash(self) -> str:
         """Turn the build config, and everything the build needs, into a hash.
         This includes the build config itself, the source tarball, and all
@@ -187,8 +244,8 @@ class TestBuilder:
         #  - The build script
         #  - The build specificity
         #  - The src archive.
-        #    - For directories, the mtime (updated to the time of the most
-        #      recently updated file) is hashed instead.
+        #    - For directories, the latest mtime in the directory is hashed
+        #      instead, unless the 'source_hash' mode is 'content'.
         #  - All of the build's 'extra_files'
         #  - All files needed to be created at build time 'create_files'
 
@@ -214,8 +271,9 @@ class TestBuilder:
                     .format(src_path))
 
         # Hash all the given template files.
+        # These are generated for each test, so there's no point in caching their hashes.
         for tmpl_src in sorted(self._templates.keys()):
-            hash_obj.update(self._hash_file(tmpl_src))
+            hash_obj.update(self._hash_file(tmpl_src, save=False))
 
         # Hash extra files.
         for extra_file in self._config.get('extra_files', []):
@@ -229,7 +287,6 @@ class TestBuilder:
             elif full_path.is_file():
                 hash_obj.update(self._hash_file(full_path))
             elif full_path.is_dir():
-                self._date_dir(full_path)
                 hash_obj.update(self._hash_dir(full_path))
             else:
                 raise TestBuilderError(
@@ -249,6 +306,9 @@ class TestBuilder:
 
         hash_obj.update(self._config.get('specificity', '').encode())
 
+        # Save any new source file hashes, all at once.
+        hash_cache.get_cache(self._pav_cfg).flush()
+
         return hash_obj.hexdigest()[:self.BUILD_HASH_BYTES*2]
 
     def name_build(self) -> str:
@@ -369,9 +429,7 @@ class TestBuilder:
                 "Could not find source '{}'".format(src_path.as_posix()))
 
         if found_src_path.is_dir():
-            # For directories, update the directories mtime to match the
-            # latest mtime in the entire directory.
-            self._date_dir(found_src_path)
+            # Directories are hashed by their latest mtime (or contents).
             return found_src_path
 
         elif found_src_path.is_file():
@@ -436,6 +494,7 @@ class TestBuilder:
                                     .format(err))
                                 return False
 
+                        start = time.time()
                         if not self._build(self.path, cancel_event, test_id, tracker):
 
                             try:
@@ -458,6 +517,8 @@ class TestBuilder:
 
                             return False
 
+                        self.build_duration = time.time() - start
+
                         try:
                             self.finished_path.touch()
                         except OSError:
@@ -691,7 +752,9 @@ class TestBuilder:
                         state=STATES.BUILDING,
                         note=("Extracting tarfile {} for build {}"
                               .format(src_path, dest)))
-                    extract_error = extract.extract_tarball(src_path, dest, umask)
+                    extract_error = self._extract(
+                        src_path, dest, umask,
+                        lambda path: extract.extract_tarball(src_path, path, umask))
                 else:
                     tracker.update(
                         state=STATES.BUILDING,
@@ -699,13 +762,17 @@ class TestBuilder:
                             "Extracting {} file {} for build {} into the "
                             "build directory."
                             .format(subtype, src_path, dest)))
-                    extract_error = extract.decompress_file(src_path, dest, subtype)
+                    extract_error = self._extract(
+                        src_path, dest, umask,
+                        lambda path: extract.decompress_file(src_path, path, subtype))
             elif category == 'application' and subtype == 'zip':
                 tracker.update(
                     state=STATES.BUILDING,
                     note=("Extracting zip file {} for build {}."
                           .format(src_path, dest)))
-                extract_error = extract.unzip_file(src_path, dest)
+                extract_error = self._extract(
+                    src_path, dest, umask,
+                    lambda path: extract.unzip_file(src_path, path))
 
             else:
                 # Finally, simply copy any other types of files into the build
@@ -772,8 +839,42 @@ class TestBuilder:
                     "Could not copy extra file '{}' to dest '{}'"
                     .format(path, dest), err)
 
+    def _extract(self, src_path: Path, dest: Path, umask: int,
+                 extract_func: Callable[[Path], Union[str, None]]) -> Union[str, None]:
+        """Extract the source archive to dest with the given extraction function,
+        going through the shared cache of extracted sources unless the build
+        has opted out.
+
+        :returns: An error message on failure, None otherwise.
+        """
+
+        if self._config.get('cache_extracted', 'True').lower() != 'true':
+            return extract_func(dest)
+
+        cache = source_cache.get_cache(self._pav_cfg)
+        key = cache.key(self._hash_file(src_path), umask)
+        return cache.extract(key, dest, umask, extract_func)
+
+    COPY_SYMLINK = 'symlink'
+    COPY_SYMLINK_DIRS = 'symlink_dirs'
+    COPY_HARDLINK = 'hardlink'
+    COPY_REFLINK = 'reflink'
+    COPY_MODES = (COPY_SYMLINK, COPY_SYMLINK_DIRS, COPY_HARDLINK, COPY_REFLINK)
+    """The ways a build can be copied into a test run (the build.copy_mode
+    option)."""
+
     def copy_build(self, dest: Path):
-        """Copy the build (using 'symlink' copying to the destination.
+        """Copy the build to the destination, according to the build's 'copy_mode'.
+        Files that match the 'copy_files' globs are always fully copied.
+
+        - symlink - Symlink every file.
+        - symlink_dirs - Symlink whole directories, unless they contain files
+          that need to be copied.
+        - hardlink - Hardlink every file.
+        - reflink - Make a reflink (copy on write) copy of every file.
+
+        Files that can't be hardlinked or reflinked (such as when the filesystem
+        doesn't support it) are symlinked instead.
 
         :param dest: Where to copy the build to.
         :raises TestBuilderError: When copy errors happen
@@ -782,6 +883,10 @@ class TestBuilder:
 
         start = time.time()
 
+        copy_mode = self._config.get('copy_mode') or self.COPY_SYMLINK
+        if copy_mode not in self.COPY_MODES:
+            raise TestBuilderError("Invalid build copy mode '{}'".format(copy_mode))
+
         do_copy = set()
         copy_globs = self._config.get('copy_files', [])
         for copy_glob in copy_globs:
@@ -799,9 +904,12 @@ class TestBuilder:
 
             do_copy.update(blob)
 
+        # Files we couldn't link the way we wanted, and the last reason why.
+        fallbacks = []
+
         def maybe_symlink_copy(src, dst):
-            """Makes a symlink from src to dst, unless the file is in
-            the list of files to do a regular copy on.
+            """Makes a symlink (or hardlink, or reflink) from src to dst, unless
+            the file is in the list of files to do a regular copy on.
             """
 
             if src in do_copy:
@@ -810,20 +918,41 @@ class TestBuilder:
                 base_mode = os.stat(cpy_path).st_mode
                 os.chmod(cpy_path, base_mode | stat.S_IWUSR | stat.S_IWGRP)
                 return cpy_path
-            else:
-                src = os.path.realpath(src)
-                return os.symlink(src, dst)
+
+            try:
+                if copy_mode == self.COPY_HARDLINK:
+                    return os.link(src, dst)
+                elif copy_mode == self.COPY_REFLINK:
+                    return utils.reflink(src, dst)
+            except OSError as err:
+                fallbacks.append(err)
+
+            src = os.path.realpath(src)
+            return os.symlink(src, dst)
 
         # Perform a symlink copy of the original build directory into our test
         # directory.
         try:
-            shutil.copytree(self.path.as_posix(),
-                            dest.as_posix(),
-                            symlinks=True,
-                            copy_function=maybe_symlink_copy)
+            if copy_mode == self.COPY_SYMLINK_DIRS:
+                # Only directories that contain files to copy need to be made.
+                make_dirs = set()
+                for copy_path in do_copy:
+                    copy_path = os.path.dirname(copy_path)
+                    while copy_path not in make_dirs and len(copy_path) > len(
+                            self.path.as_posix()):
+                        make_dirs.add(copy_path)
+                        copy_path = os.path.dirname(copy_path)
+
+                self._dir_symlink_copy(self.path.as_posix(), dest.as_posix(), make_dirs,
+                                       maybe_symlink_copy)
+            else:
+                shutil.copytree(self.path.as_posix(),
+                                dest.as_posix(),
+                                symlinks=True,
+                                copy_function=maybe_symlink_copy)
         except OSError as err:
             raise TestBuilderError(
-                "Could not perform the build directory copy".format(err))
+                "Could not perform the build directory copy: {}".format(err))
 
         # Touch the original build directory, so that we know it was used
         # recently.
@@ -836,12 +965,39 @@ class TestBuilder:
                 "Could not update timestamp on build directory '%s': %s"
                 .format(self.path, err))
 
-        self.status.set(STATES.BUILD_COPIED,
-                        "Performed symlink copy in {:0.2f}s."
-                        .format(time.time() - start))
+        note = "Performed {} copy in {:0.2f}s.".format(copy_mode, time.time() - start)
+        if fallbacks:
+            note += " {} files were symlinked instead: {}".format(
+                len(fallbacks), fallbacks[-1])
+        self.status.set(STATES.BUILD_COPIED, note)
 
         return True
 
+    @classmethod
+    def _dir_symlink_copy(cls, src: str, dst: str, make_dirs: set,
+                          copy_function: Callable[[str, str], None]):
+        """Copy the src directory to dst, symlinking whole sub-directories unless
+        they're in 'make_dirs'. Those are recursively copied in the same way.
+        Files are copied with the copy_function, and symlinks are copied as is."""
+
+        os.mkdir(dst)
+
+        with os.scandir(src) as scan:
+            for entry in scan:
+                dst_path = os.path.join(dst, entry.name)
+                if entry.is_symlink():
+                    os.symlink(os.readlink(entry.path), dst_path)
+                elif entry.is_dir():
+                    if entry.path in make_dirs:
+                        cls._dir_symlink_copy(entry.path, dst_path, make_dirs,
+                                              copy_function)
+                    else:
+                        os.symlink(os.path.realpath(entry.path), dst_path)
+                else:
+                    copy_function(entry.path, dst_path)
+
+        shutil.copystat(src, dst)
+
     def _fix_build_permissions(self, root_path):
         """The files in a build directory should never be writable, but
             directories should be. Users are thus allowed to delete build
@@ -856,19 +1012,32 @@ class TestBuilder:
         # We rely on the umask to handle most restrictions.
         # This just masks out the write bits.
         file_mask = 0o222
+        dir_bits = 0o220
+
+        def fix_dir(_, entries):
+            """Fix the permissions of everything in a directory. The walk
+            already stat'ed each entry, so only chmod what actually needs it.
+            Symlinks are skipped; what they point to is either in the build
+            (and fixed there) or not ours to change."""
 
-        for path, dirs, files in os.walk(root_path.as_posix()):
-            path = Path(path)
-            # Clear the write bits on all files
-            for file in files:
-                file_path = path/file
-                file_stat = file_path.stat()
-                file_path.chmod(file_stat.st_mode & ~file_mask)
+            for entry in entries:
+                if entry.is_link:
+                    continue
 
-            # and set them aon all directories (if needed).
-            path_mode = path.stat().st_mode
-            if (path_mode & 0o220) != 0o220:
-                path.chmod(path_mode | 0o220)
+                mode = entry.stat.st_mode
+                if entry.is_dir:
+                    # Set the write bits on all directories (if needed).
+                    if (mode & dir_bits) != dir_bits:
+                        os.chmod(entry.path, stat.S_IMODE(mode) | dir_bits)
+                elif mode & file_mask:
+                    # Clear the write bits on all files.
+                    os.chmod(entry.path, stat.S_IMODE(mode) & ~file_mask)
+
+        root_mode = root_path.stat().st_mode
+        if (root_mode & dir_bits) != dir_bits:
+            root_path.chmod(stat.S_IMODE(root_mode) | dir_bits)
+
+        utils.walk_tree(root_path, fix_dir)
 
     @classmethod
     def _hash_dict(cls, mapping):
@@ -898,36 +1067,17 @@ class TestBuilder:
     def _hash_file(self, path, save=True):
         """Hash the given file (which is assumed to exist).
         :param Path path: Path to the file to hash.
+        :param bool save: Whether to cache the hash. There's no point in caching
+            hashes for one-off files like the build script.
         """
 
-        stat_ = path.stat()
-        hash_fn = path.with_name('.' + path.name + '.hash')
-
-        # Read the has from the hashfile as long as it was created after
-        # our test source's last update.
-        if hash_fn.exists() and hash_fn.stat().st_mtime > stat_.st_mtime:
-            try:
-                with hash_fn.open('rb') as hash_file:
-                    return hash_file.read()
-            except OSError:
-                pass
-
-        hash_obj = hashlib.sha256()
-
-        with path.open('rb') as file:
-            chunk = file.read(self._BLOCK_SIZE)
-            while chunk:
-                hash_obj.update(chunk)
-                chunk = file.read(self._BLOCK_SIZE)
-
-        file_hash = hash_obj.digest()
-
-        if save:
-            # This should all be under the build lock.
-            with hash_fn.open('wb') as hash_file:
-                hash_file.write(file_hash)
-
-        return file_hash
+        try:
+            if save:
+                return hash_cache.get_cache(self._pav_cfg).file_hash(path)
+            else:
+                return hash_cache.hash_file(path)
+        except OSError as err:
+            raise TestBuilderError("Could not hash file '{}'".format(path), err)
 
     @classmethod
     def _hash_io(cls, contents):
@@ -943,17 +1093,27 @@ class TestBuilder:
 
         return hash_obj.digest()
 
-    @staticmethod
-    def _hash_dir(path):
-        """Instead of hashing the files within a directory, we just create a
-            'hash' based on it's name and mtime, assuming we've run _date_dir
-            on it before hand. This produces an arbitrary string, not a hash.
+    def _hash_dir(self, path):
+        """Hash the given directory, according to the build's 'source_hash' mode.
+        By default, this creates a 'hash' based on the directory's name and the
+        latest mtime of anything in it, which is an arbitrary string, not a hash.
         :param Path path: The path to the directory.
         :returns: The 'hash'
         """
 
-        dir_stat = path.stat()
-        return '{} {:0.5f}'.format(path, dir_stat.st_mtime).encode()
+        mode = self._config.get('source_hash') or hash_cache.MODE_MTIME
+        cache = hash_cache.get_cache(self._pav_cfg)
+
+        try:
+            if self._build_hashes is not None:
+                return self._build_hashes.get(('dir', str(path), mode),
+                                              lambda: cache.dir_hash(path, mode=mode))
+            return cache.dir_hash(path, mode=mode)
+        except OSError as err:
+            raise TestBuilderError(
+                "Could not stat file in test source dir '{}'".format(path), err)
+        except ValueError as err:
+            raise TestBuilderError("Invalid build.source_hash mode.", err)
 
     @staticmethod
     def _isurl(url):
@@ -961,29 +1121,6 @@ class TestBuilder:
         parsed = urllib.parse.urlparse(url)
         return parsed.scheme != ''
 
-    @staticmethod
-    def _date_dir(base_path):
-        """Update the mtime of the given directory or path to the the latest
-        mtime contained within.
-        :param Path base_path: The root of the path to evaluate.
-        """
-
-        src_stat = base_path.stat()
-        latest = src_stat.st_mtime
-
-        for path in utils.flat_walk(base_path):
-            try:
-                dir_stat = path.stat()
-            except OSError as err:
-                raise TestBuilderError(
-                    "Could not stat file in test source dir '{}'"
-                    .format(base_path), err)
-            if dir_stat.st_mtime > latest:
-                latest = dir_stat.st_mtime
-
-        if src_stat.st_mtime != latest:
-            os.utime(base_path.as_posix(), (src_stat.st_atime, latest))
-
     def __hash__(self):
         """Having a comparison operator breaks hashing."""
         return id(self)
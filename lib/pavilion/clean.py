@@ -7,6 +7,7 @@ from typing import List, Tuple
 from pavilion import dir_db
 from pavilion import groups
 from pavilion import lockfile
+from pavilion import parsers
 from pavilion import utils
 from pavilion.builder import TestBuilder
 from pavilion.test_run import test_run_attr_transform
@@ -153,3 +154,24 @@ def delete_lingering_build_files(pav_cfg, build_dir: Path, tests_dir: Path,
                             .format(path.name))
 
     return msgs
+
+
+def delete_template_cache(working_dir: Path) -> int:
+    """Remove the on-disk cache of compiled string templates. Only the caches of
+    users we have permission to remove are deleted.
+
+    :param working_dir: The working directory the cache is in.
+    :returns: The number of (per-user) caches removed.
+    """
+
+    cache_dir = working_dir/parsers.TEMPLATE_CACHE_DIR
+    if not cache_dir.is_dir():
+        return 0
+
+    removed = 0
+    for user_dir in cache_dir.iterdir():
+        shutil.rmtree(user_dir.as_posix(), ignore_errors=True)
+        if not user_dir.exists():
+            removed += 1
+
+    return removed
@@ -320,7 +320,7 @@ def test_list_to_paths(pav_cfg, req_tests, errfile=None) -> List[Path]:
                 output.fprint(errfile, err, color=output.YELLOW)
                 continue
 
-            test_path = test_wd/TestRun.RUN_DIR/str(_id)
+            test_path = dir_db.make_id_path(test_wd/TestRun.RUN_DIR, _id)
             test_paths.append(test_path)
             if not test_path.exists():
                 output.fprint(errfile,
@@ -411,7 +411,7 @@ def get_tests_by_paths(pav_cfg, test_paths: List[Path], errfile: TextIO,
 
         test_path = test_path.resolve()
 
-        test_wd = test_path.parents[1]
+        test_wd = dir_db.id_base_path(test_path).parent
         try:
             test_id = int(test_path.name)
         except ValueError:
@@ -1,16 +1,20 @@
 """Given a pre-existing test run, runs the test in the scheduled
 environment."""
 
+import os
+import queue
 import sys
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import List, Dict, Tuple
 import threading
-import time
 
+from pavilion import build_times
 from pavilion import result
 from pavilion import schedulers
 from pavilion import PavConfig
+from pavilion.build_tracker import BuildTracker, MultiBuildTracker
 from pavilion.errors import TestRunError, ResultError, TestBuilderError, PavilionError
 from pavilion.output import fprint
 from pavilion.status_file import STATES
@@ -78,46 +82,154 @@ class _RunCommand(Command):
 
         tests = finalized_tests
 
-        # Build any tests that are non-local builds
-        # TODO: Do this in parallel
-        built_tests = []
-        for test in tests:
-            try:
-                if not test.build_local:
-                    test.status.set(STATES.BUILDING, "Test building on an allocation.")
-                    if not test.build():
-                        test.set_run_complete()
-                        fprint(self.outfile, "Test {} build failed.".format(test.full_id))
-                        continue
-                if not test.build_only:
-                    built_tests.append(test)
-            except Exception as err:
-                test.status.set(
-                    STATES.BUILD_ERROR,
-                    "Unexpected build error: {}.".format(err))
-                test.set_run_complete()
-        tests = built_tests
+        # Tests with local builds are ready to go. Tests that build on nodes are
+        # built in parallel, and handed off to run as their builds finish.
+        ready_tests = [test for test in tests if test.build_local and not test.build_only]
+        node_builds = [test for test in tests if not test.build_local]
 
         # Bail if no tests remain
-        if not tests:
+        if not ready_tests and not node_builds:
             fprint(self.outfile, "Of the specified tests that were loaded, none need to "
                                  "(or could) run.")
             return 1
 
         msg = "Ready to run along with {} other tests.".format(len(tests))
-        mass_status_update(tests, STATES.RUN_READY, msg)
+        updates = mass_status_update(ready_tests, STATES.RUN_READY, msg,
+                                     max_threads=pav_cfg['max_threads'])
+        for test_id, err_msg in updates.failed.items():
+            fprint(self.outfile, "Could not set the status of test {}: {}"
+                   .format(test_id, err_msg))
+
+        # Build and run events (see _run_tests()) are all reported here.
+        events = queue.Queue()
+        cancel_event = threading.Event()
+        build_pool = self._start_builds(pav_cfg, node_builds, events, cancel_event)
 
         # Run test tests, and make sure they're set as complete regardless of what happens
+        run_tests = []
         try:
-            self._run_tests(pav_cfg, tests)
+            self._run_tests(ready_tests, events, len(node_builds), msg, run_tests)
         except Exception as err:
-            for test in tests:
+            for test in run_tests:
                 test.status.set(STATES.RUN_ERROR,
                                 "Unexpected error in _run command: {}".format(err))
+            # Don't start any more builds, and don't leave built tests hanging.
+            cancel_event.set()
+            build_pool.shutdown(wait=True)
+            while not events.empty():
+                event, test, built = events.get()
+                if event == self._BUILT and built and not test.build_only:
+                    test.status.set(STATES.RUN_ERROR,
+                                    "Unexpected error in _run command: {}".format(err))
+                    run_tests.append(test)
         finally:
-            for test in tests:
+            build_pool.shutdown(wait=True)
+            for test in run_tests:
                 test.set_run_complete()
 
+        if not run_tests:
+            fprint(self.outfile, "Of the specified tests that were loaded, none need to "
+                                 "(or could) run.")
+            return 1
+
+        return 0
+
+    _BUILT = 'built'
+    _RAN = 'ran'
+
+    def _start_builds(self, pav_cfg: PavConfig, tests: List[TestRun], events: queue.Queue,
+                      cancel_event: threading.Event) -> ThreadPoolExecutor:
+        """Build the given (on node) tests in parallel, limited by the number of
+        cores in our allocation. As each test finishes building, a (_BUILT, test,
+        success) event is put on the events queue.
+
+        Tests that share a build are built one after another in a single task; the
+        first performs the build and the rest just copy it. Builds share a build
+        tracker (and its build locks), and builds that took the longest last time
+        are started first.
+
+        :returns: The build thread pool, which should be shut down when done.
+        """
+
+        groups = {}  # type: Dict[str, List[TestRun]]
+        for test in tests:
+            groups.setdefault(test.builder.name, []).append(test)
+
+        try:
+            cores = len(os.sched_getaffinity(0))
+        except (AttributeError, OSError):
+            cores = os.cpu_count() or 1
+        pool = ThreadPoolExecutor(max(1, min(cores, len(groups))))
+
+        mb_tracker = MultiBuildTracker()
+        trackers = {test: mb_tracker.register(test) for test in tests}
+        # Each build gets its own cancel event, so one failed build doesn't
+        # affect the others.
+        cancel_events = {name: threading.Event() for name in groups}
+
+        times = build_times.load(pav_cfg)
+        estimates = {}
+        for name, group in groups.items():
+            estimate = times.estimate(group[0].builder.build_hash, group[0].name)
+            estimates[name] = float('inf') if estimate is None else estimate
+
+        for name in sorted(groups, key=lambda name: -estimates[name]):
+            pool.submit(self._build_group, groups[name], cancel_events[name],
+                        cancel_event, trackers, events, times)
+
+        return pool
+
+    def _build_group(self, tests: List[TestRun], build_cancel: threading.Event,
+                     cancel_event: threading.Event, trackers: Dict[TestRun, BuildTracker],
+                     events: queue.Queue, times: build_times.BuildTimes):
+        """Build the given tests, which all share a build, one after another."""
+
+        failed_by = None
+        for test in tests:
+            if failed_by is not None or cancel_event.is_set():
+                if failed_by is not None:
+                    test.status.set(
+                        STATES.BUILD_FAILED,
+                        "Build failed when being built for test {} (they share a build)."
+                        .format(failed_by))
+                else:
+                    test.status.set(STATES.ABORTED, "Build cancelled.")
+                test.set_run_complete()
+                events.put((self._BUILT, test, False))
+                continue
+
+            built = self._build(test, build_cancel, trackers[test])
+            if built and test.builder.build_duration is not None:
+                times.record(test.builder.build_hash, test.name,
+                             test.builder.build_duration)
+                times.save()
+            elif not built:
+                failed_by = test.full_id
+
+            events.put((self._BUILT, test, built))
+
+    def _build(self, test: TestRun, cancel_event: threading.Event,
+               tracker: BuildTracker) -> bool:
+        """Build a test on this node.
+
+        :returns: True if the build succeeded.
+        """
+
+        try:
+            test.status.set(STATES.BUILDING, "Test building on an allocation.")
+            if test.build(cancel_event, tracker):
+                return True
+
+            test.set_run_complete()
+            fprint(self.outfile, "Test {} build failed.".format(test.full_id))
+        except Exception as err:
+            test.status.set(
+                STATES.BUILD_ERROR,
+                "Unexpected build error: {}.".format(err))
+            test.set_run_complete()
+
+        return False
+
     def _finalize_test(self, pav_cfg: PavConfig, test: TestRun):
         # The scheduler will be the same for all tests
 
@@ -144,47 +256,63 @@ class _RunCommand(Command):
             raise TestRunError("Could not finalize test '{}'.".format(test.full_id), prior_err=err)
 
 
-    def _run_tests(self, pav_cfg, tests):
-        """Run the given tests according to their allowed concurrency."""
+    def _run_tests(self, tests: List[TestRun], events: queue.Queue, building: int,
+                   ready_msg: str, run_tests: List[TestRun]):
+        """Run the given tests according to their allowed concurrency, along with
+        those that are still building as their builds complete.
+
+        :param tests: Tests that are ready to run.
+        :param events: The queue build and test completion events arrive on.
+        :param building: The number of tests still building.
+        :param ready_msg: The status message for tests that become ready to run.
+        :param run_tests: Every test handed off to run is added to this list.
+        """
+
+        tests = list(tests)
+        run_tests.extend(tests)
 
-        # Turn this into a stack
-        tests.reverse()
+        def run(test):
+            """Run the test, and report when it's done."""
+            try:
+                self._run(test)
+            finally:
+                events.put((self._RAN, test, None))
 
         # Track our running tests by full_id
         running_tests : Dict[str, Tuple[threading.Thread, TestRun]] = {}
-        while tests or running_tests:
-            added_thread = False
-            if tests:
-                next_test = tests.pop()
-
-                # The maximum number of concurrent tests is the lowest
-                # 'concurrent' value from amongst the running tests (plus the
-                # one we're about to add).
+        while tests or running_tests or building:
+            # Start tests in order, until the next one would put us over the
+            # concurrency limit. The maximum number of concurrent tests is the
+            # lowest 'concurrent' value from amongst the running tests (plus the
+            # one we're about to add).
+            while tests:
                 next_tests = [test for _, test in running_tests.values()]
-                next_tests.append(next_test)
+                next_tests.append(tests[0])
                 conc_limit = min([test.concurrent for test in next_tests])
-                if len(running_tests) + 1 <= conc_limit:
-                    thread = threading.Thread(target=self._run, args=(next_test,))
-                    running_tests[next_test.full_id] = (thread, next_test)
-                    thread.start()
-                    added_thread = True
-                else:
-                    # The next test puts us over the limit. Wait for tests to die.
-                    tests.append(next_test)
-
-            if not added_thread: # Only wait if we didn't add a new thread/test.
-                thread_exited = False
-                while not thread_exited:
-                    for thread, test in list(running_tests.values()):
-                        # Remove any completed threads.
-                        if not thread.is_alive():
-                            thread.join()
-                            thread_exited = True
-                            test.set_run_complete()
-                            del running_tests[test.full_id]
-
-                    if not thread_exited:
-                        time.sleep(0.5)
+                if len(running_tests) + 1 > conc_limit:
+                    break
+
+                next_test = tests.pop(0)
+                thread = threading.Thread(target=run, args=(next_test,))
+                running_tests[next_test.full_id] = (thread, next_test)
+                thread.start()
+
+            if not running_tests and not building:
+                # Nothing can happen that would let the remaining tests start.
+                break
+
+            # Wait for a test to finish, or a build to complete.
+            event, test, built = events.get()
+            if event == self._RAN:
+                thread, _ = running_tests.pop(test.full_id)
+                thread.join()
+                test.set_run_complete()
+            else:
+                building -= 1
+                if built and not test.build_only:
+                    test.status.set(STATES.RUN_READY, ready_msg)
+                    tests.append(test)
+                    run_tests.append(test)
 
     @staticmethod
     def _get_sched(test):
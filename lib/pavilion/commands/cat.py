@@ -51,12 +51,13 @@ class CatCommand(Command):
                           .format(test.path.as_posix()), color=output.RED)
             return errno.EEXIST
 
-        if not test.path/args.file:
+        file = test.run_file(args.file)
+        if not file.exists():
             output.fprint(sys.stderr, "File {} does not exist for test {}."
                                       .format(args.file, test.full_id))
             return errno.EEXIST
 
-        return self.print_file(test.path / args.file)
+        return self.print_file(file)
 
     def print_file(self, file):
         """Print the file at the given path.
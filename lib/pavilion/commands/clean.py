@@ -105,6 +105,14 @@ class CleanCommand(Command):
                           color=output.GREEN, clear=True)
 
 
+        # Clean Template Caches
+        rm_caches_count = 0
+        for config_area in config_areas:
+            rm_caches_count += clean.delete_template_cache(config_area['working_dir'])
+        output.fprint(self.outfile,
+                      "Removed {} template cache(s).".format(rm_caches_count),
+                      color=output.GREEN, clear=True)
+
         deleted_groups, msgs = clean.clean_groups(pav_cfg)
         if args.verbose:
             for msg in msgs:
@@ -166,13 +166,17 @@ class LogCommand(Command):
                 output.fprint(self.errfile, "Error loading series.", err, color=output.RED)
                 return 1
 
-            file_name = test.path/self.LOG_PATHS[cmd_name]
+            if cmd_name == 'series':
+                file_name = test.path/self.LOG_PATHS[cmd_name]
+            else:
+                # This also works for test runs that have been compacted.
+                file_name = test.run_file(self.LOG_PATHS[cmd_name])
 
         # For build log, there are 4 different paths to check. This adds all the other paths
         # for the build log to the file_paths to check
         file_paths = [file_name]
         if cmd_name == 'build':
-            file_paths.append(test.path/'build/pav_build_log')
+            file_paths.append(test.run_file('build/pav_build_log'))
             file_paths.append(test.builder.log_path)
             file_paths.append(test.builder.tmp_log_path)
 
@@ -1,10 +1,19 @@
 """A command to (relatively) quickly list tests, series, and other (as yet
 undefined) bits."""
 import errno
+import os
+from pathlib import Path
+from typing import Dict
 
-from pavilion.errors import ResultError
+from pavilion.errors import ResultError, TestRunError
+from pavilion import dir_db
+from pavilion import filters
 from pavilion import output
 from pavilion import result
+from pavilion import utils
+from pavilion.groups import TestGroup
+from pavilion.jobs import Job
+from pavilion.test_run import TestRun, test_run_attr_transform, archive
 from .base_classes import Command, sub_cmd
 
 
@@ -53,6 +62,58 @@ class MaintCommand(Command):
             help="Test run ids and/or uuids to prune in the results log."
         )
 
+        layout_p = subparsers.add_parser(
+            name="migrate_layout",
+            help="Move test run directories to (or from) the sharded layout.",
+            description=(
+                "Move the test run directories in each working directory into the "
+                "sharded layout, where they're nested by the ten-thousands and "
+                "hundreds digits of their ids (test_runs/00/12/1234). This keeps "
+                "directories with a huge number of test runs fast. Links to the "
+                "moved directories (from series, jobs, and groups) are updated. "
+                "WARNING: Versions of Pavilion that predate the sharded layout "
+                "can't use the migrated working directories.")
+        )
+        layout_p.add_argument(
+            '--flat', action='store_true', default=False,
+            help="Move back to the flat layout instead."
+        )
+        layout_p.add_argument(
+            '--series', action='store_true', default=False,
+            help="Also migrate the series directories."
+        )
+        layout_p.add_argument(
+            '--label', default=None,
+            help="Only migrate the working directory of the config area with this "
+                 "label."
+        )
+
+        compact_p = subparsers.add_parser(
+            name="compact",
+            help="Pack old, completed test runs into single file archives.",
+            description=(
+                "Pack each completed test run that's older than the given time into "
+                "a single (zip) archive, to save inodes. Compacted test runs can "
+                "still be listed, loaded and read by 'pav status', 'pav log', 'pav "
+                "cat', 'pav result' and the like, but can't be re-run or have their "
+                "results re-parsed.")
+        )
+        compact_p.add_argument(
+            '--older-than', type=utils.hr_cutoff_to_ts, default='1 month',
+            help="Only compact test runs created before this time. This can be a "
+                 "partial ISO 8601 timestamp or a time period such as '2 weeks' (see "
+                 "'pav clean -h'). Default: 1 month"
+        )
+        compact_p.add_argument(
+            '--label', default=None,
+            help="Only compact test runs in the working directory of the config area "
+                 "with this label."
+        )
+        compact_p.add_argument(
+            '-v', '--verbose', action='store_true', default=False,
+            help="List each test run as it's compacted."
+        )
+
     def run(self, pav_cfg, args):
         """Find and run the given maint sub-command."""
 
@@ -80,3 +141,151 @@ class MaintCommand(Command):
                 rows=pruned,
                 title="Pruned Results"
             )
+
+    @sub_cmd()
+    def _migrate_layout_cmd(self, pav_cfg, args):
+        """Move test run (and series) directories between the flat and sharded
+        layouts."""
+
+        if args.label is not None:
+            if args.label not in pav_cfg.configs:
+                output.fprint(self.errfile, "No such config label '{}'.".format(args.label),
+                              color=output.RED)
+                return errno.EINVAL
+            config_areas = [pav_cfg.configs[args.label]]
+        else:
+            config_areas = list(pav_cfg.configs.values())
+
+        layout = 'flat' if args.flat else 'sharded'
+
+        for config_area in config_areas:
+            working_dir = config_area['working_dir']
+            id_dirs = [working_dir/'test_runs']
+            if args.series:
+                id_dirs.append(working_dir/'series')
+
+            moved = {}
+            for id_dir in id_dirs:
+                if not id_dir.exists():
+                    continue
+
+                try:
+                    moved.update(dir_db.migrate_layout(id_dir, sharded=not args.flat,
+                                                       timeout=30))
+                except (OSError, TimeoutError) as err:
+                    output.fprint(self.errfile,
+                                  "Error migrating '{}'. Re-run this command to finish."
+                                  .format(id_dir), err, color=output.RED)
+                    _relink(working_dir, moved)
+                    return errno.EIO
+
+            relinked = _relink(working_dir, moved)
+            output.fprint(self.outfile,
+                          "Moved {} directories in '{}' to the {} layout, and updated {} "
+                          "links to them.".format(len(moved), working_dir, layout, relinked))
+
+        return 0
+
+    @sub_cmd()
+    def _compact_cmd(self, pav_cfg, args):
+        """Pack old, complete test runs into run archives."""
+
+        if args.label is not None:
+            if args.label not in pav_cfg.configs:
+                output.fprint(self.errfile, "No such config label '{}'.".format(args.label),
+                              color=output.RED)
+                return errno.EINVAL
+            config_areas = [pav_cfg.configs[args.label]]
+        else:
+            config_areas = list(pav_cfg.configs.values())
+
+        filter_func = filters.make_test_run_filter(complete=True,
+                                                   older_than=args.older_than)
+
+        ret = 0
+        for config_area in config_areas:
+            working_dir = config_area['working_dir']
+            tests_dir = working_dir/TestRun.RUN_DIR
+            if not tests_dir.exists():
+                continue
+
+            paths = dir_db.select(pav_cfg, tests_dir, filter_func=filter_func,
+                                  transform=test_run_attr_transform).paths
+
+            compacted = 0
+            removed = 0
+            for path in paths:
+                if (path/archive.ARCHIVE_FN).exists():
+                    continue
+
+                try:
+                    test = TestRun.load(pav_cfg, working_dir, int(path.name), lazy=True)
+                    removed += test.compact()
+                except (TestRunError, ValueError) as err:
+                    output.fprint(self.errfile, "Could not compact test run at '{}'"
+                                  .format(path), err, color=output.YELLOW)
+                    ret = errno.EIO
+                    continue
+
+                compacted += 1
+                if args.verbose:
+                    output.fprint(self.outfile, "Compacted test run {}.".format(test.full_id))
+
+            output.fprint(self.outfile,
+                          "Compacted {} test runs in '{}', removing {} files and "
+                          "directories.".format(compacted, working_dir, removed))
+
+        return ret
+
+
+def _relink(working_dir: Path, moved: Dict[Path, Path]) -> int:
+    """Update the symlinks in the series, jobs, groups, and test run directories of
+    the given working_dir that point to moved directories.
+
+    :returns: The number of links updated.
+    """
+
+    if not moved:
+        return 0
+
+    targets = {}
+    for old_path, new_path in moved.items():
+        targets[old_path.as_posix()] = new_path
+        # Links may be made through a different (but equivalent) path.
+        targets[(old_path.parent.resolve()/old_path.name).as_posix()] = new_path
+
+    link_dirs = []
+    series_paths = dir_db.id_paths(working_dir/'series') \
+        if (working_dir/'series').exists() else []
+    for series_path in series_paths:
+        link_dirs.append(series_path)
+        link_dirs.extend((series_path/'test_sets').glob('*'))
+    link_dirs.extend((working_dir/'jobs').glob('*/' + Job.TESTS_DIR))
+    for sub_dir in TestGroup.TESTS_DIR, TestGroup.SERIES_DIR, TestGroup.EXCLUDED_DIR:
+        link_dirs.extend((working_dir/TestGroup.GROUPS_DIR).glob('*/' + sub_dir))
+    # Test runs link to their series.
+    if any(dir_db.id_base_path(path) == working_dir/'series' for path in moved.values()):
+        link_dirs.extend(dir_db.id_paths(working_dir/'test_runs'))
+
+    relinked = 0
+    for link_dir in link_dirs:
+        try:
+            with os.scandir(str(link_dir)) as scan:
+                links = [entry.path for entry in scan if entry.is_symlink()]
+        except OSError:
+            continue
+
+        for link in links:
+            try:
+                new_target = targets.get(os.readlink(link))
+                if new_target is None:
+                    continue
+
+                tmp_link = link + '.tmp'
+                os.symlink(new_target.as_posix(), tmp_link)
+                os.replace(tmp_link, link)
+            except OSError:
+                continue
+            relinked += 1
+
+    return relinked
@@ -291,6 +291,9 @@ class ResultsCommand(Command):
 
                 result_set = results[0]
                 log_path = pathlib.Path(result_set['results_log'])
+                if not log_path.exists() and len(tests) == 1:
+                    # The log is in the run archive of compacted test runs.
+                    log_path = tests[0].run_file(log_path.name)
                 output.fprint(self.outfile, "\nResult logs for test {}\n"
                               .format(result_set['name']))
                 if log_path.exists():
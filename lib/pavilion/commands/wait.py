@@ -7,6 +7,7 @@ from typing import List
 
 from pavilion import cmd_utils
 from pavilion import status_utils
+from pavilion.completion_watcher import CompletionWatcher
 from pavilion.output import fprint
 from pavilion.status_file import STATES
 from pavilion.test_run import TestRun
@@ -95,45 +96,51 @@ class WaitCommand(Command):
 
         tests = list(tests)
 
-        status_time = time.time() + self.STATUS_UPDATE_PERIOD
-        while tests and (end_time is None or time.time() < end_time):
+        with CompletionWatcher(tests) as watcher:
+            status_time = time.time() + self.STATUS_UPDATE_PERIOD
+            while tests and (end_time is None or time.time() < end_time):
 
-            for test_state in tests:
-                if test_state.complete:
+                # Wait for tests to complete until it's time to print the status again.
+                wake_time = status_time if end_time is None else min(status_time, end_time)
+                for test_state in watcher.wait(max(wake_time - time.time(), 0)):
                     done_tests.append(test_state)
                     tests.remove(test_state)
-
-            # print status every 5 seconds
-            if time.time() > status_time:
-                status_time = time.time() + self.STATUS_UPDATE_PERIOD
-
-                stats = status_utils.get_statuses(pav_cfg, all_tests)
-                stats_out = []
-
-                if out_mode == self.OUT_SILENT:
-                    pass
-                elif out_mode == self.OUT_SUMMARY:
-                    states = {}
-                    for test_state in stats:
-                        if test_state['state'] not in states.keys():
-                            states[test_state['state']] = 1
-                        else:
-                            states[test_state['state']] += 1
-                    status_counts = []
-                    for state, count in states.items():
-                        status_counts.append(state + ': ' + str(count))
-                    fprint(self.outfile, ' | '.join(status_counts), width=None, end='\r')
-                else:
-                    for test_state in stats:
-                        stat = [str(time.ctime(time.time())), ':',
-                                'test #',
-                                str(test_state['test_id']),
-                                test_state['name'],
-                                test_state['state'],
-                                test_state['note'],
-                                "\n"]
-                        stats_out.append(' '.join(stat))
-                    fprint(self.outfile, ''.join(map(str, stats_out)), width=None)
+                # Tests that were deleted out from under us won't ever finish.
+                for test_state in watcher.vanished:
+                    tests.remove(test_state)
+                watcher.vanished.clear()
+
+                # print status every 5 seconds
+                if time.time() > status_time:
+                    status_time = time.time() + self.STATUS_UPDATE_PERIOD
+
+                    stats = status_utils.get_statuses(pav_cfg, all_tests)
+                    stats_out = []
+
+                    if out_mode == self.OUT_SILENT:
+                        pass
+                    elif out_mode == self.OUT_SUMMARY:
+                        states = {}
+                        for test_state in stats:
+                            if test_state['state'] not in states.keys():
+                                states[test_state['state']] = 1
+                            else:
+                                states[test_state['state']] += 1
+                        status_counts = []
+                        for state, count in states.items():
+                            status_counts.append(state + ': ' + str(count))
+                        fprint(self.outfile, ' | '.join(status_counts), width=None, end='\r')
+                    else:
+                        for test_state in stats:
+                            stat = [str(time.ctime(time.time())), ':',
+                                    'test #',
+                                    str(test_state['test_id']),
+                                    test_state['name'],
+                                    test_state['state'],
+                                    test_state['note'],
+                                    "\n"]
+                            stats_out.append(' '.join(stat))
+                        fprint(self.outfile, ''.join(map(str, stats_out)), width=None)
 
         final_stats = status_utils.get_statuses(pav_cfg, tests)
         fprint(self.outfile, '\n')
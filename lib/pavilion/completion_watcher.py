@@ -0,0 +1,401 @@
+"""Watch test runs (or anything else with a 'path' and a 'complete' property) for
+completion.
+
+Where the kernel supports it, inotify is used to notice the completion file of each
+watched item as soon as it appears. Inotify can't see changes made from other hosts on
+network filesystems though, so the watched items are also all checked together on an
+exponential backoff schedule. That schedule backs off much further when inotify is
+watching everything on a local filesystem.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+import weakref
+from typing import List, Union, Iterable
+
+# Inotify flags, from sys/inotify.h
+IN_CREATE = 0x100
+IN_MOVED_TO = 0x80
+IN_Q_OVERFLOW = 0x4000
+WATCH_MASK = IN_CREATE | IN_MOVED_TO
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+# Filesystems where every change goes through the local kernel, and will
+# therefore be seen by inotify. Anything else is treated as remote.
+LOCAL_FILESYSTEMS = {
+    'btrfs',
+    'ext2',
+    'ext3',
+    'ext4',
+    'f2fs',
+    'jfs',
+    'overlay',
+    'reiserfs',
+    'tmpfs',
+    'xfs',
+    'zfs',
+}
+
+# Network and cluster filesystems, where other hosts can make changes that inotify
+# will never hear about. Fuse filesystems ('fuse.<name>') are always remote.
+REMOTE_FILESYSTEMS = {
+    'beegfs',
+    'ceph',
+    'cifs',
+    'gpfs',
+    'lustre',
+    'nfs',
+    'nfs4',
+    'panfs',
+    'smb3',
+}
+
+_LIBC = None
+
+
+def _get_libc() -> Union[ctypes.CDLL, None]:
+    """Load libc, and return it if it has the inotify functions."""
+
+    global _LIBC  # pylint: disable=global-statement
+
+    if _LIBC is None:
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            libc.inotify_init1.argtypes = [ctypes.c_int]
+            libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                                               ctypes.c_uint32]
+            libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        except (OSError, AttributeError):
+            libc = False
+
+        _LIBC = libc
+
+    return _LIBC or None
+
+
+def _inotify_init() -> Union[int, None]:
+    """Return a new non-blocking inotify file descriptor, or None if inotify isn't
+    available."""
+
+    libc = _get_libc()
+    if libc is None:
+        return None
+
+    inotify_fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    if inotify_fd < 0:
+        return None
+
+    return inotify_fd
+
+
+def read_mounts() -> List[tuple]:
+    """Return a list of (mount point, fs type) tuples for this host, longest mount
+    points first."""
+
+    try:
+        with open('/proc/self/mounts') as mounts_file:
+            lines = mounts_file.readlines()
+    except OSError:
+        return []
+
+    mounts = []
+    for line in lines:
+        parts = line.split()
+        if len(parts) < 3:
+            continue
+        # Mtab escapes spaces as octal.
+        mounts.append((parts[1].replace('\\040', ' '), parts[2]))
+
+    # A stable sort, so later mounts on the same mount point still take precedence
+    # when reversed.
+    mounts.reverse()
+    mounts.sort(key=lambda mnt: len(mnt[0]), reverse=True)
+    return mounts
+
+
+def is_local_fs(fstype: Union[str, None]) -> bool:
+    """Whether inotify can be trusted to see every change on the given filesystem
+    type (as returned by fs_type())."""
+
+    if fstype is None or fstype in REMOTE_FILESYSTEMS or fstype.startswith('fuse'):
+        return False
+
+    return fstype in LOCAL_FILESYSTEMS
+
+
+def fs_type(path, mounts: List[tuple] = None) -> Union[str, None]:
+    """Return the filesystem type of the given path, or None if it can't be
+    determined.
+
+    :param path: The path to check.
+    :param mounts: The mounts list from read_mounts(). Looked up if not given.
+    """
+
+    if mounts is None:
+        mounts = read_mounts()
+
+    path = os.path.realpath(str(path))
+    for mount, mnt_type in mounts:
+        if path == mount or path.startswith(mount.rstrip('/') + '/'):
+            return mnt_type
+
+    return None
+
+
+class CompletionWatcher:
+    """Wait for any of a collection of items to complete. Items must have a 'path'
+    (which is watched for changes) and a 'complete' property. If they have a
+    'COMPLETE_FN' attribute, only the creation of that file in the item's path
+    will trigger an immediate check of that item.
+
+    Completed items are returned from check() and wait(), and are no longer watched
+    after that. Items whose path disappears are dropped too, and added to the
+    'vanished' list.
+
+    Example: ::
+
+        with CompletionWatcher(tests) as watcher:
+            while len(watcher):
+                for test in watcher.wait(timeout=10):
+                    print(test.name, 'finished')
+    """
+
+    MIN_INTERVAL = 0.1
+    """The shortest time between full checks of every item."""
+    MAX_INTERVAL = 2.0
+    """The longest time between full checks when not everything is covered by
+    inotify."""
+    LOCAL_MAX_INTERVAL = 10.0
+    """The longest time between full checks when every item has a completion file
+    watched through inotify on a local filesystem."""
+
+    def __init__(self, items: Iterable = None, use_inotify: bool = True):
+        """
+        :param items: The initial items to watch.
+        :param use_inotify: Whether to use inotify, if it's available.
+        """
+
+        self._items = {}
+        self._watch_descs = {}
+        self._path_wds = {}
+        # Paths that have had relevant inotify events.
+        self._dirty = set()
+        self._all_local = True
+        self._mounts = None
+        self.vanished = []
+
+        self._interval = self.MIN_INTERVAL
+        self._next_check = 0
+
+        self._fd = _inotify_init() if use_inotify else None
+        if self._fd is not None:
+            self._finalizer = weakref.finalize(self, os.close, self._fd)
+        else:
+            self._finalizer = None
+
+        for item in items or []:
+            self.add(item)
+
+    @property
+    def uses_inotify(self) -> bool:
+        """Whether inotify is being used at all."""
+        return self._fd is not None
+
+    def add(self, item):
+        """Start watching the given item. Items that are already watched are ignored."""
+
+        path = str(item.path)
+        if path in self._items:
+            return
+
+        self._items[path] = item
+
+        watch_desc = -1
+        if self._fd is not None:
+            watch_desc = _get_libc().inotify_add_watch(self._fd, path.encode(), WATCH_MASK)
+
+        if watch_desc >= 0:
+            self._watch_descs[watch_desc] = path
+            self._path_wds[path] = watch_desc
+
+            if self._mounts is None:
+                self._mounts = read_mounts()
+            # Without a completion file, we can't be sure inotify will tell us
+            # anything useful about this item.
+            if (getattr(item, 'COMPLETE_FN', None) is None
+                    or not is_local_fs(fs_type(path, self._mounts))):
+                self._all_local = False
+        else:
+            # We'll have to poll this one.
+            self._all_local = False
+
+        # Check new items soon.
+        self._interval = self.MIN_INTERVAL
+        self._next_check = min(self._next_check, time.time() + self.MIN_INTERVAL)
+
+    def remove(self, item):
+        """Stop watching the given item."""
+
+        path = str(item.path)
+        if self._items.pop(path, None) is None:
+            return
+
+        self._dirty.discard(path)
+        watch_desc = self._path_wds.pop(path, None)
+        if watch_desc is not None:
+            del self._watch_descs[watch_desc]
+            _get_libc().inotify_rm_watch(self._fd, watch_desc)
+
+    def __len__(self):
+        return len(self._items)
+
+    def check(self) -> list:
+        """Check for completed items without waiting. Every item is checked if
+        a full check is due, otherwise only those with inotify events are.
+
+        :returns: The newly completed items.
+        """
+
+        self._read_events()
+
+        full_check = time.time() >= self._next_check
+        if full_check:
+            to_check = self._scan()
+        else:
+            to_check = [self._items[path] for path in self._dirty]
+        self._dirty.clear()
+
+        done = [item for item in to_check if item.complete]
+        for item in done:
+            self.remove(item)
+
+        if full_check:
+            if done:
+                # Items tend to complete together, so look again soon.
+                self._interval = self.MIN_INTERVAL
+            else:
+                max_interval = (self.LOCAL_MAX_INTERVAL
+                                if self._fd is not None and self._all_local
+                                else self.MAX_INTERVAL)
+                self._interval = min(self._interval * 2, max_interval)
+            self._next_check = time.time() + self._interval
+
+        return done
+
+    def _scan(self) -> list:
+        """List the directory of every watched item once, and return those that may
+        be complete; items whose completion file is in the listing, and those
+        without a completion file (which have to check for themselves). Listing the
+        directory also makes NFS refresh its cached view of it.
+
+        Items whose directory is gone are removed and added to self.vanished."""
+
+        maybe_done = []
+        for path, item in list(self._items.items()):
+            complete_fn = getattr(item, 'COMPLETE_FN', None)
+            try:
+                names = os.listdir(path)
+            except (FileNotFoundError, NotADirectoryError):
+                self.remove(item)
+                self.vanished.append(item)
+                continue
+            except OSError:
+                maybe_done.append(item)
+                continue
+
+            if complete_fn is None or complete_fn in names:
+                maybe_done.append(item)
+
+        return maybe_done
+
+    def wait(self, timeout: float = None) -> list:
+        """Wait until at least one item completes, or the timeout expires.
+
+        :param timeout: How long to wait, in seconds. None waits forever, and zero
+            checks just once.
+        :returns: The newly completed items. This is empty on timeout, or if there
+            was nothing (left) to wait for.
+        """
+
+        end = None if timeout is None else time.time() + timeout
+
+        while self._items:
+            done = self.check()
+            if done:
+                return done
+
+            now = time.time()
+            if end is not None and now >= end:
+                break
+
+            wake = self._next_check if end is None else min(self._next_check, end)
+            self._sleep(max(wake - now, 0))
+
+        return []
+
+    def close(self):
+        """Stop watching everything, and release the inotify file descriptor."""
+
+        self._items.clear()
+        self._watch_descs.clear()
+        self._path_wds.clear()
+        self._dirty.clear()
+        if self._finalizer is not None:
+            self._finalizer()
+        self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _sleep(self, duration: float):
+        """Sleep for the given duration, waking early on inotify events."""
+
+        if self._fd is None:
+            time.sleep(duration)
+        else:
+            select.select([self._fd], [], [], duration)
+
+    def _read_events(self):
+        """Read all pending inotify events, and note which items they were for."""
+
+        if self._fd is None:
+            return
+
+        while True:
+            try:
+                data = os.read(self._fd, 64*1024)
+            except OSError:
+                # Most likely just BlockingIOError, as there are no more events.
+                return
+
+            if not data:
+                return
+
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                watch_desc, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + name_len].rstrip(b'\0').decode(
+                    errors='replace')
+                offset += name_len
+
+                if mask & IN_Q_OVERFLOW:
+                    # We lost events, so check everything.
+                    self._next_check = 0
+                    continue
+
+                path = self._watch_descs.get(watch_desc)
+                if path is None:
+                    continue
+
+                complete_fn = getattr(self._items[path], 'COMPLETE_FN', None)
+                if complete_fn is None or name == complete_fn:
+                    self._dirty.add(path)
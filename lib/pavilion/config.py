@@ -199,10 +199,14 @@ class PavConfig(PavConfigDict):
         self.build_threads: int = 4
         self.max_threads: int = 8
         self.max_cpu: int = NCPU
+        self.index_backend: str = 'sqlite'
+        self.template_cache: bool = False
+        self.source_cache_size: int = 10240
         self.log_format: str = LOG_FORMAT
         self.log_level: str = 'info'
         self.result_log: OptPath = None
         self.flatten_results: bool = True
+        self.result_mmap_threshold: int = 64
         self.exception_log: OptPath = None
         self.wget_timeout: int = 5
         self.proxies: Dict[str, str] = {}
@@ -384,6 +388,27 @@ class PavilionConfigLoader(yc.YamlConfigLoader):
             help_text="Maximum number of cpus to use when spawning multiple processes. "
                       "The number used may be less depending on the task."
         ),
+        yc.StrElem(
+            "index_backend", default="sqlite", choices=['sqlite', 'pickle'],
+            help_text="How Pavilion stores its indexes of test runs (and other working_dir "
+                      "items). 'sqlite' keeps them in an SQLite database that can be "
+                      "searched and updated incrementally. 'pickle' rewrites a single "
+                      "pickle file on each update; use it if SQLite locking doesn't work "
+                      "on your working_dir filesystem."),
+        yc.BoolElem(
+            "template_cache", default=False,
+            help_text="Cache the parsed form of test config value strings in "
+                      "'<working_dir>/template_cache', so later runs of the same tests "
+                      "don't have to parse those strings again. Each user gets their "
+                      "own (size limited) cache. 'pav clean' removes it."),
+        yc.IntRangeElem(
+            "source_cache_size", default=10240, vmin=0,
+            help_text="Extracted build source archives are cached (in MiB) in "
+                      "'<working_dir>/source_cache', so new builds from the same "
+                      "archive can hardlink or reflink the extracted files instead "
+                      "of extracting it again. The least recently used sources are "
+                      "removed once the cache grows past this size. Zero disables "
+                      "the cache."),
         yc.StrElem(
             "log_format",
             default=LOG_FORMAT,
@@ -409,6 +434,12 @@ class PavilionConfigLoader(yc.YamlConfigLoader):
                       "value. Each flattened result will have a 'file' key, "
                       "and the contents of its 'per_file' data will be added "
                       "to the base results mapping."),
+        yc.IntRangeElem(
+            "result_mmap_threshold", default=64, vmin=0,
+            help_text="Result files at least this large (in MiB) are memory mapped "
+                      "rather than read into memory when parsing results that "
+                      "need to look beyond a single line (such as with the 'table' "
+                      "parser). This keeps memory use bounded for huge files."),
         ExPathElem(
             'exception_log',
             help_text="Full exception tracebacks and related debugging "
@@ -1,19 +1,36 @@
 """Manage 'id' directories. The name of the directory is an integer, which
-essentially serves as a filesystem primary key."""
+essentially serves as a filesystem primary key.
+
+Id directories normally sit directly in their parent 'id_dir'. Very large id_dirs
+can instead be sharded (see migrate_layout()), in which case each id directory is
+nested two levels deeper, by the ten-thousands and hundreds digits of its id
+(``test_runs/00/12/1234``). Sharded id_dirs are marked with a '.sharded' file; use
+make_id_path(), id_paths() and id_base_path() rather than building or parsing such
+paths by hand.
+"""
+
+# pylint: disable=too-many-lines
 
 import json
 import logging
 import math
 import os
 import pickle
+import re
 import shutil
 import tempfile
+import threading
 import time
 from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 from pathlib import Path
 from typing import Callable, List, Iterable, Any, Dict, NewType, \
-    Union, NamedTuple, IO, Tuple
+    Union, NamedTuple, IO, Tuple, Iterator
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
 
 from pavilion import lockfile
 from pavilion import output
@@ -23,9 +40,42 @@ ID_FMT = '{id:d}'
 
 PKEY_FN = 'next_id'
 
+ID_LOCK_TIMEOUT = 3
+"""How long (in seconds) to wait to get the lock for creating new id directories."""
+
 
 LOGGER = logging.getLogger(__file__)
 
+SHARDED_FN = '.sharded'
+SHARD_FMT = '{:02d}'
+MIGRATE_DIR = '.migrating'
+
+_SHARDED = {}  # type: Dict[str, bool]
+_SHARDED_LOCK = threading.Lock()
+
+
+def is_sharded(id_dir: Path, refresh: bool = False) -> bool:
+    """Return whether the given id directory uses the sharded layout. This is
+    cached, as it's checked every time an id path is made.
+
+    :param id_dir: The id directory.
+    :param refresh: Check the filesystem again, rather than using a cached answer.
+    """
+
+    key = str(id_dir)
+    with _SHARDED_LOCK:
+        sharded = None if refresh else _SHARDED.get(key)
+        if sharded is None:
+            sharded = _SHARDED[key] = (id_dir/SHARDED_FN).exists()
+
+    return sharded
+
+
+def _shard_path(base_path: Path, id_: int) -> Path:
+    """The shard directory an id would go in, in a sharded id directory."""
+
+    return base_path/SHARD_FMT.format(id_//10000)/SHARD_FMT.format(id_//100 % 100)
+
 
 def make_id_path(base_path, id_) -> Path:
     """Create the full path to an id directory given its base path and
@@ -36,9 +86,143 @@ def make_id_path(base_path, id_) -> Path:
     :rtype: Path
     """
 
+    if is_sharded(base_path):
+        return _shard_path(base_path, id_)/ID_FMT.format(id=id_)
+
     return base_path / (ID_FMT.format(id=id_))
 
 
+def id_base_path(id_path: Path) -> Path:
+    """Return the id directory that the given id path belongs to. That's just its
+    parent, unless the id directory is sharded."""
+
+    parent = id_path.parent
+    grandparent = parent.parent
+    if (parent.name.isdigit() and grandparent.name.isdigit()
+            and is_sharded(grandparent.parent)):
+        return grandparent.parent
+
+    return parent
+
+
+def id_paths(id_dir: Path) -> List[Path]:
+    """List the contents of the given id directory. For flat id directories
+    this is everything in it (id directories or not), while for sharded id
+    directories it's everything found in the shards."""
+
+    if not is_sharded(id_dir):
+        return list(id_dir.iterdir())
+
+    paths = []
+    for shard in _shard_dirs(id_dir):
+        with os.scandir(shard) as scan:
+            paths.extend(Path(entry.path) for entry in scan)
+
+    return paths
+
+
+def _shard_dirs(id_dir: Path) -> List[str]:
+    """Return the (lowest level) shard directories of a sharded id directory."""
+
+    shards = []
+    with os.scandir(id_dir.as_posix()) as top_scan:
+        for top in top_scan:
+            if not (top.name.isdigit() and top.is_dir(follow_symlinks=False)):
+                continue
+
+            with os.scandir(top.path) as scan:
+                shards.extend(entry.path for entry in scan
+                              if entry.name.isdigit() and entry.is_dir(follow_symlinks=False))
+
+    return shards
+
+
+def _dir_mtime(id_dir: Path) -> int:
+    """The latest mtime (in ns) of the id directory, or of any of its shards,
+    which changes whenever an id directory is added or removed."""
+
+    mtime = id_dir.stat().st_mtime_ns
+    if not is_sharded(id_dir):
+        return mtime
+
+    for shard in _shard_dirs(id_dir):
+        mtime = max(mtime, os.stat(shard).st_mtime_ns)
+
+    return mtime
+
+
+def migrate_layout(id_dir: Path, sharded: bool = True,
+                   timeout: float = ID_LOCK_TIMEOUT) -> Dict[Path, Path]:
+    """Move every id directory in the given id directory into the sharded layout
+    (or back to the flat layout), under the id lock. The index is keyed by id, so
+    it stays valid. Anything that links to the moved directories will need to be
+    updated; versions of Pavilion that predate sharding can't read a sharded
+    id directory.
+
+    :param id_dir: The id directory to migrate.
+    :param sharded: Whether to shard or unshard the directory.
+    :param timeout: How long to wait for the id lock.
+    :returns: A dictionary of the moved paths (old path to new path).
+    :raises OSError: When moving a directory fails. Re-running the migration will
+        pick up where it left off.
+    :raises TimeoutError: If we couldn't get the lock in time.
+    """
+
+    moved = {}
+    staging = id_dir/MIGRATE_DIR
+
+    with lockfile.LockFile(id_dir/'.lockfile', timeout=timeout):
+        was_sharded = is_sharded(id_dir, refresh=True)
+        if was_sharded == sharded and not staging.exists():
+            return moved
+
+        # Everything is moved to a staging directory first, so that flat id
+        # directories can't collide with shard directories of the same name.
+        staging.mkdir(exist_ok=True)
+        shards = _shard_dirs(id_dir) if was_sharded else []
+        orig_paths = {}
+        for old_path in id_paths(id_dir):
+            try:
+                int(old_path.name)
+            except ValueError:
+                continue
+
+            if not old_path.is_dir():
+                continue
+
+            staged_path = staging/old_path.name
+            old_path.rename(staged_path)
+            orig_paths[staged_path] = old_path
+
+        for shard in shards:
+            shard = Path(shard)
+            try:
+                shard.rmdir()
+                shard.parent.rmdir()
+            except OSError:
+                pass
+
+        if sharded:
+            (id_dir/SHARDED_FN).touch()
+        else:
+            try:
+                (id_dir/SHARDED_FN).unlink()
+            except FileNotFoundError:
+                pass
+        is_sharded(id_dir, refresh=True)
+
+        # This also picks up anything left behind by an interrupted migration.
+        for staged_path in list(staging.iterdir()):
+            new_path = make_id_path(id_dir, int(staged_path.name))
+            new_path.parent.mkdir(parents=True, exist_ok=True)
+            staged_path.rename(new_path)
+            moved[orig_paths.get(staged_path, staged_path)] = new_path
+
+        staging.rmdir()
+
+    return moved
+
+
 def reset_pkey(id_dir: Path) -> None:
     """Reset the the 'next_id' for the given directory by deleting
     the pkey file ('next_id') if present."""
@@ -53,61 +237,118 @@ def reset_pkey(id_dir: Path) -> None:
         pass
 
 
-def create_id_dir(id_dir: Path) -> (int, Path):
-    """In the given directory, create the lowest numbered (positive integer)
-    directory that doesn't already exist.
+def create_id_dir(id_dir: Path, timeout: float = ID_LOCK_TIMEOUT) -> (int, Path):
+    """In the given directory, create the next available numbered (positive integer)
+    directory.
 
     :param id_dir: Path to the directory that contains these 'id'
         directories
+    :param timeout: How long to wait for the id lock.
     :returns: The id and path to the created directory.
     :raises OSError: on directory creation failure.
     :raises TimeoutError: If we couldn't get the lock in time.
     """
 
-    lockfile_path = id_dir/'.lockfile'
-    with lockfile.LockFile(lockfile_path, timeout=1):
-        next_fn = id_dir/PKEY_FN
+    return reserve_ids(id_dir, 1, timeout=timeout)[0]
 
-        next_valid = True
 
-        if next_fn.exists():
-            try:
-                with next_fn.open() as next_file:
-                    next_id = int(next_file.read())
+def reserve_ids(id_dir: Path, count: int,
+                timeout: float = ID_LOCK_TIMEOUT) -> List[Tuple[int, Path]]:
+    """Create 'count' new id directories in the given directory, all under a single
+    acquisition of the id lock. The ids will be contiguous unless some other id
+    directory is in the way.
 
-                next_id_path = make_id_path(id_dir, next_id)
+    The next free id is kept in the 'next_id' file. When that's missing or stale,
+    the next free id is found by probing for id directories rather than listing
+    the whole directory.
 
-                if next_id_path.exists():
-                    next_valid = False
+    Id directories that end up not being used should be given back with
+    release_ids().
 
-            except (OSError, ValueError):
-                # In either case, on failure, invalidate the next file.
-                next_valid = False
-        else:
-            next_valid = False
+    :param id_dir: Path to the directory that contains these 'id' directories.
+    :param count: The number of ids to reserve.
+    :param timeout: How long to wait for the id lock.
+    :returns: A list of (id, path) tuples, in id order.
+    :raises OSError: on directory creation failure.
+    :raises TimeoutError: If we couldn't get the lock in time.
+    """
 
-        if not next_valid:
-            # If the next file's id wasn't valid, then find the next available
-            # id directory the hard way.
+    reserved = []
+    if count <= 0:
+        return reserved
 
-            ids = list(os.listdir(str(id_dir)))
-            # Only return the test directories that could be integers.
-            ids = [id_ for id_ in ids if id_.isdigit()]
-            ids = [int(id_) for id_ in ids]
-            ids.sort()
+    lockfile_path = id_dir/'.lockfile'
+    with lockfile.LockFile(lockfile_path, timeout=timeout):
+        # The layout may have been migrated since we last checked.
+        sharded = is_sharded(id_dir, refresh=True)
+        next_fn = id_dir/PKEY_FN
 
-            # Find the first unused id.
+        try:
+            with next_fn.open() as next_file:
+                next_id = max(int(next_file.read()), 1)
+        except (OSError, ValueError):
+            # On failure, just start looking from the beginning.
             next_id = 1
-            while next_id in ids:
+
+        next_id = _find_free_id(id_dir, next_id)
+
+        try:
+            while len(reserved) < count:
+                next_id_path = make_id_path(id_dir, next_id)
+                if sharded:
+                    next_id_path.parent.mkdir(parents=True, exist_ok=True)
+                try:
+                    next_id_path.mkdir()
+                except FileExistsError:
+                    next_id = _find_free_id(id_dir, next_id)
+                    continue
+
+                reserved.append((next_id, next_id_path))
                 next_id += 1
+        finally:
+            if reserved:
+                with next_fn.open('w') as next_file:
+                    next_file.write(str(next_id))
+
+    return reserved
+
+
+def _find_free_id(id_dir: Path, start: int) -> int:
+    """Find an unused id at or after 'start'. Ids are assumed to be mostly in use up
+    to some point and mostly free after it, so this gallops forward to find a free
+    id and then binary searches back to the first free id after the last one in use.
+    This only takes a logarithmic number of checks, even in huge directories."""
+
+    if not make_id_path(id_dir, start).exists():
+        return start
+
+    # The highest id known to be in use, and the lowest id (after it) known to be free.
+    used = start
+    step = 1
+    while make_id_path(id_dir, used + step).exists():
+        used += step
+        step *= 2
+    free = used + step
+
+    while free - used > 1:
+        mid = (used + free)//2
+        if make_id_path(id_dir, mid).exists():
+            used = mid
+        else:
+            free = mid
+
+    return free
 
-            next_id_path = make_id_path(id_dir, next_id)
 
-        next_id_path.mkdir()
-        with next_fn.open('w') as next_file:
-            next_file.write(str(next_id + 1))
+def release_ids(reserved: Iterable[Tuple[int, Path]]) -> None:
+    """Remove the (still empty) id directories from a reserve_ids() call that
+    weren't used. Directories that have been used (aren't empty) are left alone."""
 
-        return next_id, next_id_path
+    for _, id_path in reserved:
+        try:
+            id_path.rmdir()
+        except OSError:
+            pass
 
 
 def default_filter(_: Path) -> bool:
@@ -118,62 +359,442 @@ def default_filter(_: Path) -> bool:
 
 Index = NewType("Index", Dict[int, Dict['str', Any]])
 
+IndexFilter = NamedTuple("IndexFilter", [('column', str), ('op', str), ('value', Any)])
+IndexFilter.__doc__ = """A filter condition that an index backend may apply directly. Filter
+functions can carry a list of these as their ``index_filters`` attribute. They
+only ever pre-filter; the filter function itself is always still applied."""
+
+INDEX_BACKENDS = ('sqlite', 'pickle')
+INDEX_DIR = '.index'
+
+# Entries modified more recently than this (in seconds) are always re-transformed, as
+# their mtime may not yet reflect every change (coarse filesystem timestamps).
+RACY_MTIME_WINDOW = 2
+
 
 def identity(value):
     """Because lambdas can't be pickled."""
     return value
 
 
-def index(pav_cfg,
-          id_dir: Path, idx_name: str,
-          transform: Callable[[Path], Dict[str, Any]],
-          complete_key: str = 'complete',
-          refresh_period: int = 1,
-          verbose: IO[str] = None,
-          fn_base: int = 10) -> Index:
-    """Load and/or update an index of the given directory for the given
-    transform, and return it. The returned index is a dictionary by id of
-    the transformed data.
+class IndexBackend:
+    """Storage for a dir_db index. Each backend holds the transformed data for
+    each id directory, whether that record is complete, and (optionally) the
+    mtime of the directory when it was transformed. Backends are used as
+    context managers.
+
+    Index files are kept in a subdirectory of the id_dir, so that writing them
+    doesn't change the mtime of the id_dir itself.
+
+    :ivar Path path: The path to the index file.
+    :ivar tuple columns: Data keys the backend can filter and order on directly.
+    """
+
+    SUFFIX = None
+    TRACKS_MTIME = False
+
+    def __init__(self, id_dir: Path, idx_name: str, complete_key: str = 'complete',
+                 columns: Iterable[str] = ()):
+        self.id_dir = id_dir
+        self.path = (id_dir/INDEX_DIR/idx_name).with_suffix(self.SUFFIX)
+        try:
+            self.path.parent.mkdir(exist_ok=True)
+        except OSError:
+            pass
+        self.complete_key = complete_key
+        self.columns = tuple(col for col in columns if col != complete_key)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Release any resources held by the backend."""
+
+    def load(self) -> Index:
+        """Return the full index."""
+
+        raise NotImplementedError
+
+    def entries(self) -> Dict[int, Tuple[bool, Union[int, None]]]:
+        """Return a dict of (complete, mtime) tuples for every indexed id. The
+        mtime is None when not tracked."""
+
+        return {id_: (bool(data.get(self.complete_key)), None)
+                for id_, data in self.load().items()}
+
+    def last_refresh(self) -> Union[int, None]:
+        """Return when (in ns since the epoch) the index was last brought up to
+        date, or None if unknown."""
+
+        raise NotImplementedError
+
+    def update(self, records: Dict[int, Tuple[Dict[str, Any], Union[int, None]]],
+               removed: Iterable[int], refresh_time: int) -> None:
+        """Add/replace the given records (by id, a tuple of data and mtime),
+        and remove the given ids. The refresh_time (ns since the epoch) is when
+        the scan that produced these changes started."""
+
+        raise NotImplementedError
+
+    def can_order(self, key: str) -> bool:
+        """Whether the backend can order query results by the given key."""
+
+        _ = self, key
+
+        return False
+
+    def query(self, filters: List[IndexFilter] = None, order_key: str = None,
+              order_asc: bool = True) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Iterate over (id, data) pairs. The given filters may be used to
+        pre-filter results, and results are ordered by order_key if
+        ``can_order(order_key)``."""
+
+        _ = filters, order_key, order_asc
+
+        return iter(self.load().items())
+
+
+class PickleIndex(IndexBackend):
+    """The original index format; the whole index is pickled to a single file that
+    is rewritten whenever it changes. The mtime of that file records when the
+    index was last refreshed."""
+
+    SUFFIX = '.pkl'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self._idx = None
+        self._loaded = False
+
+    def load(self) -> Index:
+        """Load the pickled index. Any errors cause the index to be regenerated
+        from scratch."""
+
+        if self._idx is not None:
+            return self._idx
+
+        self._idx = Index({})
+        if self.path.exists():
+            try:
+                with self.path.open('rb') as idx_file:
+                    self._idx = pickle.load(idx_file)
+                self._loaded = True
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError,
+                    ValueError):
+                pass
+
+        return self._idx
+
+    def last_refresh(self) -> Union[int, None]:
+        """The mtime of the index file, as long as it could be loaded."""
+
+        self.load()
+        if not self._loaded:
+            return None
+
+        try:
+            return self.path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def update(self, records, removed, refresh_time) -> None:
+        """Update the index, and write it back out if anything changed."""
+
+        idx = self.load()
+
+        changed = not self._loaded
+        for id_, (data, _) in records.items():
+            if idx.get(id_) != data:
+                idx[id_] = data
+                changed = True
+
+        for id_ in removed:
+            if idx.pop(id_, None) is not None:
+                changed = True
+
+        if not changed:
+            try:
+                os.utime(self.path.as_posix(), ns=(refresh_time, refresh_time))
+            except OSError:
+                pass
+            return
+
+        tmp_path = Path(tempfile.mktemp(
+            suffix='.dbtmp',
+            dir=self.path.parent.as_posix()))
+        try:
+            with tmp_path.open('wb') as tmp_file:
+                pickle.dump(idx, tmp_file)
+            os.utime(tmp_path.as_posix(), ns=(refresh_time, refresh_time))
+            tmp_path.rename(self.path)
+            self._loaded = True
+        except OSError:
+            return
+        except (Exception, KeyboardInterrupt) as err:
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+            raise err
+
+
+class SQLiteIndex(IndexBackend):
+    """An index kept in an SQLite database, with a real (indexed)
+    column for each of the backend's columns. Filters and ordering on those columns
+    are performed by SQLite, and updates only touch the rows that changed.
+
+    Multiple processes may use the database at once; SQLite handles the locking.
+    The database uses SQLite's default rollback journal, since WAL mode relies on
+    shared memory that doesn't work across the hosts of a network filesystem.
+
+    The last refresh time is kept as the mtime of a separate stamp file, so that
+    refreshes that find nothing new don't have to write to the database.
+    """
+
+    SUFFIX = '.db'
+    STAMP_SUFFIX = '.refresh'
+    TRACKS_MTIME = True
+
+    TABLE = 'entries'
+    COLUMN_RE = re.compile(r'^[a-z_][a-z0-9_]*$')
+    # Bump this when the table layout (other than the data columns) changes.
+    SCHEMA_VERSION = 3
+    # How long to wait on a locked database.
+    TIMEOUT = 30
+
+    FILTER_OPS = ('=', '!=', '<', '<=', '>', '>=', 'glob')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        for col in self.columns + (self.complete_key,):
+            if not self.COLUMN_RE.match(col):
+                raise ValueError("Invalid index column name '{}'".format(col))
+
+        self._stamp_path = self.path.with_suffix(self.STAMP_SUFFIX)
+        self._conn = sqlite3.connect(self.path.as_posix(), timeout=self.TIMEOUT,
+                                     isolation_level=None)
+        try:
+            self._setup()
+        except sqlite3.Error:
+            self._conn.close()
+            raise
+
+    def _setup(self):
+        """Make sure the database has the expected table layout, recreating it
+        if not."""
+
+        columns = ['id', 'mtime', 'data', self.complete_key] + list(self.columns)
+
+        version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+        found = [row[1] for row in
+                 self._conn.execute('PRAGMA table_info({})'.format(self.TABLE))]
+
+        if found == columns and version == self.SCHEMA_VERSION:
+            return
+
+        # The new table starts empty, so it was never refreshed.
+        try:
+            self._stamp_path.unlink()
+        except OSError:
+            pass
+
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._conn.execute('DROP TABLE IF EXISTS {}'.format(self.TABLE))
+            col_defs = ['"{}"'.format(col) for col in columns[3:]]
+            self._conn.execute(
+                'CREATE TABLE {} (id INTEGER PRIMARY KEY, mtime INTEGER, data TEXT, {})'
+                .format(self.TABLE, ', '.join(col_defs)))
+            for col in columns[3:]:
+                self._conn.execute('CREATE INDEX "{table}_{col}" ON {table} ("{col}")'
+                                   .format(table=self.TABLE, col=col))
+            self._conn.execute('PRAGMA user_version={:d}'.format(self.SCHEMA_VERSION))
+            self._conn.execute('COMMIT')
+        except sqlite3.Error:
+            self._conn.execute('ROLLBACK')
+            raise
+
+        # Older versions of Pavilion pickled the index directly into the id_dir.
+        try:
+            (self.id_dir/self.path.name).with_suffix(PickleIndex.SUFFIX).unlink()
+        except OSError:
+            pass
+
+    def close(self):
+        """Close the database connection."""
+
+        self._conn.close()
+
+    def load(self) -> Index:
+        """Return the full index."""
+
+        return Index(dict(self.query()))
+
+    def entries(self):
+        """Return the complete status and mtime for every row."""
+
+        rows = self._conn.execute('SELECT id, "{}", mtime FROM {}'
+                                  .format(self.complete_key, self.TABLE))
+
+        return {id_: (bool(complete), mtime) for id_, complete, mtime in rows}
+
+    @staticmethod
+    def _col_value(value):
+        """Convert a data value into something SQLite can store in a column."""
+
+        if value is None or isinstance(value, (str, int, float)):
+            return value
+
+        return str(value)
+
+    def last_refresh(self) -> Union[int, None]:
+        """Return the refresh time recorded by the last update (the mtime of the
+        stamp file)."""
+
+        try:
+            return self._stamp_path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def update(self, records, removed, refresh_time) -> None:
+        """Add/replace and remove rows in a single transaction, then record the
+        refresh time. If there's nothing to change, the database isn't written
+        to at all; only the stamp file is touched."""
+
+        col_names = [self.complete_key] + list(self.columns)
+        insert = ('INSERT OR REPLACE INTO {} (id, mtime, data, {}) VALUES ({})'
+                  .format(self.TABLE, ', '.join('"{}"'.format(col) for col in col_names),
+                          ', '.join('?' * (len(col_names) + 3))))
+
+        rows = []
+        for id_, (data, mtime) in records.items():
+            try:
+                json_data = json.dumps(data)
+            except (TypeError, ValueError):
+                continue
+
+            row = [id_, mtime, json_data, bool(data.get(self.complete_key))]
+            row.extend(self._col_value(data.get(col)) for col in self.columns)
+            rows.append(row)
+
+        removed = [(id_,) for id_ in removed]
+        if rows or removed:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.executemany(insert, rows)
+                self._conn.executemany('DELETE FROM {} WHERE id = ?'.format(self.TABLE),
+                                       removed)
+                self._conn.execute('COMMIT')
+            except sqlite3.Error:
+                self._conn.execute('ROLLBACK')
+                raise
+
+        # Failing to record the refresh just means we'll check again next time.
+        try:
+            self._stamp_path.touch()
+            os.utime(self._stamp_path.as_posix(), ns=(refresh_time, refresh_time))
+        except OSError:
+            pass
+
+    def can_order(self, key: str) -> bool:
+        """We can order by any indexed column."""
+
+        return key in self.columns or key == self.complete_key
+
+    def query(self, filters: List[IndexFilter] = None, order_key: str = None,
+              order_asc: bool = True) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Query the database, applying any filters on known columns."""
+
+        where = []
+        params = []
+        for col, oper, value in filters or []:
+            if not self.can_order(col) or oper not in self.FILTER_OPS:
+                continue
+
+            if oper == 'glob':
+                # Translate fnmatch style negation into the SQLite form.
+                value = value.replace('[!', '[^')
+
+            where.append('"{}" {} ?'.format(col, oper.upper()))
+            params.append(self._col_value(value))
+
+        order = ''
+        if order_key is not None and self.can_order(order_key):
+            where.append('"{}" IS NOT NULL'.format(order_key))
+            order = ' ORDER BY "{}" {}, id'.format(order_key, 'ASC' if order_asc else 'DESC')
+
+        query = 'SELECT id, data FROM {}'.format(self.TABLE)
+        if where:
+            query += ' WHERE ' + ' AND '.join(where)
+        query += order
+
+        for id_, data in self._conn.execute(query, params):
+            yield id_, json.loads(data)
+
+
+def open_index(pav_cfg, id_dir: Path, idx_name: str, complete_key: str = 'complete',
+               columns: Iterable[str] = (), verbose: IO[str] = None) -> IndexBackend:
+    """Open the index of the given name for id_dir, using the backend given by the
+    'index_backend' pavilion config option. If an SQLite index can't be used, the
+    pickle backend is used instead.
 
     :param pav_cfg: The pavilion config.
     :param id_dir: The directory to index.
     :param idx_name: The name of the index.
-    :param transform: A transformation function that produces a json
-        compatible dictionary.
-    :param complete_key: The key in the transformed dictionary that marks a
-        record as complete. If not given, the record is always assumed to be
-        complete. Incomplete records are recompiled every time the index is
-        updated (hopefully they will be complete eventually).
-    :param refresh_period: Only update the index if this much time (in seconds)
-        has passed since the last update.
-    :param verbose: Print status information during indexing.
-    :param fn_base: The integer base for dir_db.
+    :param complete_key: The key in the transformed data that marks a record complete.
+    :param columns: Data keys that should be directly filterable/orderable, if the
+        backend supports it.
+    :param verbose: Where to print status information.
     """
 
-    idx_path = (id_dir/idx_name).with_suffix('.pkl')
-
-    idx = Index({})
+    backend = pav_cfg.get('index_backend', 'sqlite')
 
-    # Open and read the index if it exists. Any errors cause the index to
-    # regenerate from scratch.
-    idx_mtime = 0
-    if idx_path.exists():
+    if backend == 'sqlite' and sqlite3 is not None:
         try:
-            with idx_path.open('rb') as idx_file:
-                idx = pickle.load(idx_file)
-        except (OSError, PermissionError, json.JSONDecodeError) as err:
-            # In either error case, start from scratch.
-            output.fprint(verbose, "Error reading index at '{}'. Regenerating from "
-                                   "scratch.".format(idx_path.as_posix()), err,
-                          color=output.GRAY)
+            return SQLiteIndex(id_dir, idx_name, complete_key, columns)
+        except (sqlite3.Error, OSError) as err:
+            if verbose is not None:
+                output.fprint(verbose, "Could not use the sqlite index at '{}', falling "
+                                       "back to the pickle index."
+                              .format(id_dir/idx_name), err, color=output.GRAY)
 
-    if not id_dir.exists():
-        return idx
+    return PickleIndex(id_dir, idx_name, complete_key, columns)
+
+
+def _update_index(pav_cfg, backend: IndexBackend, id_dir: Path,
+                  transform: Callable[[Path], Dict[str, Any]],
+                  fn_base: int = 10, refresh_period: int = 1) -> None:
+    """Bring the index up-to-date with the contents of id_dir. Complete records
+    are never updated (unless the transform's ``index_recheck_complete`` is set),
+    and other records are only re-transformed when their mtime has changed (when
+    the backend tracks that).
+
+    The id_dir itself is only rescanned when its mtime shows that entries were
+    added or removed since the last refresh. When that's not the case and the last
+    refresh was less than refresh_period seconds ago, nothing is checked at all."""
+
+    scan_start = time.time_ns()
+    racy_ns = RACY_MTIME_WINDOW * 10**9
+
+    last_refresh = backend.last_refresh()
+    try:
+        dir_mtime = _dir_mtime(id_dir)
+    except OSError:
+        return
+
+    # Entry names can only be reconstructed from their ids in base 10.
+    dir_changed = (last_refresh is None or fn_base != 10
+                   or dir_mtime >= last_refresh - racy_ns)
 
-    if idx and time.time() - idx_mtime <= refresh_period:
-        return idx
+    if not dir_changed and 0 <= scan_start - last_refresh < refresh_period * 10**9:
+        return
 
-    files = [file.path for file in os.scandir(id_dir.as_posix())]
+    entries = backend.entries()
 
     def make_int_ids(paths: List[Path]) -> List[Tuple[int, Path]]:
         """Convert an filename to an integer if we can."""
@@ -190,68 +811,129 @@ def index(pav_cfg,
 
         return id_results
 
-    def do_transform(pair):
-        """Do the transform on the id and file pair."""
+    get_mtime = getattr(transform, 'index_mtime', None) or (
+        lambda path: path.stat().st_mtime_ns)
+    # Without tracked mtimes, rechecking complete records would mean
+    # re-transforming every one of them.
+    recheck_complete = (backend.TRACKS_MTIME
+                        and getattr(transform, 'index_recheck_complete', False))
 
-        tid, file = pair
+    def do_transform(item):
+        """Do the transform on the id and file pair, if it has changed. Returns
+        the id, the data (or None), and the directory mtime."""
+
+        tid, file, old_mtime = item
+
+        mtime = None
+        if backend.TRACKS_MTIME:
+            try:
+                mtime = get_mtime(file)
+            except OSError:
+                return tid, None, None
+
+            if old_mtime is not None and mtime == old_mtime:
+                return tid, None, None
+
+            if scan_start - mtime < racy_ns:
+                mtime = None
 
         try:
-            return tid, transform(file)
+            return tid, transform(file), mtime
         except (ValueError, KeyError, TypeError, OSError):
-            return tid, None
+            return tid, None, None
 
     thread_max = pav_cfg.get('max_threads')
     with ThreadPoolExecutor(max_workers=thread_max) as pool:
-        # This sequence leaves us with a list of id, path pairs that need an index
-        # update.
-        chunk_size = int(math.ceil(len(files)/float(thread_max)))
-        chunks = [files[i*chunk_size:(i+1)*chunk_size] for i in range(thread_max)]
-
-        id_pairs = pool.map(make_int_ids, chunks)
-        # Grab the set of all ids. We'll use it to identify missing ids.
-        all_seen_ids = set()
-        update_id_pairs = []
-        for chunked_results in id_pairs:
-            for id_, path in chunked_results:
-                if id_ is None:
-                    continue
+        missing = set()
+        update_items = []
+
+        if dir_changed:
+            if is_sharded(id_dir):
+                files = [path.as_posix() for path in id_paths(id_dir)]
+            else:
+                files = [file.path for file in os.scandir(id_dir.as_posix())]
+
+            # This sequence leaves us with a list of id, path pairs that need an index
+            # update.
+            chunk_size = int(math.ceil(len(files)/float(thread_max)))
+            chunks = [files[i*chunk_size:(i+1)*chunk_size] for i in range(thread_max)]
+
+            id_pairs = pool.map(make_int_ids, chunks)
+            # Grab the set of all ids. We'll use it to identify missing ids.
+            all_seen_ids = set()
+            for chunked_results in id_pairs:
+                for id_, path in chunked_results:
+                    if id_ is None:
+                        continue
+
+                    all_seen_ids.add(id_)
+
+                    complete, mtime = entries.get(id_, (False, None))
+                    if complete and not recheck_complete:
+                        continue
+                    update_items.append((id_, path, mtime))
+
+            missing = set(entries.keys()) - all_seen_ids
+        else:
+            # No entries were added or removed, so only the existing ones need
+            # to be checked.
+            for id_, (complete, mtime) in entries.items():
+                if not complete or recheck_complete:
+                    update_items.append((id_, make_id_path(id_dir, id_), mtime))
 
-                all_seen_ids.add(id_)
+        transformed_data = pool.map(do_transform, update_items)
 
-                if id_ in idx and idx[id_].get(complete_key, False):
-                    continue
-                update_id_pairs.append((id_, path))
+        records = {id_: (data, mtime) for id_, data, mtime in transformed_data
+                   if data is not None}
 
-        missing = set(idx.keys()) - all_seen_ids
+    backend.update(records, missing, scan_start)
 
-        transformed_data = pool.map(do_transform, update_id_pairs)
 
-    for id_, data in transformed_data:
-        if data is None:
-            continue
+def index(pav_cfg,
+          id_dir: Path, idx_name: str,
+          transform: Callable[[Path], Dict[str, Any]],
+          complete_key: str = 'complete',
+          refresh_period: int = 1,
+          verbose: IO[str] = None,
+          fn_base: int = 10) -> Index:
+    """Load and/or update an index of the given directory for the given
+    transform, and return it. The returned index is a dictionary by id of
+    the transformed data.
 
-        idx[id_] = data
+    The transform may have an ``index_columns`` attribute listing the data keys
+    that the index backend should make directly searchable. It may also have an
+    ``index_mtime`` attribute; a function that gives the mtime (in ns) used to
+    decide whether an incomplete record has changed, for when some of the
+    transformed data comes from files whose changes don't touch the directory
+    mtime. If the transform's ``index_recheck_complete`` attribute is True,
+    complete records are checked against that mtime too, rather than never being
+    updated (this only applies to backends that track mtimes).
 
-    for id_ in missing:
-        del idx[id_]
+    :param pav_cfg: The pavilion config.
+    :param id_dir: The directory to index.
+    :param idx_name: The name of the index.
+    :param transform: A transformation function that produces a json
+        compatible dictionary.
+    :param complete_key: The key in the transformed dictionary that marks a
+        record as complete. If not given, the record is always assumed to be
+        complete. Incomplete records are recompiled whenever their directory
+        changes (hopefully they will be complete eventually).
+    :param refresh_period: Unless entries were added or removed, only re-check
+        incomplete records if this much time (in seconds) has passed since the
+        last update.
+    :param verbose: Print status information during indexing.
+    :param fn_base: The integer base for dir_db.
+    """
 
-    tmp_path = Path(tempfile.mktemp(
-        suffix='.dbtmp',
-        dir=idx_path.parent.as_posix()))
-    try:
-        with tmp_path.open('wb') as tmp_file:
-            pickle.dump(idx, tmp_file)
-        tmp_path.rename(idx_path)
-    except OSError:
-        return idx
-    except (Exception, KeyboardInterrupt) as err:
-        try:
-            tmp_path.unlink()
-        except OSError:
-            pass
-        raise err
+    if not id_dir.exists():
+        return Index({})
 
-    return idx
+    with open_index(pav_cfg, id_dir, idx_name, complete_key,
+                    columns=getattr(transform, 'index_columns', ()),
+                    verbose=verbose) as backend:
+        _update_index(pav_cfg, backend, id_dir, transform, fn_base=fn_base,
+                      refresh_period=refresh_period)
+        return backend.load()
 
 
 SelectItems = NamedTuple("SelectItems", [('data', List[Dict[str, Any]]),
@@ -302,6 +984,7 @@ def select(pav_cfg,
            order_asc: bool = True,
            fn_base: int = 10,
            idx_complete_key: 'str' = 'complete',
+           idx_refresh_period: int = 1,
            use_index: Union[bool, str] = True,
            verbose: IO[str] = None,
            limit: int = None) -> (List[Any], List[Path]):
@@ -323,9 +1006,14 @@ def select(pav_cfg,
     :param use_index: The name of (and whether to use) an index. When this is
         the literal 'True', the index name is pulled from the transform
         function name. A string can also be given to manually specify the name.
+        When using an index, the filter function may have an 'index_filters'
+        attribute (a list of IndexFilter), and the order function an 'index_key'
+        attribute (the data key it orders by). These let the index backend
+        do the filtering and ordering where it can.
     :param idx_complete_key: The key used to identify directories as 'complete'
         for indexing purposes. Incomplete directories will be re-indexed until
         complete.
+    :param idx_refresh_period: As per the 'refresh_period' argument of index().
     :param fn_base: Number base for file names. 10 by default, ensure dir name
         is a valid integer.
     :param limit: The max items to return. None denotes return all.
@@ -346,22 +1034,36 @@ def select(pav_cfg,
                 "You must provide an index name using the 'use_index' "
                 "parameter when using a lambda function as the transform.")
 
-        selected = []
+        if not id_dir.exists():
+            return SelectItems([], [])
 
-        idx = index(pav_cfg, id_dir, index_name, transform,
-                    complete_key=idx_complete_key, verbose=verbose)
-        for id_, data in idx.items():
-            path = make_id_path(id_dir, id_)
+        index_filters = getattr(filter_func, 'index_filters', [])
+        order_key = getattr(order_func, 'index_key', None)
 
-            if order_func is not None and order_func(data) is None:
-                continue
+        selected = []
+        with open_index(pav_cfg, id_dir, index_name, idx_complete_key,
+                        columns=getattr(transform, 'index_columns', ()),
+                        verbose=verbose) as backend:
+            _update_index(pav_cfg, backend, id_dir, transform, fn_base=fn_base,
+                          refresh_period=idx_refresh_period)
+
+            # When the backend does the ordering, we can stop once we hit the limit.
+            ordered = order_func is None or (order_key is not None
+                                             and backend.can_order(order_key))
+
+            for id_, data in backend.query(index_filters, order_key, order_asc):
+                if order_func is not None and order_func(data) is None:
+                    continue
 
-            if not filter_func(data):
-                continue
+                if not filter_func(data):
+                    continue
+
+                selected.append((data, make_id_path(id_dir, id_)))
 
-            selected.append((data, path))
+                if ordered and limit is not None and len(selected) >= limit:
+                    break
 
-        if order_func is not None:
+        if not ordered:
             selected.sort(key=lambda d: order_func(d[0]), reverse=not order_asc)
 
         return SelectItems(
@@ -370,7 +1072,7 @@ def select(pav_cfg,
     else:
         return select_from(
             pav_cfg,
-            paths=id_dir.iterdir(),
+            paths=id_paths(id_dir),
             transform=transform,
             filter_func=filter_func,
             order_func=order_func,
@@ -432,7 +1134,7 @@ def select_from(pav_cfg,
 
 
 def paths_to_ids(paths: List[Path]) -> List[int]:
-    """Convert a list of list of dir_db paths to ids.
+    """Convert a list of list of dir_db paths (flat or sharded) to ids.
 
     :param paths: A list of id paths.
     :raises ValueError: For invalid paths
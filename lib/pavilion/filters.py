@@ -8,6 +8,7 @@ from functools import partial
 from pathlib import Path
 from typing import Dict, Any, Callable, List
 
+from pavilion import dir_db
 from pavilion import series
 from pavilion import utils
 from pavilion.status_file import TestStatusFile, SeriesStatusFile, StatusError
@@ -308,16 +309,22 @@ def filter_test_run(
         return False
 
     if state is not None or has_state is not None:
-        status_file_path = Path(test_attrs['path'])/TestRun.STATUS_FN
-        try:
-            status_file = TestStatusFile(status_file_path)
-        except StatusError:
-            # Couldn't open status file, so it can't have the given state...
-            return False
+        if test_attrs.get('states') is not None:
+            # The state information came from the index (or the test's attributes).
+            cur_state = test_attrs.get('state')
+            states = test_attrs['states'] or []
+        else:
+            status_file_path = Path(test_attrs['path'])/TestRun.STATUS_FN
+            try:
+                current, states = TestStatusFile(status_file_path).summary()
+            except StatusError:
+                # Couldn't open status file, so it can't have the given state...
+                return False
+            cur_state = current.state
 
-        if state is not None and not state.upper() == status_file.current().state:
+        if state is not None and not state.upper() == cur_state:
             return False
-        elif has_state is not None and not status_file.has_state(has_state.upper()):
+        elif has_state is not None and has_state.upper() not in states:
             return False
 
     return True
@@ -360,6 +367,37 @@ def make_test_run_filter(
         result_error=result_error, state=state, sys_name=sys_name,
         user=user)
 
+    # Give dir_db indexes what they need to pre-filter on their own.
+    index_filters = []
+    if complete:
+        index_filters.append(dir_db.IndexFilter('complete', '=', True))
+    if incomplete:
+        index_filters.append(dir_db.IndexFilter('complete', '=', False))
+    if user:
+        index_filters.append(dir_db.IndexFilter('user', '=', user))
+    if sys_name:
+        index_filters.append(dir_db.IndexFilter('sys_name', '=', sys_name))
+    if passed:
+        index_filters.append(dir_db.IndexFilter('result', '=', TestRun.PASS))
+    if failed:
+        index_filters.append(dir_db.IndexFilter('result', '=', TestRun.FAIL))
+    if result_error:
+        index_filters.append(dir_db.IndexFilter('result', '=', TestRun.ERROR))
+    if older_than is not None:
+        index_filters.append(dir_db.IndexFilter('created', '<=', older_than))
+    if newer_than is not None:
+        index_filters.append(dir_db.IndexFilter('created', '>=', newer_than))
+    # Unnamed tests are matched against '', which a glob on the index can't do.
+    if name and not fnmatch.fnmatch('', name):
+        index_filters.append(dir_db.IndexFilter('name', 'glob', name))
+    if state is not None:
+        index_filters.append(dir_db.IndexFilter('state', '=', state.upper()))
+    if has_state is not None:
+        # The states are indexed as the string form of the list of them.
+        index_filters.append(dir_db.IndexFilter('states', 'glob',
+                                                "*'{}'*".format(has_state.upper())))
+    filter_func.index_filters = index_filters
+
     return filter_func
 
 
@@ -384,6 +422,8 @@ def get_sort_opts(
         sort_key = sort_key[1:]
 
     sortf = partial(sort_func, choice=sort_key)
+    # Lets dir_db indexes do the sorting.
+    sortf.index_key = sort_key
 
     return sortf, sort_ascending
 
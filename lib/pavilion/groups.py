@@ -8,6 +8,7 @@ from typing import NewType, List, Tuple, Union, Dict
 import uuid
 
 from pavilion import config
+from pavilion import dir_db
 from pavilion.errors import TestGroupError
 from pavilion.series import TestSeries, list_series_tests, SeriesInfo
 from pavilion.test_run import TestRun, TestAttributes
@@ -531,7 +532,7 @@ class TestGroup:
                         '\n'.join([' - {}'.format(lbl for lbl in self.pav_cfg.configs)])))
 
         rel_cfg = self.pav_cfg.configs[cfg_label]
-        tpath = rel_cfg.working_dir/'test_runs'/test_id
+        tpath = dir_db.make_id_path(rel_cfg.working_dir/'test_runs', int(test_id))
 
         if not tpath.is_dir():
             raise TestGroupError(
@@ -560,7 +561,7 @@ class TestGroup:
             raise TestGroupError("Invalid series id '{}', not numeric id."
                                  .format(series))
 
-        series_dir = self.pav_cfg.working_dir/'series'/series_id
+        series_dir = dir_db.make_id_path(self.pav_cfg.working_dir/'series', int(series_id))
 
         if not series_dir.is_dir():
             raise TestGroupError("Series directory for sid '{}' does not exist.\n"
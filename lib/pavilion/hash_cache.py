@@ -0,0 +1,284 @@
+"""Hashes of build sources, cached across builds and Pavilion invocations.
+
+File hashes are kept under the working_dir, keyed by each file's path, inode, size,
+and mtime, so unchanged files never have to be read again. Directories are walked
+(and, in 'content' mode, hashed) in parallel. Directory hashes themselves aren't
+cached here, since a change deep in the tree doesn't change anything about the
+top directory; see builder.BuildHashCache for sharing them within a test set.
+"""
+
+import hashlib
+import os
+import pickle
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+from pavilion import utils
+
+BLOCK_SIZE = 4096*1024
+
+MODE_MTIME = 'mtime'
+MODE_CONTENT = 'content'
+HASH_MODES = (MODE_MTIME, MODE_CONTENT)
+
+CACHE_DIR_NAME = 'build_hashes'
+
+
+def hash_file(path: Path) -> bytes:
+    """Return the sha256 digest of the given file's contents."""
+
+    hash_obj = hashlib.sha256()
+
+    with open(str(path), 'rb') as file:
+        chunk = file.read(BLOCK_SIZE)
+        while chunk:
+            hash_obj.update(chunk)
+            chunk = file.read(BLOCK_SIZE)
+
+    return hash_obj.digest()
+
+
+def _file_key(file_stat: os.stat_result) -> tuple:
+    """The parts of a file's stat that tell us whether its contents may have changed."""
+
+    return file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns
+
+
+class HashCache:
+    """Compute and cache hashes of files and directories. Cached file hashes are
+    stored in one pickle file per directory (the parent directory for individual
+    files, or the top of a hashed directory tree), so only the relevant entries are
+    ever loaded. New file hashes are only written to disk by flush().
+
+    This is thread safe. Use get_cache() to get the shared cache for a working_dir.
+    """
+
+    def __init__(self, cache_dir: Union[Path, None], threads: int = 8):
+        """
+        :param cache_dir: Where to store cached hashes. If None, file hashes are only
+            cached in memory.
+        :param threads: The number of threads to use when hashing directories.
+            (Directories are walked with the shared walker pool in utils.)
+        """
+
+        self.cache_dir = cache_dir
+        self.threads = max(threads, 1)
+
+        self._lock = threading.Lock()
+        # Cached file hashes, by table name and then path.
+        self._tables = {}  # type: Dict[str, Dict[str, Tuple[tuple, bytes]]]
+        # Tables with changes that haven't been written out yet, and whether they
+        # should be merged with what's on disk (rather than replacing it).
+        self._dirty = {}  # type: Dict[str, bool]
+
+    def file_hash(self, path: Path) -> bytes:
+        """Return the hash of the given file's contents, from cache if possible.
+
+        :raises OSError: When the file can't be read.
+        """
+
+        path = Path(path)
+        file_stat = path.stat()
+        table_name = self._table_name(path.parent)
+
+        with self._lock:
+            table = self._load_table(table_name)
+            cached = table.get(str(path))
+
+        if cached is not None and cached[0] == _file_key(file_stat):
+            return cached[1]
+
+        digest = hash_file(path)
+
+        with self._lock:
+            table[str(path)] = (_file_key(file_stat), digest)
+            self._dirty.setdefault(table_name, True)
+
+        return digest
+
+    def flush(self):
+        """Write the tables with new file hashes to disk. Call this once all the
+        hashes for a build have been computed."""
+
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            for table_name, merge in dirty.items():
+                self._save_table(table_name, self._tables[table_name], merge=merge)
+
+    def dir_hash(self, path: Path, mode: str = MODE_MTIME) -> bytes:
+        """Return a hash for the given directory. The directory is walked every
+        time, but only files that have changed since they were last hashed are read.
+
+        In 'mtime' mode this isn't a real hash; it's the path and the most recent
+        mtime of anything in the directory tree, which is enough to tell when the
+        tree has changed. In 'content' mode, it's a hash of the relative path and
+        contents of every file in the tree (using cached file hashes where the files
+        haven't changed).
+
+        :raises OSError: When the directory (or anything in it) can't be read.
+        :raises ValueError: For an unknown mode.
+        """
+
+        if mode not in HASH_MODES:
+            raise ValueError("Invalid directory hash mode '{}'".format(mode))
+
+        path = Path(path)
+        dir_stat = path.stat()
+
+        entries = self._walk(path)
+        if mode == MODE_MTIME:
+            latest = dir_stat.st_mtime
+            for _, entry_stat in entries:
+                latest = max(latest, entry_stat.st_mtime)
+            return '{} {:0.5f}'.format(path, latest).encode()
+
+        return self._content_hash(path, entries)
+
+    def _content_hash(self, root: Path, entries: List[Tuple[str, os.stat_result]]) -> bytes:
+        """Hash the relative paths and contents of the given directory entries."""
+
+        table_name = self._table_name(root)
+        with self._lock:
+            old_table = self._load_table(table_name)
+
+        file_hashes = {}
+        to_hash = []
+        for entry_path, entry_stat in entries:
+            if not stat.S_ISREG(entry_stat.st_mode):
+                continue
+
+            cached = old_table.get(entry_path)
+            if cached is not None and cached[0] == _file_key(entry_stat):
+                file_hashes[entry_path] = cached[1]
+            else:
+                to_hash.append(entry_path)
+
+        if len(to_hash) > 1 and self.threads > 1:
+            with ThreadPoolExecutor(self.threads) as pool:
+                for entry_path, digest in zip(to_hash, pool.map(hash_file, to_hash)):
+                    file_hashes[entry_path] = digest
+        else:
+            for entry_path in to_hash:
+                file_hashes[entry_path] = hash_file(entry_path)
+
+        hash_obj = hashlib.sha256()
+        table = {}
+        for entry_path, entry_stat in sorted(entries, key=lambda ent: ent[0]):
+            rel_path = os.path.relpath(entry_path, str(root))
+            hash_obj.update(rel_path.encode())
+            digest = file_hashes.get(entry_path)
+            if digest is None:
+                # Directories (and other non-files) only contribute their path.
+                hash_obj.update(b'\0')
+            else:
+                hash_obj.update(digest)
+                table[entry_path] = (_file_key(entry_stat), digest)
+
+        # Only keep entries for files that are still in the tree.
+        if to_hash or len(table) != len(old_table):
+            with self._lock:
+                self._tables[table_name] = table
+                self._dirty[table_name] = False
+
+        return hash_obj.digest()
+
+    @staticmethod
+    def _walk(root: Path) -> List[Tuple[str, os.stat_result]]:
+        """Stat everything under the given directory, walking sub-directories in
+        parallel. Like os.walk, symlinks to directories aren't followed (but
+        symlinks are stat'ed through).
+
+        :returns: A list of (path, stat) tuples.
+        """
+
+        def real_dirs(_, entries: List[utils.WalkEntry]) -> List[str]:
+            """Only descend into actual directories."""
+
+            return [entry.name for entry in entries if entry.is_dir and not entry.is_link]
+
+        return [(entry.path, entry.stat)
+                for entry in utils.walk_tree(root, real_dirs, follow_symlinks=True)]
+
+    @staticmethod
+    def _table_name(path: Path) -> str:
+        """The name of the cache table for files in the given directory."""
+
+        return hashlib.sha256(str(path).encode()).hexdigest()[:32]
+
+    def _load_table(self, table_name: str) -> Dict[str, Tuple[tuple, bytes]]:
+        """Return the given table, loading it from disk if needed. Must be called
+        with the lock held."""
+
+        table = self._tables.get(table_name)
+        if table is None:
+            table = self._tables[table_name] = self._read_table(table_name)
+
+        return table
+
+    def _read_table(self, table_name: str) -> Dict[str, Tuple[tuple, bytes]]:
+        """Read the given table from disk. Missing or broken tables are just
+        empty."""
+
+        if self.cache_dir is None:
+            return {}
+
+        try:
+            with (self.cache_dir/table_name).open('rb') as table_file:
+                table = pickle.load(table_file)
+        except (OSError, EOFError, ValueError, TypeError, AttributeError,
+                pickle.PickleError):
+            return {}
+
+        if not isinstance(table, dict):
+            return {}
+
+        return table
+
+    def _save_table(self, table_name: str, table: Dict[str, Tuple[tuple, bytes]],
+                    merge: bool = True):
+        """Write the given table to disk, merging it with whatever another process
+        may have written in the meantime. Failures are ignored; this is just a
+        cache. Must be called with the lock held."""
+
+        if self.cache_dir is None:
+            return
+
+        if merge:
+            on_disk = self._read_table(table_name)
+            on_disk.update(table)
+            table.update(on_disk)
+
+        path = self.cache_dir/table_name
+        tmp_path = path.with_name('{}.{}.{}.tmp'.format(
+            table_name, os.getpid(), threading.get_ident()))
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with tmp_path.open('wb') as tmp_file:
+                pickle.dump(table, tmp_file)
+            tmp_path.rename(path)
+        except (OSError, pickle.PickleError):
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+
+
+_CACHES = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_cache(pav_cfg) -> HashCache:
+    """Return the shared hash cache for the given config's working_dir."""
+
+    working_dir = pav_cfg.working_dir
+
+    with _CACHES_LOCK:
+        cache = _CACHES.get(working_dir)
+        if cache is None:
+            cache = _CACHES[working_dir] = HashCache(
+                working_dir/CACHE_DIR_NAME, threads=pav_cfg.get('max_threads', 8))
+
+    return cache
@@ -10,6 +10,7 @@ import uuid
 from pathlib import Path
 from typing import List, Union, NewType, Dict
 
+from pavilion import dir_db
 from pavilion.types import ID_Pair, Nodes
 
 
@@ -141,7 +142,7 @@ class Job:
                     # Skip any bad links or paths.
                     continue
 
-                working_dir = test_dir.parents[1]
+                working_dir = dir_db.id_base_path(test_dir).parent
                 try:
                     test_id = int(test_dir.name)
                 except ValueError:
@@ -16,14 +16,24 @@ The exception to this is result evaluation strings, which are interpreted
 directly as a ResultExpression.
 """
 
+import contextlib
+import functools
+import hashlib
+import os
+import pickle
 import re
-from typing import List
+import shutil
+import stat
+import threading
+from pathlib import Path
+from typing import List, Union
 
 import lark as _lark
 from ..errors import ParserValueError, StringParserError
 from .expressions import (get_expr_parser, EvaluationExprTransformer,
-                          VarRefVisitor)
-from .strings import get_string_parser, StringTransformer, should_parse
+                          VarRefVisitor, EXPR_GRAMMAR)
+from .strings import (get_string_parser, StringTransformer, StringCompiler, StringTemplate,
+                      should_parse, STRING_GRAMMAR)
 
 
 class ErrorCat:
@@ -81,7 +91,205 @@ NO_MATCH_EXAMPLE = ErrorCat(
     'Unknown syntax error. Please report at https://github.com/hpc/pavilion2/issues',
     [])
 
-_TREE_CACHE = {}
+TEMPLATE_CACHE_SIZE = 8192
+"""The maximum number of compiled string templates kept in memory."""
+
+TEMPLATE_CACHE_DIR = 'template_cache'
+"""The name of the on-disk template cache directory, under the working_dir."""
+
+TEMPLATE_DISK_CACHE_SIZE = 64*1024**2
+"""The (soft) limit on the size of each user's on-disk template cache, in bytes.
+The oldest templates are removed first when the cache is pruned."""
+
+_TEMPLATE_CACHE_DIR = None
+# The cache directories this process has already pruned.
+_PRUNED_DIRS = set()
+
+# Compiled templates on disk are only valid for the grammar (and template format)
+# they were compiled with.
+_GRAMMAR_VERSION = hashlib.sha256('\n'.join([
+    STRING_GRAMMAR, EXPR_GRAMMAR, _lark.__version__,
+    str(StringTemplate.FORMAT_VERSION)]).encode()).hexdigest()[:16]
+
+
+def _private_dir(path: Path) -> bool:
+    """Create the given directory (only writable by us) if needed, and return
+    whether it's a real directory that's owned and only writable by us."""
+
+    try:
+        path.mkdir(mode=0o700, parents=True, exist_ok=True)
+        dir_stat = os.lstat(str(path))
+    except OSError:
+        return False
+
+    return (stat.S_ISDIR(dir_stat.st_mode) and dir_stat.st_uid == os.getuid()
+            and not dir_stat.st_mode & 0o022)
+
+
+def set_template_cache_dir(path: Union[Path, None]):
+    """Persist compiled string templates in the given directory, so that later
+    Pavilion invocations can skip parsing strings they've seen before. Only
+    templates compiled after this is set (and not already in the in-memory cache)
+    are saved. Subprocesses forked after this is called will use the same directory.
+
+    Templates are pickled, so each user gets their own subdirectory that no one
+    else can write to, and only files owned by (and only writable by) the current
+    user are ever loaded. If that can't be guaranteed, the on-disk cache isn't
+    used. The first time a cache directory is set in a process, it's pruned (see
+    prune_template_cache()).
+
+    :param path: The cache directory. It will be created as needed. Give None to
+        stop using the on-disk cache.
+    """
+
+    global _TEMPLATE_CACHE_DIR  # pylint: disable=global-statement
+
+    _TEMPLATE_CACHE_DIR = None
+    if path is None:
+        return
+
+    user_dir = Path(path)/str(os.getuid())
+    if _private_dir(user_dir) and _private_dir(user_dir/_GRAMMAR_VERSION):
+        if user_dir not in _PRUNED_DIRS:
+            _PRUNED_DIRS.add(user_dir)
+            prune_template_cache(user_dir)
+        _TEMPLATE_CACHE_DIR = user_dir/_GRAMMAR_VERSION
+
+
+@contextlib.contextmanager
+def template_cache_dir(path: Union[Path, None]):
+    """Use the given on-disk template cache directory (as per
+    set_template_cache_dir()) only within this context."""
+
+    global _TEMPLATE_CACHE_DIR  # pylint: disable=global-statement
+
+    orig_dir = _TEMPLATE_CACHE_DIR
+    set_template_cache_dir(path)
+    try:
+        yield
+    finally:
+        _TEMPLATE_CACHE_DIR = orig_dir
+
+
+def prune_template_cache(user_dir: Path, max_size: int = TEMPLATE_DISK_CACHE_SIZE):
+    """Remove templates compiled for other grammar versions, and then the oldest
+    templates until the cache is under max_size bytes.
+
+    :param user_dir: A user's template cache directory.
+    :param max_size: The size to shrink the cache to.
+    """
+
+    files = []
+    total = 0
+    try:
+        for version_dir in os.scandir(str(user_dir)):
+            if version_dir.name != _GRAMMAR_VERSION:
+                shutil.rmtree(version_dir.path, ignore_errors=True)
+                continue
+
+            for entry in os.scandir(version_dir.path):
+                try:
+                    entry_stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                files.append((entry_stat.st_mtime, entry_stat.st_size, entry.path))
+                total += entry_stat.st_size
+    except OSError:
+        return
+
+    files.sort()
+    for _, size, path in files:
+        if total <= max_size:
+            break
+
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+        total -= size
+
+
+def _template_path(text: str) -> Union[Path, None]:
+    """Return the on-disk cache path for the given text, if there's a cache dir."""
+
+    if _TEMPLATE_CACHE_DIR is None:
+        return None
+
+    return _TEMPLATE_CACHE_DIR/(hashlib.sha256(text.encode()).hexdigest() + '.pkl')
+
+
+def _load_template(text: str) -> Union[StringTemplate, None]:
+    """Load the compiled template for the given text from the on-disk cache."""
+
+    path = _template_path(text)
+    if path is None:
+        return None
+
+    try:
+        with path.open('rb') as cache_file:
+            file_stat = os.fstat(cache_file.fileno())
+            # Never unpickle anything someone else could have written.
+            if file_stat.st_uid != os.getuid() or file_stat.st_mode & 0o022:
+                return None
+
+            cached_text, template = pickle.load(cache_file)
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, ValueError, TypeError, AttributeError, ImportError,
+            pickle.PickleError):
+        # Anything wrong with the file just means we have to compile again.
+        return None
+
+    if cached_text != text or not isinstance(template, StringTemplate):
+        return None
+
+    return template
+
+
+def _save_template(text: str, template: StringTemplate):
+    """Save the given template to the on-disk cache, if there is one. Failures
+    are ignored, as the cache is just an optimization."""
+
+    path = _template_path(text)
+    if path is None:
+        return
+
+    tmp_path = path.with_name('{}.{}.{}.tmp'.format(
+        path.name, os.getpid(), threading.get_ident()))
+    try:
+        tmp_fd = os.open(str(tmp_path), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(tmp_fd, 'wb') as tmp_file:
+            pickle.dump((text, template), tmp_file)
+        tmp_path.rename(path)
+    except (OSError, pickle.PickleError):
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+
+
+def _compile_text(text: str) -> StringTemplate:
+    """Parse the given text into a string template, without any caching."""
+
+    return StringCompiler().transform(get_string_parser().parse(text))
+
+
+@functools.lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_text(text: str) -> StringTemplate:
+    """Return the compiled template for the given text. Templates are cached (in
+    a bounded LRU cache), and saved on disk if a template cache directory is set.
+    See set_template_cache_dir().
+
+    :raises lark.UnexpectedInput: On syntax errors.
+    :raises ParserValueError: For other errors in the text.
+    """
+
+    template = _load_template(text)
+    if template is None:
+        template = _compile_text(text)
+        _save_template(text, template)
+
+    return template
 
 
 def parse_text(text, var_man) -> str:
@@ -98,27 +306,14 @@ def parse_text(text, var_man) -> str:
     if not should_parse(text):
         return text
 
-    parser = get_string_parser()
-    transformer = StringTransformer(var_man)
-
-    def parse_fn(txt):
-        """Shorthand for parsing text."""
-
-        tree = _TREE_CACHE.get(txt)
-        if tree is None:
-            tree = parser.parse(txt)
-            _TREE_CACHE[txt] = tree
-
-        return transformer.transform(tree)
-
     try:
-        # On the surface it may seem that parsing and transforming should be
-        # separate steps with their own errors, but expressions are parsed
-        # as part of the transformation and may raise their own parse errors.
-        value = parse_fn(text)
+        # On the surface it may seem that parsing and resolving should be
+        # separate steps with their own errors, but both can raise
+        # parser value errors.
+        value = compile_text(text).resolve(var_man)
     except (_lark.UnexpectedCharacters, _lark.UnexpectedToken) as err:
         # Try to figure out why the error happened based on examples.
-        err_type = match_examples(err, parse_fn, BAD_EXAMPLES, text)
+        err_type = match_examples(err, _compile_text, BAD_EXAMPLES, text)
         raise StringParserError(err_type, err.get_context(text))
     except ParserValueError as err:
         # These errors are already really specific. We don't have to
@@ -112,45 +112,134 @@ class ExprToken(lark.Token):
     """Denotes a special token that represents an expression."""
 
 
-class StringTransformer(PavTransformer):
-    """Dynamically transform parsed strings into their final value.
+EXPRESSION = '<expression>'
+ITERATION = '<iteration>'
 
-    - string productions always return a list of tokens.
-    - ExprTokens are generated for expressions.
-    - These lists are collapsed by both 'start' and 'sub_string' productions.
+STRING_ESCAPES = {'\\{{': '{{', '\\~': '~', '\\\\{{': '\\{{', '\\\\~': '\\~'}
+
+
+def _unescape(text, escapes) -> str:
+    """Pavilion mostly relies yaml to handle un-escaping strings. There,
+    are, however, a few contexts where additional escapes are necessary.
+
+    :param str text: The text to escape.
+    :param dict escapes: A dictionary of extra escapes to apply.
+        Backslashes are always escapable.
 
-      - The collapsed result is a single token.
-      - The collapse process resolves all ExprTokens.
-    - All other productions collapse their components immediately.
+    :return:
     """
 
-    EXPRESSION = '<expression>'
+    pos = 0
+    text_parts = []
+    while pos < len(text):
+        idx = text.find('\\', pos)
+        if idx == -1:
+            break
+
+        for esc_key in escapes:
+            # Look for one of our escape sequences.
+            if text[idx:idx+len(esc_key)] == esc_key:
+                text_parts.append(text[pos:idx])
+                text_parts.append(escapes[esc_key])
+                pos = idx + len(esc_key)
+                break
+        else:
+            # Skip the backslash
+            text_parts.append(text[pos:idx+1])
+            pos = idx + 1
 
-    def __init__(self, var_man):
-        """Initialize the transformer.
+    text_parts.append(text[pos:])
 
-        :param pavilion.test_config.variables.VariableSetManager var_man:
-            The variable manager to use to resolve references.
+    out = ''.join(text_parts)
+
+    return out
+
+
+def _parse_expr(expr: lark.Token) -> lark.Tree:
+    """Parse the given expression token and return the tree."""
+
+    try:
+        return get_expr_parser().parse(expr.value['expr'])
+    except ParserValueError as err:
+        err.pos_in_stream += expr.start_pos
+        # Re-raise the corrected error
+        raise
+    except lark.UnexpectedInput as err:
+        err.pos_in_stream += expr.start_pos
+        # Alter the error state to make sure it can be differentiated
+        # from string_parser states.
+        err.expr_error = True
+        raise err
+
+
+class StringTemplate:
+    """A fully parsed Pavilion string. Everything that doesn't depend on variable
+    values (parsing the string and each of its expressions, unescaping, finding the
+    variables each iteration uses) has already been done, so a template can be
+    resolved against any number of variable managers cheaply.
+
+    Templates are picklable, so they can be cached on disk (see
+    ``parsers.compile_text()``).
+
+    The parts of a template are tokens of three kinds:
+
+    - Literal strings, with a string value.
+    - ``EXPRESSION`` tokens, whose value is a dict of the 'expr' string, its
+      'format_spec' token, and the parsed expression 'tree'.
+    - ``ITERATION`` tokens, whose value is a dict of the 'inner' parts (literals and
+      expressions), the 'separator', and the variables 'used' in the expressions.
+    """
+
+    FORMAT_VERSION = 1
+    """Bump this whenever the pickled form of templates changes."""
+
+    def __init__(self, parts: List[lark.Token], token: lark.Token,
+                 trailing_newline: bool = False):
+        """
+        :param parts: The template components.
+        :param token: A token that spans the whole string, for error reporting.
+        :param trailing_newline: Whether the string ended with a newline.
         """
 
-        self.var_man = var_man
-        super().__init__()
+        self.parts = parts
+        self.token = token
+        self.trailing_newline = trailing_newline
 
-    def start(self, items) -> str:
-        """Resolve the final string components, and return just a string.
+    @property
+    def variables(self) -> List[str]:
+        """All the variables referenced in this template's expressions."""
 
-        :param list[lark.Token] items: A single token of string components.
+        visitor = VarRefVisitor()
+        var_list = []
+        for part in self.parts:
+            if part.type == EXPRESSION:
+                var_list.extend(visitor.visit(part.value['tree']))
+            elif part.type == ITERATION:
+                var_list.extend(part.value['used'])
+
+        return var_list
+
+    def resolve(self, var_man):
+        """Resolve this template using the given variables, returning the final
+        value. That's usually a string, but may be a list if the string consists of a
+        single expression (and whitespace) that resolves to one.
+
+        :param pavilion.test_config.variables.VariableSetManager var_man:
+            The variable manager to use to resolve references.
+        :raises ParserValueError: When the expressions can't be resolved.
         """
 
         parts = []
-        for item in items[0].value:
-            if item.type == self.EXPRESSION:
-                parts.append(self._resolve_expr(item, self.var_man))
+        for part in self.parts:
+            if part.type == EXPRESSION:
+                parts.append(self._resolve_expr(part, var_man))
+            elif part.type == ITERATION:
+                parts.append(self._resolve_iter(part, var_man))
             else:
-                parts.append(item.value)
+                parts.append(part.value)
 
         # Add a trailing newline if necessary.
-        if len(items) > 1:
+        if self.trailing_newline:
             parts.append('\n')
 
         # If everything is a string, join the bits and return them.
@@ -166,109 +255,30 @@ class StringTransformer(PavTransformer):
                     found_list = part
                 else:
                     raise ParserValueError(
-                        token=self._merge_tokens(items, parts),
+                        token=self.token,
                         message="Value contained multiple expressions that resolved to lists.")
             elif not (is_str(part) and part.isspace()):
                 raise ParserValueError(
-                    token=self._merge_tokens(items, parts),
+                    token=self.token,
                     message="Value resolved to a list, but also contained none-whitespace.")
         if not found_list:
             raise ParserValueError(
-                token=self._merge_tokens(items, parts),
+                token=self.token,
                 message="Value resolved to an invalid type (this should never happen).")
 
         return found_list
 
-    def string(self, items) -> lark.Token:
-        """Strings are merged into a single token whose value is all
-        substrings. We're essentially just preserving the tree.
-
-        :param list[lark.Token] items: The component tokens of the string.
-        """
-
-        token_list = []
-        for item in items:
-            if isinstance(item.value, list):
-                token_list.extend(item.value)
-            elif isinstance(item.value, dict):
-                token_list.append(item)
-            else:
-                item.value = self._unescape(
-                    item.value, {'\\{{': '{{', '\\~': '~',
-                                 '\\\\{{': '\\{{', '\\\\~': '\\~'})
-
-                token_list.append(item)
-
-        return self._merge_tokens(items, token_list)
-
-    @classmethod
-    def expr(cls, items: List[lark.Token]) -> lark.Token:
-        """Grab the expression and format spec and combine them into a single
-        token. We can't resolve them until we get to an iteration or the
-        start. The merged expression tokens are set to the
-        ``self.EXPRESSION`` type later identification, and have a dict
-        of {'format_spec': <spec>, 'expr': <expression_string>} for a value.
-
-        :param items: The expr components and possibly a format_spec.
-        """
-
-        # Return an empty, regular token
-        if not items:
-            return lark.Token(
-                type_='<empty>',
-                value='',
-            )
-
-        if items[-1].type == 'FORMAT':
-            expr_format = items.pop()
-        else:
-            expr_format = None
-
-        value = {
-            'expr': ''.join([item.value for item in items]),
-            'format_spec': expr_format,
-        }
-
-        return cls._merge_tokens(items, value, type_=cls.EXPRESSION)
-
-    def iter(self, items: List[lark.Token]) -> lark.Token:
-        """Handle an iteration section. These can contain anything except
-        nested iteration sections. This part of the string will be repeated for
-        every combination of used multi-valued variables (that don't specify
-        an index). The returned result is a single token that is fully
-        resolved and combined into a single string.
-
-        :param items: The 'iter_inner' token and a separator token. The value
-            of 'iter_inner' will be a list of Tokens including strings,
-            escapes, and expressions.
-        """
-
-        # The original tokens will be set as the inner value.
-        inner_items = items[0].value
-        separator = self._unescape(items[1].value[1:-1],
-                                   {'\\]': ']', '\\\\]': '\\]'})
-
-        expressions = [item for item in inner_items
-                       if item.type == self.EXPRESSION]
-
-        visitor = VarRefVisitor()
-        used_vars = []
-
-        expr_trees = {}
-
-        for expr in expressions:
-            expr_tree = self.parse_expr(expr)
-            expr_trees[expr] = expr_tree
-
-            # Get the used variables from the expression.
-            used_vars.extend(visitor.visit(expr_tree))
+    def _resolve_iter(self, iteration: lark.Token, var_man) -> str:
+        """Resolve an iteration section. This part of the string is repeated for
+        every combination of used multi-valued variables (that don't specify an
+        index), and the results are joined with the separator."""
 
         # Get a set of the (var_set, var) tuples used in expressions that
         # aren't specifically indexed.
         filtered_vars = []
         direct_refs = set()
-        for var_name in used_vars:
-            var_set, var, idx, sub_var = self.var_man.resolve_key(var_name)
+        for var_name in iteration.value['used']:
+            var_set, var, idx, sub_var = var_man.resolve_key(var_name)
             if idx is None:
                 if (var_set, var) not in filtered_vars:
                     filtered_vars.append((var_set, var))
@@ -280,104 +290,40 @@ class StringTransformer(PavTransformer):
         for direct_ref in direct_refs:
             var_set, var, idx, sub_var = direct_ref
             if (var_set, var) in filtered_vars:
-                key = self.var_man.key_as_dotted(direct_ref)
+                key = var_man.key_as_dotted(direct_ref)
                 raise ParserValueError(
-                    token=self._merge_tokens(items, None),
+                    token=iteration,
                     message="Variable {} was referenced, but is also being "
                     "iterated over. You can't do both.".format(key)
                 )
 
-        # Get a variable manager for each permutation.
-        var_men = self.var_man.get_permutations(filtered_vars)
-
         # Resolve iteration string and expression for each permutation.
         iterations = []
-        for var_man in var_men:
+        for perm_var_man in var_man.iter_permutations(filtered_vars):
             parts = []
-            for item in inner_items:
-                if item.type == self.EXPRESSION:
-                    tree = expr_trees[item]
-                    parts.append(self._resolve_expr(item, var_man, tree=tree))
+            for item in iteration.value['inner']:
+                if item.type == EXPRESSION:
+                    parts.append(self._resolve_expr(item, perm_var_man))
                 else:
                     parts.append(item.value)
 
             iterations.append(''.join(parts))
 
-        return self._merge_tokens(items, separator.join(iterations))
+        return _unescape(iteration.value['separator'].join(iterations), STRING_ESCAPES)
 
     @staticmethod
-    def _unescape(text, escapes) -> str:
-        """Pavilion mostly relies yaml to handle un-escaping strings. There,
-        are, however, a few contexts where additional escapes are necessary.
-
-        :param str text: The text to escape.
-        :param dict escapes: A dictionary of extra escapes to apply.
-            Backslashes are always escapable.
-
-        :return:
-        """
-
-        pos = 0
-        text_parts = []
-        while pos < len(text):
-            idx = text.find('\\', pos)
-            if idx == -1:
-                break
-
-            for esc_key in escapes:
-                # Look for one of our escape sequences.
-                if text[idx:idx+len(esc_key)] == esc_key:
-                    text_parts.append(text[pos:idx])
-                    text_parts.append(escapes[esc_key])
-                    pos = idx + len(esc_key)
-                    break
-            else:
-                # Skip the backslash
-                text_parts.append(text[pos:idx+1])
-                pos = idx + 1
-
-        text_parts.append(text[pos:])
-
-        out = ''.join(text_parts)
-
-        return out
-
-    @staticmethod
-    def parse_expr(expr: lark.Token) -> lark.Tree:
-        """Parse the given expression token and return the tree."""
-
-        try:
-            return get_expr_parser().parse(expr.value['expr'])
-        except ParserValueError as err:
-            err.pos_in_stream += expr.start_pos
-            # Re-raise the corrected error
-            raise
-        except lark.UnexpectedInput as err:
-            err.pos_in_stream += expr.start_pos
-            # Alter the error state to make sure it can be differentiated
-            # from string_parser states.
-            err.expr_error = True
-            raise err
-
-    def _resolve_expr(self,
-                      expr: lark.Token, var_man,
-                      tree=None) -> str:
+    def _resolve_expr(expr: lark.Token, var_man) -> str:
         """Resolve the value of the the given expression token.
         :param expr: An expression token. The value will be a dict
-            of the expr string and the formatter.
+            of the expr string, the formatter, and the parsed expression tree.
         :param pavilion.test_config.variables.VariableSetManager var_man:
             The variable set manager to use to resolve this expression.
-        :param lark.Tree tree: The already parsed syntax tree for expr (will
-            parse for you if not given).
         :return:
         """
 
-        if tree is None:
-            tree = self.parse_expr(expr)
-
         transformer = ExprTransformer(var_man)
         try:
-            value = transformer.transform(tree)
+            value = transformer.transform(expr.value['tree'])
         except ParserValueError as err:
             err.pos_in_stream += expr.start_pos
             raise
@@ -425,6 +371,108 @@ class StringTransformer(PavTransformer):
         else:
             return _format(value)
 
+
+class StringCompiler(PavTransformer):
+    """Transform parsed strings into a StringTemplate.
+
+    - string productions always return a list of tokens.
+    - Expressions are parsed, and become EXPRESSION tokens.
+    - Iterations become ITERATION tokens.
+    - These lists are collapsed by the 'start' production into the template.
+    """
+
+    EXPRESSION = EXPRESSION
+
+    def start(self, items) -> StringTemplate:
+        """Collect the final string components into a template.
+
+        :param list[lark.Token] items: A single token of string components.
+        """
+
+        return StringTemplate(
+            parts=list(items[0].value),
+            token=self._merge_tokens(items, None),
+            trailing_newline=len(items) > 1)
+
+    def string(self, items) -> lark.Token:
+        """Strings are merged into a single token whose value is all
+        substrings. We're essentially just preserving the tree.
+
+        :param list[lark.Token] items: The component tokens of the string.
+        """
+
+        token_list = []
+        for item in items:
+            if isinstance(item.value, list):
+                token_list.extend(item.value)
+            elif isinstance(item.value, dict):
+                token_list.append(item)
+            else:
+                token_list.append(item.update(value=_unescape(item.value, STRING_ESCAPES)))
+
+        return self._merge_tokens(items, token_list)
+
+    @classmethod
+    def expr(cls, items: List[lark.Token]) -> lark.Token:
+        """Grab the expression and format spec and combine them into a single
+        token, and parse the expression. The merged expression tokens are set to the
+        ``EXPRESSION`` type for later identification, and have a dict
+        of {'format_spec': <spec>, 'expr': <expression_string>, 'tree': <tree>} for
+        a value.
+
+        :param items: The expr components and possibly a format_spec.
+        """
+
+        # Return an empty, regular token
+        if not items:
+            return lark.Token(
+                type_='<empty>',
+                value='',
+            )
+
+        if items[-1].type == 'FORMAT':
+            expr_format = items.pop()
+        else:
+            expr_format = None
+
+        value = {
+            'expr': ''.join([item.value for item in items]),
+            'format_spec': expr_format,
+        }
+
+        expr = cls._merge_tokens(items, value, type_=EXPRESSION)
+        value['tree'] = _parse_expr(expr)
+        return expr
+
+    def iter(self, items: List[lark.Token]) -> lark.Token:
+        """Handle an iteration section. These can contain anything except
+        nested iteration sections. The variables used by the expressions are
+        noted, so we know what to iterate over when the template is resolved.
+
+        :param items: The 'iter_inner' token and a separator token. The value
+            of 'iter_inner' will be a list of Tokens including strings,
+            escapes, and expressions.
+        """
+
+        # The original tokens will be set as the inner value.
+        inner_items = items[0].value
+        separator = _unescape(items[1].value[1:-1], {'\\]': ']', '\\\\]': '\\]'})
+
+        visitor = VarRefVisitor()
+        used_vars = []
+        for item in inner_items:
+            if item.type == EXPRESSION:
+                # Get the used variables from the expression.
+                used_vars.extend(visitor.visit(item.value['tree']))
+
+        value = {
+            'inner': inner_items,
+            'separator': separator,
+            'used': used_vars,
+        }
+
+        return self._merge_tokens(items, value, type_=ITERATION)
+
     @staticmethod
     def _displace_token(base: lark.Token, inner: lark.Token):
         """Inner is assumed to be a token from within the 'base' string.
@@ -452,6 +500,35 @@ class StringTransformer(PavTransformer):
         return self._merge_tokens(items, flat_items)
 
 
+class StringTransformer(StringCompiler):
+    """Dynamically transform parsed strings into their final value. This compiles
+    the tree into a StringTemplate, and then resolves it with the given variables."""
+
+    def __init__(self, var_man):
+        """Initialize the transformer.
+
+        :param pavilion.test_config.variables.VariableSetManager var_man:
+            The variable manager to use to resolve references.
+        """
+
+        self.var_man = var_man
+        super().__init__()
+
+    def start(self, items) -> str:
+        """Resolve the final string components, and return just a string.
+
+        :param list[lark.Token] items: A single token of string components.
+        """
+
+        return super().start(items).resolve(self.var_man)
+
+    @staticmethod
+    def parse_expr(expr: lark.Token) -> lark.Tree:
+        """Parse the given expression token and return the tree."""
+
+        return _parse_expr(expr)
+
+
 class StringVarRefVisitor(VarRefVisitor):
     """Parse expressions and get all used variables. """
 
@@ -459,9 +536,11 @@ class StringVarRefVisitor(VarRefVisitor):
     def expr(tree: lark.Tree) -> List[str]:
         """Parse the expression, and return any used variables."""
 
-        expr = StringTransformer.expr(tree.children)
-        expr_tree = StringTransformer.parse_expr(expr)
+        expr = StringCompiler.expr(tree.children)
+        if expr.type != EXPRESSION:
+            return []
+
         visitor = VarRefVisitor()
 
-        var_list = visitor.visit(expr_tree)
+        var_list = visitor.visit(expr.value['tree'])
         return var_list
@@ -2,7 +2,7 @@
 
 import copy
 import sys
-from typing import List, Union, Dict, Tuple
+from typing import List, Union, Dict, Tuple, Iterator
 import uuid
 
 from pavilion.errors import TestConfigError, SchedulerPluginError, VariableError, ResultError
@@ -208,14 +208,28 @@ class RawProtoTest:
                                         value_keys), request=self.request)
 
     def resolve_permutations(self) -> List[ProtoTest]:
-        """Resolve permutations for all used permutation variables, returning a
-        variable manager for each permuted version of the test config. This requires that
+        """As per iter_permutations(), but return a list of all the permutations.
+
+        :raises TestConfigError: When there are problems with variables or the
+            permutations.
+        """
+
+        return list(self.iter_permutations())
+
+    def iter_permutations(self) -> Iterator[ProtoTest]:
+        """Resolve permutations for all used permutation variables, yielding a
+        ProtoTest for each permuted version of the test config. This requires that
         we incrementally apply permutations - permutation variables may contain references that
         refer to each other (or scheduler variables), so we have to resolve non-permuted
         variables, apply any permutations that are ready, and repeat until all are applied
         (taking a break to add scheduler variables when we can't proceed without them anymore).
 
-        :returns: A list of ProtoTest objects.
+        Permutations are generated only as they're consumed, so memory use depends
+        on how many are held at once rather than on the total permutation count.
+        Problems with the test config itself are raised immediately, but problems
+        with individual permutations are raised while iterating.
+
+        :returns: An iterator of ProtoTest objects.
         :raises TestConfigError: When there are problems with variables or the
             permutations.
         """
@@ -244,15 +258,16 @@ class RawProtoTest:
                                   "available on this system.".format(test_name, sched_name),
                                   request=self.request)
 
-        permuted_var_men = self._permute_basic(copy.deepcopy(self.var_man), used_per_vars)
+        # Each set of permutations gets its own (shallow) copy of the config, as the
+        # permute_base differs for each.
+        config = self.config.copy()
+        permuted_var_men = self._permute_basic(self.var_man.copy(), used_per_vars)
 
+        # Convert this RawProtoTest into regular ProtoTests.
+        return (ProtoTest(self.request, config, var_man, count=self.count)
+                for var_man in permuted_var_men)
 
-
-        # Convert this RawProtoTest into a regular ProtoTest.
-        return [ProtoTest(self.request, self.config, var_man)
-                for var_man in permuted_var_men]
-
-    def _permute_basic(self, var_man, used_per_vars) -> List[variables.VariableSetManager]:
+    def _permute_basic(self, var_man, used_per_vars) -> Iterator[variables.VariableSetManager]:
         """Permute over non-self referential variables and variables that don't rely on
         the scheduler. This will only resolve references whose dependencies are already
         resolved. It will be called repeatedly until all such references are resolved."""
@@ -281,15 +296,14 @@ class RawProtoTest:
 
         if not permute_now:
             # There are no more basic variables to permute over. Proceed to the next step.
-            return self._permute_delayed(var_man, used_per_vars)
+            yield from self._permute_delayed(var_man, used_per_vars)
+            return
 
-        new_var_men = []
-        for new_var_man in var_man.get_permutations(permute_now):
-            new_var_men.extend(self._permute_basic(new_var_man, used_per_vars))
-        return new_var_men
+        for new_var_man in var_man.iter_permutations(permute_now):
+            yield from self._permute_basic(new_var_man, used_per_vars)
 
 
-    def _permute_delayed(self, var_man, used_per_vars) -> List[variables.VariableSetManager]:
+    def _permute_delayed(self, var_man, used_per_vars) -> Iterator[variables.VariableSetManager]:
         """Calculate permutations for variables that we 'could resolve' if not for the fact
            that they are permutation variables. These are variables that refer to themselves
            (either directly (a.b->a.c) or indirectly (a.b -> d -> a.c). We only have to do
@@ -312,19 +326,14 @@ class RawProtoTest:
             if permute_var in used_per_vars:
                 used_per_vars.remove(permute_var)
 
-        perm_var_men = var_man.get_permutations(permute_now)
         if self._debug:
-            output.fprint(sys.stderr, 'delayed permutes, permuted on ', could_resolve,
-                          'got ', len(perm_var_men))
+            output.fprint(sys.stderr, 'delayed permutes, permuted on ', could_resolve)
 
-        all_var_men = []
-        for new_var_man in perm_var_men:
+        for new_var_man in var_man.iter_permutations(permute_now):
             # Resolve the next step in permutations for each permutation resolved here.
-            all_var_men.extend(self._permute_sched(new_var_man, used_per_vars))
-
-        return all_var_men
+            yield from self._permute_sched(new_var_man, used_per_vars)
 
-    def _permute_sched(self, var_man, used_per_vars) -> List[variables.VariableSetManager]:
+    def _permute_sched(self, var_man, used_per_vars) -> Iterator[variables.VariableSetManager]:
         """Everything that remains unresolved will depend on scheduler variables."""
 
         sched_name = self.config['scheduler']
@@ -367,14 +376,11 @@ class RawProtoTest:
             raise TestConfigError("Error resolving variable references (final).",
                                   self.request, err)
 
-        # And do the rest of the permutations.
-        all_var_men = var_man.get_permutations(used_per_vars)
-
         if self._debug:
-            output.fprint(sys.stderr, 'sched permutes, permuted on ', used_per_vars,
-                          'got', len(all_var_men))
+            output.fprint(sys.stderr, 'sched permutes, permuted on ', used_per_vars)
 
-        return all_var_men
+        # And do the rest of the permutations.
+        yield from var_man.iter_permutations(used_per_vars)
 
 
     def _check_permute_vars(self, permute_on) -> List[Tuple[str, str]]:
@@ -16,6 +16,7 @@ import os
 import pprint
 import re
 import sys
+import weakref
 from collections import defaultdict
 from pathlib import Path
 from typing import List, IO, Dict, Tuple, NewType, Union, Any, Iterator, TextIO
@@ -23,7 +24,7 @@ from typing import List, IO, Dict, Tuple, NewType, Union, Any, Iterator, TextIO
 import similarity
 import yc_yaml
 from pavilion.enums import Verbose
-from pavilion import output, variables
+from pavilion import output, parsers, variables
 from pavilion import pavilion_variables
 from pavilion import resolve
 from pavilion import schedulers
@@ -51,6 +52,31 @@ LOGGER = logging.getLogger('pav.' + __name__)
 TEST_VERS_RE = re.compile(r'^\d+(\.\d+){0,2}$')
 
 
+def _resolve_chunk(chunk: Tuple[int, TestRequest, Dict, List[variables.VariableSetManager]]) \
+        -> Tuple[int, List[Union[Dict, Exception]]]:
+    """Resolve a chunk of permutations of a single test config in a worker process.
+
+    :param chunk: The chunk id, the test request, the (shared) unresolved test config,
+        and the variable managers for each permutation.
+    :returns: The chunk id, and the resolved config (or the error encountered)
+        for each variable manager, in order.
+    """
+
+    chunk_id, request, config, var_mans = chunk
+
+    results = []
+    for var_man in var_mans:
+        try:
+            results.append(ProtoTest(request, config, var_man).resolve())
+        except TestConfigError as err:
+            results.append(err)
+        except Exception as err:  # pylint: disable=broad-except
+            # Arbitrary exceptions may not survive the trip back to the parent process.
+            results.append(RuntimeError("{}: {}".format(type(err).__name__, err)))
+
+    return chunk_id, results
+
+
 class TestConfigResolver:
     """Converts raw test configurations into their final, fully resolved
     form."""
@@ -101,6 +127,10 @@ class TestConfigResolver:
         # Raw loaded test suites
         self._suites: Dict[Dict] = {}
 
+        # The worker pool for resolving tests, created when first needed.
+        self._pool = None
+        self._pool_finalizer = None
+
     CONF_TYPE_DIRNAMES = {
         'suite': 'tests',
         'series': 'series',
@@ -301,9 +331,11 @@ class TestConfigResolver:
         :param modes: A list of modes to load.
         :param overrides: A dict of key:value pairs to apply as overrides.
         :param conditions: A dict containing the only_if and not_if conditions.
-        :param batch_size: The maximum number of tests to return at once. Tests
-            may end up queued internally while holding scheduler information that's
-            no longer valid if the number of permutations exceeds the batch size.
+        :param batch_size: The maximum number of tests to return at once.
+            Permutations are generated lazily, so only as many as each batch needs
+            are created (and given scheduler information) at a time. All the repeats
+            of a permutation are resolved together though, so they may spill into
+            the next batch.
         """
 
         # Clear all existing errors
@@ -342,39 +374,39 @@ class TestConfigResolver:
         resolved_tests = []
         # Test that are ready to resolve. Note that these may be multiplied out.
         ready_to_resolve = []
-        while raw_tests:
+        # An iterator over the permutations of the raw test we're currently working on.
+        permutations = None
+        while raw_tests or permutations is not None:
             # Number of tests this will resolve too after repeats
             ready_count = 0
 
-            # Get permutations from raw tests until we've hit our batch limit.
-            while len(resolved_tests) + ready_count < batch_size and raw_tests:
+            # Get permutations from raw tests until we've hit our batch limit. These
+            # are generated lazily, so only those needed for this batch are created.
+            while len(resolved_tests) + ready_count < batch_size:
+                if permutations is None:
+                    if not raw_tests:
+                        break
 
-                raw_test = raw_tests.pop()
+                    raw_test = raw_tests.pop()
+                    try:
+                        permutations = raw_test.iter_permutations()
+                    except TestConfigError as err:
+                        self.errors.append(err)
+                        break
 
-                # Resolve all configuration permutations.
                 try:
-                    permutations = raw_test.resolve_permutations()
+                    ptest = next(permutations)
+                except StopIteration:
+                    permutations = None
+                    continue
                 except TestConfigError as err:
                     self.errors.append(err)
+                    permutations = None
                     break
 
-                if not permutations:
-                    continue
-
-                batch_remain = batch_size - len(resolved_tests) - ready_count - len(permutations)
-                ready_count += len(permutations)
-                raw_test.count -= 1
-                while raw_test.count and batch_remain > 0:
-                    raw_test.count -= 1
-                    batch_remain -= len(permutations)
-                    ready_count += len(permutations)
-                    for ptest in permutations:
-                        ptest.count += 1
-
-                if raw_test.count:
-                    raw_tests.append(raw_test)
-
-                ready_to_resolve.extend(permutations)
+                # Repeated tests are resolved once, and copied afterwards.
+                ready_count += ptest.count
+                ready_to_resolve.append(ptest)
 
             # Now resolve all the string syntax and variables those tests at once.
             new_resolved_tests = []
@@ -439,8 +471,24 @@ class TestConfigResolver:
 
         return all_tests
 
+    def _template_cache_dir(self) -> Union[Path, None]:
+        """The on-disk template cache to use while resolving, if it's enabled."""
+
+        if self.pav_cfg.get('template_cache') and self.pav_cfg.get('working_dir'):
+            return self.pav_cfg.working_dir/parsers.TEMPLATE_CACHE_DIR
+
+        return None
+
     def _resolve_escapes(self, ptests: ProtoTest) -> List[ProtoTest]:
-        """Resolve string escapes and variable references in parallel for the given tests."""
+        """Resolve string escapes and variable references in parallel for the given
+        tests. The worker pool is forked (when first needed) with the template cache
+        set, so the workers use it too."""
+
+        with parsers.template_cache_dir(self._template_cache_dir()):
+            return self._resolve_ptests(ptests)
+
+    def _resolve_ptests(self, ptests: ProtoTest) -> List[ProtoTest]:
+        """Do the actual resolving for _resolve_escapes()."""
 
         complete = 0
         test_count = len(ptests)
@@ -453,45 +501,37 @@ class TestConfigResolver:
             except TestConfigError as err:
                 self.errors.append(err)
         else:
-            async_results = []
-            proc_count = min(self.pav_cfg['max_cpu'], len(ptests))
-            with mp.Pool(processes=proc_count) as pool:
-                for ptest in ptests:
-                    aresult = pool.apply_async(ptest.resolve)
-                    async_results.append((aresult, ptest))
-
-                while async_results:
-                    not_ready = []
-                    for aresult, ptest in list(async_results):
-                        if aresult.ready():
-                            try:
-                                # Update the local copy of the proto_test config with the one
-                                # process in the external process.
-                                ptest.update_config(aresult.get())
-                            except TestConfigError as err:
-                                self.errors.append(err)
-                                ptests.remove(ptest)
-                            except Exception as err:  # pylint: disable=broad-except
-                                self.errors.append(TestConfigError("Unexpected error loading tests",
-                                                                   ptest.request, err))
-                                ptests.remove(ptest)
-
-                            if self._verbosity == Verbose.DYNAMIC:
-                                complete += 1
-                                progress = test_count - complete
-                                progress = 1 - progress/test_count
-                                output.fprint(self._outfile,
-                                              "Resolving Test Configs: {:.0%}".format(progress),
-                                              end='\r')
-                        else:
-                            not_ready.append((aresult, ptest))
-                    async_results = not_ready
-
-                    if async_results:
-                        try:
-                            async_results[0][0].wait(0.5)
-                        except TimeoutError:
-                            pass
+            chunks = self._chunk_ptests(ptests)
+            failed = set()
+
+            tasks = ((chunk_id, chunk[0].request, chunk[0].config,
+                      [ptest.var_man for ptest in chunk])
+                     for chunk_id, chunk in enumerate(chunks))
+
+            # Results come back as each chunk finishes, in whatever order that happens.
+            for chunk_id, results in self._get_pool().imap_unordered(_resolve_chunk, tasks):
+                for ptest, res in zip(chunks[chunk_id], results):
+                    if isinstance(res, TestConfigError):
+                        self.errors.append(res)
+                        failed.add(id(ptest))
+                    elif isinstance(res, Exception):
+                        self.errors.append(TestConfigError("Unexpected error loading tests",
+                                                           ptest.request, res))
+                        failed.add(id(ptest))
+                    else:
+                        # Update the local copy of the proto_test config with the one
+                        # resolved in the worker process.
+                        ptest.update_config(res)
+
+                if self._verbosity == Verbose.DYNAMIC:
+                    complete += len(results)
+                    progress = complete/test_count
+                    output.fprint(self._outfile,
+                                  "Resolving Test Configs: {:.0%}".format(progress),
+                                  end='\r')
+
+            if failed:
+                ptests = [ptest for ptest in ptests if id(ptest) not in failed]
 
         if self._verbosity == Verbose.DYNAMIC:
             output.fprint(self._outfile, '')
@@ -517,6 +557,53 @@ class TestConfigResolver:
 
         return multiplied_tests
 
+    RESOLVE_CHUNKS_PER_PROC = 4
+    """Split the tests to resolve into about this many chunks for each worker
+    process. More chunks balance the load better, but each chunk has to carry a
+    copy of its test config."""
+
+    def _chunk_ptests(self, ptests: List[ProtoTest]) -> List[List[ProtoTest]]:
+        """Split the given tests into chunks to resolve in the worker pool. Every
+        test in a chunk shares the same (unresolved) config, as permutations of the
+        same test do, so it only has to be sent to the worker once per chunk."""
+
+        chunk_size = math.ceil(len(ptests)
+                               / (self.pav_cfg['max_cpu'] * self.RESOLVE_CHUNKS_PER_PROC))
+
+        by_config = {}
+        for ptest in ptests:
+            key = (id(ptest.config), id(ptest.request))
+            by_config.setdefault(key, []).append(ptest)
+
+        chunks = []
+        for cfg_ptests in by_config.values():
+            for i in range(0, len(cfg_ptests), chunk_size):
+                chunks.append(cfg_ptests[i:i + chunk_size])
+
+        return chunks
+
+    def _get_pool(self) -> mp.Pool:
+        """Return the worker pool for resolving tests, creating it if needed. The
+        pool is kept for the life of the resolver (or until close() is called)."""
+
+        if self._pool is None:
+            self._pool = mp.Pool(processes=self.pav_cfg['max_cpu'])
+            # Make sure the worker processes go away with the resolver.
+            self._pool_finalizer = weakref.finalize(self, self._pool.terminate)
+
+        return self._pool
+
+    def close(self):
+        """Shut down the resolver's worker pool, if there is one. It will be
+        recreated if more tests are resolved."""
+
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool_finalizer.detach()
+            self._pool = None
+            self._pool_finalizer = None
+
     def _load_raw_config(self, name: str, config_type: str, optional=False) \
             -> Tuple[Any, Union[Path, None], Union[str, None]]:
         """Load the given raw test config file. It can be a host, mode, or suite file.
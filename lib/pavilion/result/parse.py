@@ -2,6 +2,9 @@
 from collections import defaultdict, OrderedDict
 import glob
 import inspect
+import io
+import locale
+import mmap
 import pprint
 import re
 import traceback
@@ -10,7 +13,7 @@ from multiprocessing import Pool
 from pathlib import Path
 from typing import List, Union, Dict, Any, TextIO, Pattern, Tuple, NewType
 
-from pavilion.result_parsers import ResultParser, get_plugin
+from pavilion.result_parsers import ResultParser, Regex, get_plugin
 from pavilion.utils import IndentedLog
 from .base import RESULT_ERRORS
 from ..errors import ResultError
@@ -68,7 +71,7 @@ class KeySet:
         self.config = config
 
 
-ProcessFileArgs = NewType('ProcessFileArgs', Tuple[Path, List[KeySet]])
+ProcessFileArgs = NewType('ProcessFileArgs', Tuple[Path, List[KeySet], int])
 
 
 def parse_results(pav_cfg, test, results: Dict, base_log: IndentedLog) -> None:
@@ -150,7 +153,8 @@ configured for that test.
     log.indent(pprint.pformat(dict(file_order)))
 
     # Setup up the argument tuples for mapping to multiple processes.
-    file_tuples = [ProcessFileArgs((file, parse_tuples))
+    mmap_threshold = pav_cfg['result_mmap_threshold'] * 1024**2
+    file_tuples = [ProcessFileArgs((file, parse_tuples, mmap_threshold))
                    for file, parse_tuples in file_key_sets.items()]
 
     # Start result parsing from each file in a separate thread.
@@ -227,61 +231,140 @@ class ProcessedKey:
         self.value = value
 
 
-def process_file(args: Tuple[Path, List[KeySet]]) -> \
-        Tuple[List[ProcessedKey], IndentedLog]:
-    """Given a file and list of Key/Parser items, parse the file for each
-    key. Returns the list of results as a (key, file, value) tuple, and the log data."""
-    path, key_sets = args
+class MappedFile:
+    """A read-only, seekable text file backed by a memory map, for parsing results
+    from large files without reading them into memory. It supports the subset of
+    the TextIO interface that result parsers use (readline, iteration, read, seek
+    and tell). Positions are byte offsets, and lines are decoded as they're read.
+    Like a file opened in text mode, '\\r\\n' line endings are given as '\\n'.
 
-    log = IndentedLog()
+    Use as a context manager, or close() when done."""
 
-    file_results = []
+    def __init__(self, path: Path, encoding: str = None):
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self._pos = 0
 
-    log("Parsing each key for file {}".format(path.as_posix()))
+        with path.open('rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
 
-    with path.open(errors='replace') as file:
-        # If we have to go through the file more than once, just read the whole thing
-        #  memory.
-        if len(key_sets) > 1:
-            log("Reading entire file for in-memory processing.")
-            file = StringIO(file.read())
+    def __enter__(self):
+        return self
 
-        for key_set in key_sets:
-            parser = get_plugin(key_set.parser_name)
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
 
-            log("Parsing results for key '{}'".format(key_set.key))
+    def close(self):
+        """Release the memory map."""
 
-            # Seek to the beginning of the file for each parse action.
-            file.seek(0)
+        self._map.close()
 
-            # Get the result for a single key and file.
-            result, rlog = parse_result(key_set.key, key_set.config, file, parser)
-            log.indent(rlog)
+    def _decode(self, data: bytes) -> str:
+        """Decode the given data the same way a text mode file would."""
 
-            if isinstance(result, ParseErrorMsg):
-                result.path = path
-                file_results.append(ProcessedKey(RESULT_ERRORS, path, str(result)))
-                # Add a None/NULL result for the key on an error.
-                file_results.append(ProcessedKey(key_set.key, path, None))
-            else:
-                file_results.append(ProcessedKey(key_set.key, path, result))
+        return data.decode(self.encoding, errors='replace').replace('\r\n', '\n')
 
-    return file_results, log
+    def readline(self) -> str:
+        """Read the next line (including the newline)."""
 
+        end = self._map.find(b'\n', self._pos)
+        end = len(self._map) if end == -1 else end + 1
 
-def parse_result(key: str, parser_cfg: Dict, file: TextIO, parser: ResultParser) \
-        -> Tuple[Union[ParseErrorMsg, str], IndentedLog]:
-    """Use a result parser and it's settings to parse a single value from a file.
+        line = self._map[self._pos:end]
+        self._pos = end
+        return self._decode(line)
 
-    :param key: The key we're parsing.
-    :param parser_cfg: The parser config dict.
-    :param file: The file from which to extract the result.
-    :param parser: The result parser plugin object.
-    :returns: The parsed value
-    """
+    def read(self, size: int = -1) -> str:
+        """Read (up to size bytes of) the rest of the file."""
+
+        end = len(self._map) if size is None or size < 0 else self._pos + size
+        data = self._map[self._pos:end]
+        self._pos += len(data)
+        return self._decode(data)
+
+    def tell(self) -> int:
+        """Return the current (byte) position."""
+
+        return self._pos
+
+    def seek(self, pos: int, whence: int = io.SEEK_SET) -> int:
+        """Seek to the given (byte) position."""
+
+        if whence == io.SEEK_CUR:
+            pos += self._pos
+        elif whence == io.SEEK_END:
+            pos += len(self._map)
+
+        self._pos = max(0, min(pos, len(self._map)))
+        return self._pos
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        line = self.readline()
+        if line == '':
+            raise StopIteration
+        return line
+
+
+def process_file(args: ProcessFileArgs) -> Tuple[List[ProcessedKey], IndentedLog]:
+    """Given a file and list of Key/Parser items, parse the file for each
+    key. Returns the list of results as a (key, file, value) tuple, and the log data.
+    Files of at least mmap_threshold bytes are memory mapped rather than read into
+    memory, when we need to seek within them."""
+    path, key_sets, mmap_threshold = args
 
     log = IndentedLog()
 
+    file_results = []
+
+    log("Parsing each key for file {}".format(path.as_posix()))
+
+    key_parsers = [KeyParser(key_set) for key_set in key_sets]
+
+    try:
+        with path.open(errors='replace') as file:
+            # Parsers that read beyond the matched line need to be able to seek
+            # around in the file. Otherwise we just stream it.
+            if any(kparser.needs_seek for kparser in key_parsers):
+                size = path.stat().st_size
+                if size >= mmap_threshold and size > 0:
+                    log("Memory mapping file for processing.")
+                    with MappedFile(path) as mfile:
+                        parse_keys(mfile, key_parsers)
+                else:
+                    if len(key_sets) > 1:
+                        log("Reading entire file for in-memory processing.")
+                        file = StringIO(file.read())
+                    parse_keys(file, key_parsers)
+            else:
+                parse_keys(file, key_parsers)
+    except OSError as err:
+        for kparser in key_parsers:
+            if not kparser.done:
+                kparser.set_error(ParseErrorMsg(kparser.parser,
+                                                "Error reading file: {}".format(err)))
+
+    for kparser in key_parsers:
+        log.indent(kparser.log)
+        result = kparser.result()
+
+        if isinstance(result, ParseErrorMsg):
+            result.path = path
+            file_results.append(ProcessedKey(RESULT_ERRORS, path, str(result)))
+            # Add a None/NULL result for the key on an error.
+            file_results.append(ProcessedKey(kparser.key, path, None))
+        else:
+            file_results.append(ProcessedKey(kparser.key, path, result))
+
+    return file_results, log
+
+
+def _prepare_key(key: str, parser_cfg: Dict, parser: ResultParser, log: IndentedLog) \
+        -> Union[ParseErrorMsg, Tuple[dict, Union[int, str], List[Pattern]]]:
+    """Get everything needed to parse the given key: the parser specific
+    arguments, the match index, and the compiled position regexes."""
+
     # Grab these for local use.
     action_name = parser_cfg['action']
     if key == 'result' and action_name not in (ACTION_FALSE, ACTION_TRUE):
@@ -299,15 +382,321 @@ def parse_result(key: str, parser_cfg: Dict, file: TextIO, parser: ResultParser)
 
     # Compile the regexes for finding the appropriate lines on which to
     # call the result parser.
-    match_cond_rex = [re.compile(cond) for cond in parser_cfg['preceded_by']]
-    match_cond_rex.append(re.compile(parser_cfg['for_lines_matching']))
+    try:
+        match_cond_rex = [re.compile(cond) for cond in parser_cfg['preceded_by']]
+        match_cond_rex.append(re.compile(parser_cfg['for_lines_matching']))
+    except (re.error, TypeError) as err:
+        return ParseErrorMsg(parser, "Invalid 'preceded_by' or 'for_lines_matching' "
+                                     "regex: {}".format(err), key)
 
     # Check the arguments and remove any that aren't specific to this result
     # parser.
     try:
         stripped_cfg = parser.check_args(**parser_cfg.copy())
     except ResultError as err:
-        return ParseErrorMsg(parser, err.args[0], key), log
+        return ParseErrorMsg(parser, err.args[0], key)
+
+    return stripped_cfg, match_idx, match_cond_rex
+
+
+class KeyParser:
+    """Parses the results for a single key from a file as part of a single pass
+    over that file (see parse_keys()). Keys are processed in groups that share
+    the same position regexes, so each KeyParser only has to deal with lines on
+    which those have matched."""
+
+    def __init__(self, key_set: KeySet):
+        self.key = key_set.key
+        self.parser = get_plugin(key_set.parser_name)
+        self.log = IndentedLog()
+        self.matches = []
+        self.error = None  # type: Union[ParseErrorMsg, None]
+        self.done = False
+
+        self.log("Parsing results for key '{}'".format(self.key))
+
+        prepared = _prepare_key(self.key, key_set.config, self.parser, self.log)
+        if isinstance(prepared, ParseErrorMsg):
+            self.set_error(prepared)
+            self.args, self.match_idx, self.pos_regexes = {}, None, []
+        else:
+            self.args, self.match_idx, self.pos_regexes = prepared
+
+        # Regex parsers only look at the matched line, so we can apply them
+        # directly (and combine them with other regex parsers).
+        self.regex = None
+        if isinstance(self.parser, Regex) and not self.done:
+            self.regex = self.args['regex']
+
+    @property
+    def needs_seek(self) -> bool:
+        """Whether the parser needs the file positioned at the matched line."""
+
+        return not self.parser.SINGLE_LINE and not self.done
+
+    def set_error(self, error: ParseErrorMsg):
+        """Record a parse error; this key is done parsing."""
+
+        error.key = self.key
+        self.log(str(error))
+        self.error = error
+        self.done = True
+
+    def add_match(self, res):
+        """Add the parsed result for a matched position."""
+
+        if res is not None and not (self.match_idx == MATCH_UNIQ and res in self.matches):
+            self.matches.append(res)
+            self.log("Parser extracted result '{}'".format(res))
+
+        # Stop extracting when we get to the asked for match index.
+        if isinstance(self.match_idx, int) and 0 <= self.match_idx < len(self.matches):
+            self.log("Got needed number of results, ending search.")
+            self.done = True
+
+    def parse_line(self, line: str):
+        """Parse a matched line, for parsers that only need that line."""
+
+        if self.regex is not None:
+            self.add_match(Regex.match_line(line, self.regex))
+        else:
+            self.parse_at(StringIO(line), 0, 0)
+
+    def parse_at(self, file: TextIO, pos: int, next_pos: int):
+        """Call the parser with the file positioned at the matched line, then
+        return the file to the start of the next line."""
+
+        file.seek(pos)
+        try:
+            res = self.parser(file, **self.args)
+        except (ValueError, LookupError, OSError) as err:
+            self.log("Error calling result parser {}.".format(self.parser.name))
+            self.log(traceback.format_exc())
+            self.set_error(ParseErrorMsg(self.parser, "Parser error in {} parser: {}"
+                                         .format(self.parser.name, err)))
+            return
+        except Exception as err:  # pylint: disable=W0703
+            self.log(traceback.format_exc())
+            self.set_error(ParseErrorMsg(self.parser, "UnexpectedError: {}".format(err)))
+            return
+        finally:
+            file.seek(next_pos)
+
+        self.add_match(res)
+
+    def result(self) -> Any:
+        """Return the final result (or error) for this key."""
+
+        if self.error is not None:
+            return self.error
+
+        if self.match_idx in (MATCH_ALL, MATCH_UNIQ):
+            res = self.matches
+        else:
+            try:
+                res = self.matches[self.match_idx]
+            except IndexError:
+                self.log("Match select index '{}' out of range. There were only {} "
+                         "matches.".format(self.match_idx, len(self.matches)))
+                res = None
+
+        self.log("Got result '{}' for key '{}'".format(res, self.key))
+        return res
+
+
+class _PositionGroup:
+    """The keys that share a sequence of position regexes, along with the state
+    needed to find the (non-overlapping) runs of lines that match them. This
+    finds the same positions as advance_file()."""
+
+    def __init__(self, regexes: List[Pattern]):
+        self.regexes = regexes
+        # The default position regex (a single '') matches every line.
+        self.every_line = [rex.pattern for rex in regexes] == ['']
+        # How many of our regexes the lines ending at the current one match.
+        # There can be more than one such run in progress at a time.
+        self.progress = set()
+        self.regex_keys = []  # type: List[KeyParser]
+        # Keys for other parsers that only need the matched line.
+        self.line_keys = []  # type: List[KeyParser]
+        # Keys whose parsers need the file positioned at the matched line.
+        self.other_keys = []  # type: List[KeyParser]
+        # A pre-filter for the regex keys, when they can be combined.
+        self.combined = None
+
+    def setup(self):
+        """Combine the regexes of our regex keys into a single pre-filter, so that
+        most lines can be rejected for all of them at once."""
+
+        if len(self.regex_keys) < 2:
+            return
+
+        patterns = []
+        for kparser in self.regex_keys:
+            pattern = kparser.regex.pattern
+            # Back-references and global inline flags don't survive being combined.
+            if _UNCOMBINABLE_RE.search(pattern):
+                return
+            patterns.append('(?:{})'.format(pattern))
+
+        flags = {kparser.regex.flags for kparser in self.regex_keys}
+        if len(flags) != 1:
+            return
+
+        try:
+            self.combined = re.compile('|'.join(patterns), flags.pop())
+        except re.error:
+            self.combined = None
+
+    def advance(self, line: str, matched) -> bool:
+        """Advance the state machine by a line. Returns True if the line completes
+        a matching run. The matched callable returns whether a line matches
+        the given regex (so results can be shared across groups)."""
+
+        if self.every_line:
+            return True
+
+        regexes = self.regexes
+        progress = {count + 1 for count in self.progress | {0}
+                    if matched(regexes[count], line)}
+
+        if len(regexes) in progress:
+            # Matching runs can't overlap, so start over after this line.
+            self.progress = set()
+            return True
+
+        self.progress = progress
+        return False
+
+    @property
+    def active(self) -> bool:
+        """Whether any keys in this group still need to parse."""
+
+        return any(not kparser.done for kparser in self.keys)
+
+    @property
+    def keys(self) -> List[KeyParser]:
+        """All keys in this group."""
+
+        return self.regex_keys + self.line_keys + self.other_keys
+
+
+_UNCOMBINABLE_RE = re.compile(r'\\[1-9]|\(\?P=|\(\?[aiLmsux]+\)')
+
+
+def parse_keys(file: TextIO, key_parsers: List[KeyParser]) -> None:
+    """Parse all the given keys in a single pass through the file. Keys with the
+    same position regexes ('preceded_by' and 'for_lines_matching') share the work of
+    finding those positions, and each unique position regex is only evaluated once
+    per line. Results are left in each of the KeyParser objects.
+
+    :param file: The file to parse. It only needs to support seeking if any of the
+        key parsers need it.
+    :param key_parsers: The keys to parse.
+    """
+
+    groups = {}  # type: Dict[Tuple[Tuple[str, int], ...], _PositionGroup]
+    for kparser in key_parsers:
+        if kparser.done:
+            continue
+
+        group_key = tuple((rex.pattern, rex.flags) for rex in kparser.pos_regexes)
+        if group_key not in groups:
+            groups[group_key] = _PositionGroup(kparser.pos_regexes)
+        group = groups[group_key]
+
+        if kparser.regex is not None:
+            group.regex_keys.append(kparser)
+        elif kparser.needs_seek:
+            group.other_keys.append(kparser)
+        else:
+            group.line_keys.append(kparser)
+
+    for group in groups.values():
+        group.setup()
+
+    groups = list(groups.values())
+    seek = any(group.other_keys for group in groups)
+
+    # Per line cache of position regex results.
+    line_matches = {}
+
+    def matched(regex, line):
+        """Whether the regex matches the line, caching the result for the line."""
+        try:
+            return line_matches[regex]
+        except KeyError:
+            result = line_matches[regex] = (regex.pattern == ''
+                                            or regex.search(line) is not None)
+            return result
+
+    line_num = 0
+    pos = next_pos = file.tell() if seek else None
+    try:
+        while groups:
+            line = file.readline()
+            if line == '':
+                break
+            line_num += 1
+
+            if seek:
+                pos = next_pos
+                next_pos = file.tell()
+
+            line_matches.clear()
+
+            for group in groups:
+                if not group.advance(line, matched):
+                    continue
+
+                if group.regexes[-1].pattern != '':
+                    for kparser in group.keys:
+                        if not kparser.done:
+                            kparser.log("Found potential match at line {} in file."
+                                        .format(line_num))
+
+                if group.combined is None or group.combined.search(line) is not None:
+                    for kparser in group.regex_keys:
+                        if not kparser.done:
+                            kparser.parse_line(line)
+
+                for kparser in group.line_keys:
+                    if not kparser.done:
+                        kparser.parse_line(line)
+
+                for kparser in group.other_keys:
+                    if not kparser.done:
+                        kparser.parse_at(file, pos, next_pos)
+
+            # Drop any groups that don't have anything left to do.
+            if any(not group.active for group in groups):
+                groups = [group for group in groups if group.active]
+
+    except OSError as err:
+        for kparser in key_parsers:
+            if not kparser.done:
+                kparser.set_error(ParseErrorMsg(kparser.parser,
+                                                "Error reading file: {}".format(err)))
+
+
+def parse_result(key: str, parser_cfg: Dict, file: TextIO, parser: ResultParser) \
+        -> Tuple[Union[ParseErrorMsg, str], IndentedLog]:
+    """Use a result parser and it's settings to parse a single value from a file,
+    independently of any other keys (see parse_keys() for parsing many at once).
+
+    :param key: The key we're parsing.
+    :param parser_cfg: The parser config dict.
+    :param file: The file from which to extract the result.
+    :param parser: The result parser plugin object.
+    :returns: The parsed value
+    """
+
+    log = IndentedLog()
+
+    prepared = _prepare_key(key, parser_cfg, parser, log)
+    if isinstance(prepared, ParseErrorMsg):
+        return prepared, log
+    stripped_cfg, match_idx, match_cond_rex = prepared
 
     try:
         res, elog = extract_result(
@@ -106,6 +106,11 @@ take a `file` argument and kwargs to match the config arguments.
     """Let the user know they can't set these config keys for this result
     parser, effectively forcing the value to the default."""
 
+    SINGLE_LINE = False
+    """Parsers that never read past the first line of the file they're given can
+    set this. They may then be given a file containing just that line, which
+    lets the file be parsed as a stream."""
+
     def __init__(self, name, description, defaults=None,
                  config_elems=None, validators=None,
                  priority=PRIO_COMMON):
@@ -11,6 +11,8 @@ class Command(base_classes.ResultParser):
 
     FORCE_DEFAULTS = ['match_select', 'files', 'per_file']
 
+    SINGLE_LINE = True
+
     def __init__(self):
         super().__init__(
             name='command',
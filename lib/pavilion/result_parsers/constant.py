@@ -15,6 +15,8 @@ class Constant(ResultParser):
         'preceded_by',
     ]
 
+    SINGLE_LINE = True
+
     def __init__(self):
         super().__init__(
             name='constant',
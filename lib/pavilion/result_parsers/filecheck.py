@@ -8,6 +8,8 @@ class Filecheck(base_classes.ResultParser):
 
     FORCE_DEFAULTS = ['match_select']
 
+    SINGLE_LINE = True
+
     def __init__(self):
         super().__init__(
             name='filecheck',
@@ -12,6 +12,8 @@ class Regex(ResultParser):
     """Find matches to the given regex in the given file. The matched string
     or strings are returned as the result."""
 
+    SINGLE_LINE = True
+
     def __init__(self):
         super().__init__(
             name='regex',
@@ -54,17 +56,21 @@ class Regex(ResultParser):
     # pylint: disable=arguments-differ
     def __call__(self, file, regex=None):
 
-        cregex = re.compile(regex)
+        return self.match_line(file.readline(), re.compile(regex))
+
+    @staticmethod
+    def match_line(line: str, regex):
+        """Get the result (if any) for the given (compiled) regex from a single
+        line. The result parsing engine calls this directly when it can."""
 
-        line = file.readline()
-        match = cregex.search(line)
+        match = regex.search(line)
 
         if match is None:
             return None
 
-        if cregex.groups == 0:
+        if regex.groups == 0:
             return match.group()
-        elif cregex.groups == 1:
+        elif regex.groups == 1:
             return match.groups()[0]
         else:
             return list(match.groups())
@@ -7,6 +7,8 @@ from pavilion.result_parsers import base_classes
 class Split(base_classes.ResultParser):
     """Split a line by some substring, and return the list of parts."""
 
+    SINGLE_LINE = True
+
     def __init__(self):
         super().__init__(
             name='split',
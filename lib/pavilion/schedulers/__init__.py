@@ -1,4 +1,5 @@
 """This module organizes the builtin scheduler plugins."""
+from collections import defaultdict
 from typing import Union
 
 from .plugins.raw import Raw
@@ -9,7 +10,7 @@ from .basic import SchedulerPluginBasic
 from .config import validate_config
 from .scheduler import (SchedulerPlugin, KickoffScriptHeader,
                         _SCHEDULER_PLUGINS)
-from ..errors import SchedulerPluginError
+from ..errors import SchedulerPluginError, TestRunError
 from ..types import NodeInfo, Nodes, NodeList, NodeSet
 from .vars import SchedulerVariables
 
@@ -57,3 +58,35 @@ def list_plugins():
         raise SchedulerPluginError("Scheduler Plugins aren't loaded.")
 
     return list(_SCHEDULER_PLUGINS.keys())
+
+
+def prefetch_job_statuses(pav_cfg, tests):
+    """Have each scheduler plugin fetch (and cache) the job statuses for the given
+    tests in bulk, so that subsequent job_status() calls on each test don't each
+    have to query the scheduler.
+
+    :param pav_cfg: The pavilion configuration.
+    :param list tests: The tests to get job statuses for. Tests whose
+        scheduler isn't known are skipped; they'll report any error when their
+        status is checked individually.
+    """
+
+    sched_tests = defaultdict(list)
+    for test in tests:
+        # The scheduler name is saved with the test's attributes, so this doesn't
+        # have to load its config. Older tests only have it in their config.
+        sched_name = test.sched_name
+        if sched_name is None:
+            try:
+                sched_name = test.scheduler
+            except TestRunError:
+                continue
+        sched_tests[sched_name].append(test)
+
+    for sched_name, s_tests in sched_tests.items():
+        try:
+            sched = get_plugin(sched_name)
+        except SchedulerPluginError:
+            continue
+
+        sched.prefetch_job_statuses(pav_cfg, s_tests)
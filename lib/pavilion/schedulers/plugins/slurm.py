@@ -6,7 +6,7 @@ import re
 import shutil
 import subprocess
 import time
-from typing import List, Union, Any, Tuple
+from typing import List, Union, Any, Tuple, Dict
 
 import hostlist
 import yaml_config as yc
@@ -717,12 +717,18 @@ class Slurm(SchedulerPluginAdvanced):
                       .format(job_info['id'])),
                 when=time.time())
 
-        job_state = job_data.get('JobState', 'UNKNOWN')
+        return self._state_to_status(job_info['id'], job_data.get('JobState', 'UNKNOWN'),
+                                     job_data.get('Reason'))
+
+    def _state_to_status(self, job_id: str, job_state: str,
+                         reason: Union[str, None]) -> TestStatusInfo:
+        """Map a slurm job state to a Pavilion status."""
+
         if job_state in self.SCHED_WAITING:
             return TestStatusInfo(
                 state=STATES.SCHEDULED,
                 note=("Job {} has state '{}', reason '{}'"
-                      .format(job_info['id'], job_state, job_info.get('Reason'))),
+                      .format(job_id, job_state, reason)),
                 when=time.time()
             )
         elif job_state in self.SCHED_RUN:
@@ -749,10 +755,86 @@ class Slurm(SchedulerPluginAdvanced):
         return TestStatusInfo(
             state=STATES.SCHEDULED,
             note="Job '{}' has unknown/unhandled job state '{}'. We have no "
-                 "idea what is going on.".format(job_info['id'], job_state),
+                 "idea what is going on.".format(job_id, job_state),
             when=time.time()
         )
 
+    def _job_statuses_bulk(self, pav_cfg, job_infos: Dict[str, JobInfo]) \
+            -> Dict[str, TestStatusInfo]:
+        """Get the status of all the given jobs with a single squeue call. Jobs that
+        squeue no longer knows about are looked up with a single sacct call."""
+
+        sys_name = sys_vars.get_vars(True)['sys_name']
+        job_names = {}
+        for job_name, job_info in job_infos.items():
+            # Jobs from other clusters are handled (quickly) by _job_status.
+            if job_info.get('sys_name') == sys_name and 'id' in job_info:
+                job_names[job_info['id']] = job_name
+
+        if not job_names:
+            return {}
+
+        job_states = self._parse_job_states(self._status_query(
+            ['squeue', '--noheader', '--states=all',
+             '--jobs={}'.format(','.join(job_names)),
+             '--format=%i|%T|%r']))
+
+        missing = [job_id for job_id in job_names if job_id not in job_states]
+        if missing:
+            job_states.update(self._parse_job_states(self._status_query(
+                ['sacct', '--noheader', '--parsable2', '--allocations',
+                 '--jobs={}'.format(','.join(missing)),
+                 '--format=JobID,State'])))
+
+        statuses = {}
+        for job_id, (job_state, reason) in job_states.items():
+            if job_id in job_names:
+                statuses[job_names[job_id]] = self._state_to_status(
+                    job_id, job_state, reason)
+
+        return statuses
+
+    @staticmethod
+    def _status_query(cmd: List[str], timeout=10) -> str:
+        """Run the given squeue/sacct command and return its output. Failures
+        just give empty output, as this is only a shortcut for _job_status."""
+
+        try:
+            proc = subprocess.Popen(cmd,
+                                    stdout=subprocess.PIPE,
+                                    stderr=subprocess.DEVNULL)
+        except OSError:
+            return ''
+
+        try:
+            stdout, _ = proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            return ''
+
+        # Squeue exits with an error when given ids it doesn't know about, but still
+        # reports on the ones it does.
+        return stdout.decode('utf8', errors='replace')
+
+    @staticmethod
+    def _parse_job_states(output: str) -> Dict[str, Tuple[str, Union[str, None]]]:
+        """Parse '|' separated 'job_id|state[|reason]' lines from squeue or sacct
+        into a dict of job_id -> (state, reason)."""
+
+        job_states = {}
+        for line in output.splitlines():
+            parts = line.strip().split('|')
+            if len(parts) < 2 or not parts[0] or not parts[1]:
+                continue
+
+            # Sacct gives states like 'CANCELLED by 1234'.
+            job_state = parts[1].split()[0]
+            reason = parts[2] if len(parts) > 2 else None
+            job_states[parts[0]] = job_state, reason
+
+        return job_states
+
     def cancel(self, job_info: JobInfo) -> Union[str, None]:
         """Scancel the job attached to the given test."""
 
@@ -143,10 +143,10 @@ class SchedulerPlugin(IPlugin.IPlugin):
     def _job_status(self, pav_cfg, job_info: JobInfo) -> Union[TestStatusInfo, None]:
         """Override this to provide job status information given a job_info dict.
         The format of the job_info is scheduler dependent, and produced in the
-        kickoff method. This can, optionally, set the job status for all jobs it can
-        at once in the _job_statuses dict, which would greatly reduce the number of
-        calls to the scheduler. It will only be called if a status hasn't been
-        recently cached.
+        kickoff method. Plugins that can query many jobs at once should also
+        override _job_statuses_bulk(), which greatly reduces the number of calls to
+        the scheduler. This will only be called if a status hasn't been recently
+        cached.
 
         It should return a TestStatusInfo object with one of these states:
 
@@ -166,6 +166,20 @@ class SchedulerPlugin(IPlugin.IPlugin):
 
         raise NotImplementedError
 
+    def _job_statuses_bulk(self, pav_cfg, job_infos: Dict[str, JobInfo]) \
+            -> Dict[str, TestStatusInfo]:
+        """Override this to get the status of many jobs with a single query to the
+        scheduler. The job_infos dict maps job names to their job info, and the
+        returned dict should map those names to a status exactly like those
+        returned by _job_status(). Jobs left out of the result will be queried
+        individually through _job_status() instead.
+
+        The default does nothing, which is always correct if not efficient."""
+
+        _ = self, pav_cfg, job_infos
+
+        return {}
+
     def cancel(self, job_info: JobInfo) -> Union[str, None]:
         """Do your best to cancel the given job. A return of None denotes success.
 
@@ -291,6 +305,44 @@ class SchedulerPlugin(IPlugin.IPlugin):
 
     JOB_STATUS_TIMEOUT = 1
 
+    def prefetch_job_statuses(self, pav_cfg, tests: List[TestRun]):
+        """Get the scheduler status of the jobs for all the given tests at once, and
+        cache them for job_status(). Only jobs without a recently cached status are
+        queried.
+
+        :param pav_cfg: The pavilion configuration.
+        :param tests: The tests to get job statuses for. These should all be
+            tests that use this scheduler.
+        """
+
+        now = time.time()
+        job_infos = {}
+        for test in tests:
+            job = test.job
+            if job is None or job.name in job_infos:
+                continue
+
+            if job.name in self._job_statuses:
+                timestamp, _ = self._job_statuses[job.name]
+                if now < timestamp + self.JOB_STATUS_TIMEOUT:
+                    continue
+
+            try:
+                job_info = job.info
+            except JobError:
+                continue
+
+            if job_info is not None:
+                job_infos[job.name] = job_info
+
+        if not job_infos:
+            return
+
+        statuses = self._job_statuses_bulk(pav_cfg, job_infos)
+        now = time.time()
+        for job_name, status in statuses.items():
+            self._job_statuses[job_name] = now, status
+
     def job_status(self, pav_cfg, test) -> TestStatusInfo:
         """Get the job state from the scheduler, and map it to one of the
         of the following states: SCHEDULED, SCHED_ERROR, SCHED_CANCELLED,
@@ -315,15 +367,16 @@ class SchedulerPlugin(IPlugin.IPlugin):
             return TestStatusInfo(
                 STATES.SCHED_ERROR, "Could not retrieve job's scheduler info.")
 
-        if test.job.name in self._job_statuses:
-            timestamp, status = self._job_statuses[test.job.name]
-            if time.time() < timestamp + self.JOB_STATUS_TIMEOUT:
-                return status
-
-        status = self._job_status(pav_cfg, job_info)
+        # Cached statuses (possibly from prefetch_job_statuses) still need to be
+        # handled below, as they may be shared by several tests.
+        cached = self._job_statuses.get(test.job.name)
+        if cached is not None and time.time() < cached[0] + self.JOB_STATUS_TIMEOUT:
+            status = cached[1]
+        else:
+            status = self._job_status(pav_cfg, job_info)
 
-        if status is not None:
-            self._job_statuses[test.job.name] = time.time(), status
+            if status is not None:
+                self._job_statuses[test.job.name] = time.time(), status
 
         if status is None:
             # We could not determine the test status, so check if it still thinks it's
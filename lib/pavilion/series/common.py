@@ -70,7 +70,7 @@ class LazyTestRunDict(UserDict):
             self.find_tests()
 
         for working_dir, test_id in self.keys():
-            yield working_dir/'test_runs'/str(test_id)
+            yield dir_db.make_id_path(working_dir/'test_runs', test_id)
 
     def find_tests(self):
         """Find all the tests for the series and add their keys."""
@@ -97,7 +97,7 @@ class LazyTestRunDict(UserDict):
                     continue
 
                 try:
-                    working_dir = path.resolve().parents[1]
+                    working_dir = dir_db.id_base_path(path.resolve()).parent
                 except FileNotFoundError:
                     continue
 
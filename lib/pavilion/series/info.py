@@ -148,13 +148,13 @@ class SeriesInfoBase:
 
         status_obj = self._get_status_file()
 
+        state_counts = status_obj.state_counts()
         errors = 0
-        for status in status_obj.history():
-            if status.state in (status_file.SERIES_STATES.ERROR,
-                                status_file.SERIES_STATES.BUILD_ERROR,
-                                status_file.SERIES_STATES.CREATION_ERROR,
-                                status_file.SERIES_STATES.KICKOFF_ERROR):
-                errors += 1
+        for state in (status_file.SERIES_STATES.ERROR,
+                      status_file.SERIES_STATES.BUILD_ERROR,
+                      status_file.SERIES_STATES.CREATION_ERROR,
+                      status_file.SERIES_STATES.KICKOFF_ERROR):
+            errors += state_counts.get(state, 0)
 
         for test_path in self._tests:
             test_info = self.test_info(test_path)
@@ -352,7 +352,7 @@ class SeriesInfo(SeriesInfoBase):
                 "Invalid series id '{}'. Series id should "
                 "look like 's1234'.".format(sid))
 
-        series_path = pav_cfg.working_dir/'series'/str(id_)
+        series_path = dir_db.make_id_path(pav_cfg.working_dir/'series', id_)
         if not series_path.exists():
             raise TestSeriesError("Could not find series '{}'".format(sid))
         return cls(pav_cfg, series_path)
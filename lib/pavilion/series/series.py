@@ -2,7 +2,6 @@
 also tracks the tests that have run under it."""
 import io
 import json
-import math
 import os
 import re
 import signal
@@ -20,6 +19,7 @@ from pavilion import dir_db
 from pavilion import output
 from pavilion import sys_vars
 from pavilion import utils
+from pavilion.completion_watcher import CompletionWatcher
 from pavilion.enums import Verbose
 from pavilion.lockfile import LockFile
 from pavilion.output import fprint
@@ -446,6 +446,10 @@ differentiate it from test ids."""
                     raise TestSeriesError(
                         "Error making tests for series '{}'."
                         .format(self.sid), err)
+                finally:
+                    # Anything still running is waited on through the series, not
+                    # the test set.
+                    test_set.close_watcher()
 
             for test_set in sets_to_run:
                 potential_sets.remove(test_set)
@@ -529,14 +533,16 @@ differentiate it from test ids."""
     def wait(self, timeout=None):
         """Wait for the series to be complete or the timeout to expire. """
 
-        if timeout is None:
-            end = math.inf
-        else:
-            end = time.time() + timeout
-        while time.time() < end:
-            if self.complete:
+        if self.complete:
+            return
+
+        with CompletionWatcher([self]) as watcher:
+            if watcher.wait(timeout):
                 return
-            time.sleep(2)
+
+            if watcher.vanished:
+                raise TestSeriesError("Series {} was deleted while waiting for it to "
+                                      "complete.".format(self._id))
 
         raise TimeoutError("Series {} did not complete before timeout."
                            .format(self._id))
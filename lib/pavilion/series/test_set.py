@@ -3,15 +3,19 @@ into a set of ready to run tests. They are ephemeral, and are not tracked betwee
 Pavilion runs."""
 import io
 import os
+import queue
 import threading
-import time
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO
-from typing import List, Dict, TextIO, Union, Set, Iterator, Tuple
+from pathlib import Path
+from typing import List, Dict, TextIO, Union, Set, Iterator, Tuple, Deque
 
 import pavilion.errors
-from pavilion import output, result, schedulers, cancel_utils
+from pavilion import builder, dir_db, output, result, schedulers, cancel_utils
+from pavilion import build_times
 from pavilion.build_tracker import MultiBuildTracker
+from pavilion.completion_watcher import CompletionWatcher
 from pavilion.errors import TestRunError, TestConfigError, TestSetError, ResultError
 from pavilion.resolver import TestConfigResolver
 from pavilion.status_file import SeriesStatusFile, STATES, SERIES_STATES
@@ -104,6 +108,9 @@ class TestSet:
         self.ready_to_start: List[TestRun] = []
         self.started_tests: List[TestRun] = []
         self.completed_tests: List[TestRun] = []
+        # Watches started tests for completion. Only kept while there are any, as
+        # each one may hold an inotify instance.
+        self._watcher = None  # type: Union[CompletionWatcher, None]
 
         # A dictionary of test set info, written to the set info file.
         self._info = {}
@@ -216,124 +223,224 @@ class TestSet:
             outfile=self.outfile,
             verbosity=self.verbosity)
 
+        # Tests with identical builds can share their build hashes.
+        build_hashes = builder.BuildHashCache()
+
         self.status.set(S_STATES.SET_MAKE,
                         "Resolving {} test requests in sets of {} (half the simultaneous limit)."
                         .format(len(self._test_names), self.batch_size))
 
-        for test_batch in cfg_resolver.load_iter(
-                self._test_names,
-                self.modes,
-                self.overrides,
-                conditions=global_conditions,
-                batch_size=self.batch_size,):
+        # The resolver keeps a pool of worker processes, which must be shut down
+        # however we stop making tests.
+        try:
+            for test_batch in cfg_resolver.load_iter(
+                    self._test_names,
+                    self.modes,
+                    self.overrides,
+                    conditions=global_conditions,
+                    batch_size=self.batch_size,):
+
+                if cfg_resolver.errors:
+                    output.fprint(
+                        self.outfile,
+                        "Error loading test configs for test set '{}'".format(self.name))
+
+                    for error in cfg_resolver.errors:
+                        if error.request is not None:
+                            self.status.set(S_STATES.ERROR, '{} - {}'.format(
+                                error.request.request, error.pformat()))
+                        else:
+                            self.status.set(S_STATES.ERROR, error.pformat())
+
+                        output.fprint(
+                            self.outfile,
+                            "{} - {}".format(error.request.request, error.pformat()))
+
+                    if not self.ignore_errors:
+                        raise TestSetError(
+                            "Error creating tests for test set {}.".format(self.name),
+                            cfg_resolver.errors[0])
+
+                self.status.set(S_STATES.SET_MAKE, "Creating {} test runs".format(len(test_batch)))
+
+                progress = 0
+                skip_count = 0
+
+                # Reserve ids for the whole batch at once, rather than fighting over the id
+                # lock for each test.
+                reserved_ids = self._reserve_ids(test_batch)
+
+                # Create and save the tests in parallel, but handle the results in order
+                # so the test list is deterministic.
+                futures = []
+                with ThreadPoolExecutor(max_workers=self.pav_cfg['max_threads']) as pool:
+                    for ptest in test_batch:
+                        if build_only and local_builds_only and \
+                                str_bool(ptest.config.get('build', {}).get('on_nodes', 'False')):
+                            # Don't create test objects for tests that would build remotely.
+                            futures.append(None)
+                            continue
+
+                        reserved = reserved_ids.get(
+                            TestRun.get_working_dir(self.pav_cfg, ptest.config))
+                        futures.append(pool.submit(
+                            self._create_test_run, ptest,
+                            reserved_id=reserved.pop(0) if reserved else None,
+                            build_only=build_only, rebuild=rebuild, build_hashes=build_hashes))
+
+                    new_test_runs = []
+                    for ptest, future in zip(test_batch, futures):
+                        if self.verbosity == Verbose.DYNAMIC:
+                            progress += 1.0 / len(test_batch)
+                            output.fprint(self.outfile,
+                                          "Creating Test Runs: {:.0%}".format(progress), end='\r')
+
+                        if future is None:
+                            skip_count += 1
+                            self.status.set(
+                                S_STATES.TESTS_SKIPPED,
+                                "Skipped test named '{}' from series '{}' - We're just "
+                                "building locally, and this test builds only on nodes."
+                                .format(ptest.config.get('name'), ptest.config.get('suite')))
+                            continue
+
+                        try:
+                            test_run, aborted = future.result()
+                        except (TestRunError, TestConfigError) as err:
+                            tcfg = ptest.config
+                            test_name = "{}.{}".format(tcfg.get('suite'), tcfg.get('name'))
+                            msg = ("Error creating test '{}' in test set '{}'"
+                                   .format(test_name, self.name))
+                            self.status.set(S_STATES.ERROR, msg + ': ' + str(err.args[0]))
+                            if self.ignore_errors:
+                                if self.verbosity in (Verbose.MAX, Verbose.HIGH):
+                                    output.fprint(self.outfile, msg)
+                                continue
+                            else:
+                                # Stop making tests, but make sure any that were made get
+                                # cancelled along with the rest.
+                                self._finish_creation(futures)
+                                self._release_ids(reserved_ids)
+                                self.cancel("Error creating other tests in test set '{}'"
+                                            .format(self.name))
+                                raise TestSetError(msg, err)
+
+                        if not test_run.skipped:
+                            self.tests.append(test_run)
+                            new_test_runs.append(test_run)
+
+                            if self.verbosity in (Verbose.HIGH, Verbose.MAX):
+                                output.fprint(self.outfile, 'Created and saved test run {} - {}'
+                                                       .format(test_run.full_id, test_run.name))
+                        else:
+                            skip_count += 1
+                            msg = "{} - {}" \
+                                  .format(test_run.name, test_run.skip_reasons[0])
+                            self.status.set(S_STATES.TESTS_SKIPPED, msg)
+                            if self.verbosity in (Verbose.MAX, Verbose.HIGH):
+                                output.fprint(self.outfile, msg)
+
+                            if not aborted:
+                                self.status.set(
+                                    S_STATES.TESTS_SKIPPED,
+                                    "Cleanup of skipped test {} was unsuccessful.")
+
+                self._release_ids(reserved_ids)
 
-            if cfg_resolver.errors:
-                output.fprint(
-                    self.outfile,
-                    "Error loading test configs for test set '{}'".format(self.name))
+                if self.verbosity == Verbose.DYNAMIC:
+                    output.fprint(self.outfile, '')
 
-                for error in cfg_resolver.errors:
-                    if error.request is not None:
-                        self.status.set(S_STATES.ERROR,
-                                        '{} - {}'.format(error.request.request, error.pformat()))
-                    else:
-                        self.status.set(S_STATES.ERROR, error.pformat())
+                self.status.set(
+                    S_STATES.SET_MAKE,
+                    "Test set '{}' created {} more tests, skipped {}."
+                    .format(self.name, len(new_test_runs), skip_count))
 
+                output.fprint(
+                    self.outfile,
+                    "Test set '{}' created {} tests, skipped {}, {} errors."
+                    .format(self.name, len(self.tests), skip_count,
+                            len(cfg_resolver.errors)))
+                if skip_count:
                     output.fprint(
                         self.outfile,
-                        "{} - {}".format(error.request.request, error.pformat()))
+                        "To see why each test was skipped, run:\n"
+                        "  `pav series states --skipped`")
 
-                if not self.ignore_errors:
-                    raise TestSetError("Error creating tests for test set {}.".format(self.name),
-                                       cfg_resolver.errors[0])
+                if new_test_runs:
+                    self.ready_to_build.extend(new_test_runs)
+                    yield new_test_runs
+        finally:
+            cfg_resolver.close()
 
-            self.status.set(S_STATES.SET_MAKE, "Creating {} test runs".format(len(test_batch)))
+        self.all_tests_made = True
 
-            progress = 0
-            skip_count = 0
 
-            new_test_runs = []
-            for ptest in test_batch:
-                if self.verbosity == Verbose.DYNAMIC:
-                    progress += 1.0 / len(test_batch)
-                    output.fprint(self.outfile, "Creating Test Runs: {:.0%}".format(progress),
-                                  end='\r')
-
-                if build_only and local_builds_only:
-                    # Don't create test objects for tests that would build remotely.
-                    if str_bool(ptest.config.get('build', {}).get('on_nodes', 'False')):
-                        skip_count += 1
-                        self.status.set(
-                            S_STATES.TESTS_SKIPPED,
-                            "Skipped test named '{}' from series '{}' - We're just "
-                            "building locally, and this test builds only on nodes."
-                            .format(ptest.config.get('name'), ptest.config.get('suite')))
-                        continue
+    def _create_test_run(self, ptest, reserved_id, build_only, rebuild, build_hashes) \
+            -> Tuple[TestRun, bool]:
+        """Create a test run from the given proto-test, and save it (or clean it up if
+        it was skipped). This runs in a worker thread, so it mustn't touch the test
+        set's state.
 
-                try:
-                    test_run = TestRun(pav_cfg=self.pav_cfg, config=ptest.config,
-                                       var_man=ptest.var_man, rebuild=rebuild,
-                                       build_only=build_only)
-                    if not test_run.skipped:
-                        test_run.save()
-                        self.tests.append(test_run)
-                        new_test_runs.append(test_run)
-
-                        if self.verbosity in (Verbose.HIGH, Verbose.MAX):
-                            output.fprint(self.outfile, 'Created and saved test run {} - {}'
-                                                   .format(test_run.full_id, test_run.name))
-                    else:
-                        skip_count += 1
-                        msg = "{} - {}" \
-                              .format(test_run.name, test_run.skip_reasons[0])
-                        self.status.set(S_STATES.TESTS_SKIPPED, msg)
-                        if self.verbosity in (Verbose.MAX, Verbose.HIGH):
-                            output.fprint(self.outfile, msg)
-
-                        if not test_run.abort_skipped():
-                            self.status.set(
-                                S_STATES.TESTS_SKIPPED,
-                                "Cleanup of skipped test {} was unsuccessful.")
-
-                except (TestRunError, TestConfigError) as err:
-                    tcfg = ptest.config
-                    test_name = "{}.{}".format(tcfg.get('suite'), tcfg.get('name'))
-                    msg = ("Error creating test '{}' in test set '{}'"
-                           .format(test_name, self.name))
-                    self.status.set(S_STATES.ERROR, msg + ': ' + str(err.args[0]))
-                    if self.ignore_errors:
-                        if self.verbosity in (Verbose.MAX, Verbose.HIGH):
-                            output.fprint(self.outfile, msg)
-                    else:
-                        self.cancel("Error creating other tests in test set '{}'"
-                                    .format(self.name))
-                        raise TestSetError(msg, err)
-
-            if self.verbosity == Verbose.DYNAMIC:
-                output.fprint(self.outfile, '')
-
-            self.status.set(
-                S_STATES.SET_MAKE,
-                "Test set '{}' created {} more tests, skipped {}."
-                .format(self.name, len(new_test_runs), skip_count))
-
-            output.fprint(
-                self.outfile,
-                "Test set '{}' created {} tests, skipped {}, {} errors."
-                .format(self.name, len(self.tests), skip_count,
-                        len(cfg_resolver.errors)))
-            if skip_count:
-                output.fprint(
-                    self.outfile,
-                    "To see why each test was skipped, run:\n"
-                    "  `pav series states --skipped`")
+        :returns: The test run, and whether a skipped test was successfully cleaned up.
+        :raises TestRunError: When the test couldn't be created or saved.
+        """
 
-            if new_test_runs:
-                self.ready_to_build.extend(new_test_runs)
-                yield new_test_runs
+        test_run = TestRun(pav_cfg=self.pav_cfg, config=ptest.config,
+                           var_man=ptest.var_man, rebuild=rebuild,
+                           build_only=build_only, reserved_id=reserved_id)
+        if test_run.skipped:
+            return test_run, test_run.abort_skipped()
 
-        self.all_tests_made = True
+        test_run.save(build_hashes=build_hashes)
+        return test_run, True
+
+    def _finish_creation(self, futures):
+        """Stop any test creation that hasn't started, and wait for the rest. Tests
+        that were successfully created are added to the test set (so they can be
+        cancelled)."""
+
+        for future in futures:
+            if future is not None:
+                future.cancel()
+
+        for future in futures:
+            if future is None or future.cancelled():
+                continue
+
+            try:
+                test_run, _ = future.result()
+            except (TestRunError, TestConfigError):
+                continue
+
+            if not test_run.skipped and test_run not in self.tests:
+                self.tests.append(test_run)
+
+    def _reserve_ids(self, test_batch) -> Dict[Path, List[Tuple[int, Path]]]:
+        """Reserve test ids for each test in the batch, in each of the working
+        directories those tests will be created in. If ids can't be reserved in
+        bulk, the tests will just get their ids one at a time as usual."""
+
+        counts = defaultdict(int)
+        for ptest in test_batch:
+            counts[TestRun.get_working_dir(self.pav_cfg, ptest.config)] += 1
+
+        reserved_ids = {}
+        for working_dir, count in counts.items():
+            try:
+                reserved_ids[working_dir] = dir_db.reserve_ids(
+                    working_dir/TestRun.RUN_DIR, count)
+            except (OSError, TimeoutError):
+                pass
+
+        return reserved_ids
 
+    @staticmethod
+    def _release_ids(reserved_ids: Dict[Path, List[Tuple[int, Path]]]):
+        """Give back any reserved test ids that weren't used."""
+
+        for reserved in reserved_ids.values():
+            dir_db.release_ids(reserved)
+            reserved.clear()
 
     def make(self, build_only=False, rebuild=False, local_builds_only=False):
         """As per make_iter(), but create all of the tests. This doesn't
@@ -379,8 +486,6 @@ class TestSet:
         # Tests that were successfully built.
         built_tests: List[TestRun] = []
 
-        test_threads: List[Union[threading.Thread, None]] = []
-
         # Generate new build names for each test that is rebuilding.
         # We do this here, even for non_local builds, because otherwise the
         # non-local builds can't tell what was built fresh either on a
@@ -404,22 +509,31 @@ class TestSet:
             single_cancel_event = threading.Event()
             cancel_events = {name: single_cancel_event for name in build_names}
 
-        # We don't want to start threads that are just going to wait on a lock,
-        # so we'll rearrange the builds so that the unique build names go first.
-        # We'll use this as a stack, so tests that should build first go at
-        # the end of the list.
-        build_order = []
-        # If we've seen a build name, the build can go later.
-        seen_build_names = set()
-
-        trackers = {}
-
+        # Each unique build is performed by just one test. The other tests that
+        # share the build wait on it, and are only started (to copy the finished
+        # build) once it's done, so they never sit in a thread waiting on the
+        # build lock.
+        leaders = {}  # type: Dict[str, TestRun]
+        waiters = defaultdict(list)  # type: Dict[str, List[TestRun]]
         for test in local_builds:
-            if test.builder.name not in seen_build_names:
-                build_order.append(test)
-                seen_build_names.add(test.builder.name)
+            if test.builder.name in leaders:
+                waiters[test.builder.name].append(test)
             else:
-                build_order.insert(0, test)
+                leaders[test.builder.name] = test
+
+        # Start the builds that took the longest last time first, which keeps
+        # one long build from running alone at the end. Builds we know nothing
+        # about could be long too, so they go first (in their original order).
+        times = build_times.load(self.pav_cfg)
+        estimates = {}
+        for test in leaders.values():
+            estimate = times.estimate(test.builder.build_hash, test.name)
+            estimates[test] = float('inf') if estimate is None else estimate
+        build_order = deque(sorted(leaders.values(), key=lambda t: -estimates[t]))
+        # Tests whose build is done (or failed), and that just need to be finished.
+        ready = deque()  # type: Deque[TestRun]
+
+        trackers = {}
 
         # Create thread safe status trackers for each test.
         for test in local_builds:
@@ -430,64 +544,82 @@ class TestSet:
         # This is for double build verbosity.
         message_counts = {test.full_id: 0 for test in local_builds}
 
-        # Used to track which threads are for which tests.
-        test_by_threads = {}
-
         if self.verbosity not in (Verbose.QUIET, Verbose.DYNAMIC):
             output.fprint(self.outfile, self.BUILD_STATUS_PREAMBLE.format(
                 when='When', test_id='TestID',
                 state_len=STATES.max_length, state='State'), 'Message', width=None)
 
+        # Finished builds are reported here by their futures' callbacks.
+        done_queue = queue.Queue()  # type: queue.Queue
+        # Only wake up periodically when there's progress output to refresh.
+        refresh = (self.BUILD_SLEEP_TIME
+                   if self.verbosity in (Verbose.DYNAMIC, Verbose.MAX) else None)
         builds_running = 0
-        # Run and track <max_threads> build threads, giving output according
-        # to the verbosity level. As threads finish, new ones are started until
+
+        # Run up to <build_threads> builds at once, giving output according
+        # to the verbosity level. As builds finish, new ones are started until
         # either all builds complete or a build fails, in which case all tests
         # are aborted.
-        while build_order or test_threads:
-            # Start a new thread if we haven't hit our limit.
-            if build_order and builds_running < self.pav_cfg.build_threads:
-                test = build_order.pop()
-                cancel_event = cancel_events[test.builder.name]
-
-                if test.builder.name in failed_builds:
-                    if self.verbosity in (Verbose.HIGH, Verbose.MAX):
-                        output.fprint(self.outfile,
-                                      "Skipping build for test {} - prior attempts failed."
-                                      .format(test.full_id))
-                    test.status.set(STATES.BUILD_FAILED,
-                                    "Build failed when being built for test {} (they "
-                                    "share a build.".format(failed_builds[test.builder.name]))
-                    test.set_run_complete()
-                    continue
-
-                test_thread = threading.Thread(
-                    target=test.build,
-                    args=(cancel_event, trackers[test])
-                )
-                test_threads.append(test_thread)
-                test_by_threads[test_thread] = test
-                test_thread.start()
-
-            # Check if all our threads are alive, and join those that aren't.
-            for i in range(len(test_threads)):
-                thread = test_threads[i]
-                if not thread.is_alive():
-                    thread.join()
+        with ThreadPoolExecutor(self.pav_cfg.build_threads) as pool:
+            try:
+                while build_order or ready or builds_running:
+                    while (build_order or ready) \
+                            and builds_running < self.pav_cfg.build_threads:
+                        # Tests waiting on finished builds go first; it's cheap.
+                        test = ready.popleft() if ready else build_order.popleft()
+
+                        if test.builder.name in failed_builds:
+                            if self.verbosity in (Verbose.HIGH, Verbose.MAX):
+                                output.fprint(
+                                    self.outfile,
+                                    "Skipping build for test {} - prior attempts failed."
+                                    .format(test.full_id))
+                            test.status.set(
+                                STATES.BUILD_FAILED,
+                                "Build failed when being built for test {} (they "
+                                "share a build.".format(failed_builds[test.builder.name]))
+                            test.set_run_complete()
+                            ready.extend(waiters.pop(test.builder.name, []))
+                            continue
+
+                        future = pool.submit(test.build, cancel_events[test.builder.name],
+                                             trackers[test])
+                        future.add_done_callback(
+                            lambda fut, test=test: done_queue.put((test, fut)))
+                        builds_running += 1
+
+                    if not builds_running:
+                        continue
+
+                    try:
+                        test, future = done_queue.get(timeout=refresh)
+                    except queue.Empty:
+                        self._print_build_progress(local_builds, message_counts)
+                        continue
+
                     builds_running -= 1
-                    test_threads[i] = None
-                    test = test_by_threads[thread]
-                    del test_by_threads[thread]
                     cancel_event = cancel_events[test.builder.name]
 
+                    if future.exception() is not None:
+                        trackers[test].error("Unexpected error while building: {}"
+                                             .format(future.exception()))
+                        cancel_event.set()
+
                     # Add this test to our list of succesfully built tests
                     # if it successfully built.
                     if not cancel_event.is_set():
                         built_tests.append(test)
+                        if test.builder.build_duration is not None:
+                            times.record(test.builder.build_hash, test.name,
+                                         test.builder.build_duration)
                     else:
                         failed_builds[test.builder.name] = test.full_id
                         test.set_run_complete()
 
-                    # Output test status after joining a thread.
+                    # The tests sharing this build can go now.
+                    ready.extend(waiters.pop(test.builder.name, []))
+
+                    # Output test status after a build finishes.
                     if self.verbosity not in (Verbose.QUIET, Verbose.DYNAMIC):
                         notes = self.mb_tracker.get_notes(test.builder)
                         if notes:
@@ -500,39 +632,16 @@ class TestSet:
                             output.fprint(self.outfile, preamble, msg, width=None,
                                           wrap_indent=len(preamble))
 
-            test_threads = [thr for thr in test_threads if thr is not None]
-
-            if not self.ignore_errors and single_cancel_event.is_set():
-                for thread in test_threads:
-                    thread.join()
-
-                self._abort_builds(local_builds + remote_builds)
-
-            state_counts = self.mb_tracker.state_counts()
-            if self.verbosity == Verbose.DYNAMIC:
-                # Print a self-clearing one-liner of the counts of the
-                # build statuses.
-                parts = []
-                for state in sorted(state_counts.keys()):
-                    parts.append("{}: {}".format(state, state_counts[state]))
-                line = ' | '.join(parts)
-                output.fprint(self.outfile, line, width=None, end='\r', clear=True)
-            elif self.verbosity == Verbose.MAX:
-                for test in local_builds:
-                    seen = message_counts[test.full_id]
-                    msgs = self.mb_tracker.get_notes(test.builder)[seen:]
-                    for when, state, msg in msgs:
-                        when = output.get_relative_timestamp(when)
-                        state = '' if state is None else state
-                        preamble = self.BUILD_STATUS_PREAMBLE.format(
-                            when=when, test_id=test.id,
-                            state_len=STATES.max_length, state=state)
-
-                        output.fprint(self.outfile, preamble, msg, width=None,
-                                      wrap_indent=len(preamble))
-                    message_counts[test.full_id] += len(msgs)
-
-            time.sleep(self.BUILD_SLEEP_TIME)
+                    if not self.ignore_errors and single_cancel_event.is_set():
+                        # Let the other (now cancelled) builds wind down.
+                        for _ in range(builds_running):
+                            done_queue.get()
+
+                        self._abort_builds(local_builds + remote_builds)
+
+                    self._print_build_progress(local_builds, message_counts)
+            finally:
+                times.save()
 
         if self.verbosity == Verbose.DYNAMIC:
             # Print a newline after our last status update.
@@ -551,6 +660,35 @@ class TestSet:
                         .format(len(built_tests), self.name))
 
 
+    def _print_build_progress(self, local_builds: List[TestRun],
+                              message_counts: Dict[str, int]):
+        """Print the build progress, for the verbosity levels that show it while
+        builds run."""
+
+        state_counts = self.mb_tracker.state_counts()
+        if self.verbosity == Verbose.DYNAMIC:
+            # Print a self-clearing one-liner of the counts of the
+            # build statuses.
+            parts = []
+            for state in sorted(state_counts.keys()):
+                parts.append("{}: {}".format(state, state_counts[state]))
+            line = ' | '.join(parts)
+            output.fprint(self.outfile, line, width=None, end='\r', clear=True)
+        elif self.verbosity == Verbose.MAX:
+            for test in local_builds:
+                seen = message_counts[test.full_id]
+                msgs = self.mb_tracker.get_notes(test.builder)[seen:]
+                for when, state, msg in msgs:
+                    when = output.get_relative_timestamp(when)
+                    state = '' if state is None else state
+                    preamble = self.BUILD_STATUS_PREAMBLE.format(
+                        when=when, test_id=test.id,
+                        state_len=STATES.max_length, state=state)
+
+                    output.fprint(self.outfile, preamble, msg, width=None,
+                                  wrap_indent=len(preamble))
+                message_counts[test.full_id] += len(msgs)
+
     def kickoff(self) -> Tuple[List[TestRun], List[Job]]:
         """Kickoff all the given tests under this test set.
 
@@ -582,8 +720,13 @@ class TestSet:
 
             # Update the status of each test with any errors received from the scheduler.
             for err in sched_errors:
-                mass_status_update(err.tests, STATES.SCHED_ERROR,
-                                   err.pformat(), set_complete=True)
+                updates = mass_status_update(err.tests, STATES.SCHED_ERROR,
+                                             err.pformat(), set_complete=True,
+                                             max_threads=self.pav_cfg['max_threads'])
+                for test_id, msg in updates.failed.items():
+                    self.status.set(S_STATES.KICKOFF_ERROR,
+                                    "Could not record the scheduler error for test {}: {}"
+                                    .format(test_id, msg))
 
             # We rely on the scheduler to tell us which tests failed.
             err_tests = []
@@ -676,6 +819,15 @@ class TestSet:
             test.cancel(reason)
 
         cancel_utils.cancel_jobs(self.pav_cfg, self.tests)
+        self.close_watcher()
+
+    def close_watcher(self):
+        """Stop watching our started tests for completion, and release the
+        watcher's inotify instance. A new watcher is made if needed later."""
+
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
 
     def force_completion(self):
         """Mark all of the tests as complete. We generally do this after
@@ -685,28 +837,45 @@ class TestSet:
         for test in self.tests:
             test.set_run_complete()
 
-    def mark_completed(self) -> int:
+    def mark_completed(self, wait_period: float = 0) -> int:
         """Check all tests that we've started for completion, and move them to the
-        completed list as appropriate. Returns the number of tests that completed."""
+        completed list as appropriate. Returns the number of tests that completed.
+
+        :param wait_period: How long to wait for a test to complete, if none have.
+        """
 
         just_completed = []
 
-        for test in list(self.started_tests):
-            if test.complete:
+        if not self.started_tests:
+            return 0
+
+        if self._watcher is None:
+            self._watcher = CompletionWatcher()
+        for test in self.started_tests:
+            self._watcher.add(test)
+
+        for test in self._watcher.wait(wait_period):
+            if test in self.started_tests:
                 self.started_tests.remove(test)
                 self.completed_tests.append(test)
                 just_completed.append(test)
 
         # All started tests should have a job - Update their status based on that job.
+        # Get all of those job statuses at once, rather than querying each one.
+        schedulers.prefetch_job_statuses(self.pav_cfg, self.started_tests)
         for test in list(self.started_tests):
             sched = schedulers.get_plugin(test.scheduler)
             status = sched.job_status(self.pav_cfg, test)
             if status.state in (STATES.SCHED_CANCELLED, STATES.SCHED_ERROR):
                 # The test will have been marked as complete
+                self._watcher.remove(test)
                 self.started_tests.remove(test)
                 self.completed_tests.append(test)
                 just_completed.append(test)
 
+        if not self.started_tests:
+            self.close_watcher()
+
         return len(just_completed)
 
     TEST_WAIT_PERIOD = 0.5
@@ -716,7 +885,8 @@ class TestSet:
         call to wait.
 
         :param wait_for_all: Wait for all started tests to complete before returning.
-        :param wait_period: How long to sleep between test status checks.
+        :param wait_period: How long to wait between scheduler status checks. Test
+            completion is noticed as soon as it can be.
         :return: The number of completed tests
         """
 
@@ -728,8 +898,7 @@ class TestSet:
 
         while ((wait_for_all and self.started_tests) or
                (not wait_for_all and completed_tests == 0)):
-            time.sleep(wait_period)
-            completed_tests += self.mark_completed()
+            completed_tests += self.mark_completed(wait_period)
 
         return completed_tests
 
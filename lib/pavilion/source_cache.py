@@ -0,0 +1,301 @@
+"""A cache of extracted build source archives, shared across builds and Pavilion
+invocations.
+
+Extracting a large source tarball can take longer than the build itself, and
+changing anything about a build (its commands, environment, etc.) requires a new
+build directory with a fresh copy of the source. Extracted trees are kept under
+the working_dir, keyed by the hash of the archive (and the umask it was extracted
+with). New build directories are populated from the cache with reflinks where the
+filesystem supports them, and plain copies otherwise. Either way, each build gets
+its own writable files, so builds can edit them in place without touching the
+cache.
+
+Files in the cache itself are read only.
+
+The cache is limited in size, and the least recently used entries are evicted
+first. Entries are added atomically under a per-entry lock, so concurrent builders
+never extract the same archive twice or see a partial tree, and entries that were
+used recently are never evicted out from under a builder that's linking from them.
+"""
+
+import os
+import shutil
+import stat
+import threading
+import time
+from pathlib import Path
+from typing import Callable, List, Union
+
+from pavilion import lockfile
+from pavilion import utils
+
+CACHE_DIR_NAME = 'source_cache'
+
+TREE_DIR = 'tree'
+SIZE_FN = 'size'
+LAST_USED_FN = 'last_used'
+
+EVICT_GRACE = 60*60
+"""Entries used within this many seconds are never evicted, even if the cache is
+over its size limit."""
+
+STALE_TMP = 24*60*60
+"""Leftover temporary directories (from interrupted extractions) older than this
+are cleaned up."""
+
+LOCK_EXPIRE = 60
+
+
+class SourceCache:
+    """A cache of extracted source trees. Use get_cache() to get the shared
+    cache for a working_dir."""
+
+    def __init__(self, cache_dir: Path, max_size: int):
+        """
+        :param cache_dir: Where to keep the extracted trees.
+        :param max_size: The (soft) limit on the total size of the cache, in
+            bytes. If zero, nothing is cached.
+        """
+
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    @staticmethod
+    def key(archive_hash: bytes, umask: int) -> str:
+        """The cache key for the given archive hash and extraction umask."""
+
+        return '{}-{:03o}'.format(archive_hash.hex()[:40], umask)
+
+    def extract(self, key: str, dest: Path, umask: int,
+                extract_func: Callable[[Path], Union[str, None]]) -> Union[str, None]:
+        """Populate dest with the extracted archive, adding it to the cache first
+        if needed. If anything goes wrong with the cache itself, the archive is
+        just extracted directly into dest.
+
+        :param key: The archive's cache key (see key()).
+        :param dest: The directory to create. It shouldn't exist yet.
+        :param umask: The umask to apply to the write bits of the copied files.
+        :param extract_func: A function that extracts the archive to the
+            directory it's given, returning an error message on failure (like
+            those in pavilion.extract).
+        :returns: An error message on failure, None otherwise.
+        """
+
+        if self.max_size <= 0:
+            return extract_func(dest)
+
+        entry = self.cache_dir/key
+        try:
+            if not (entry/TREE_DIR).is_dir():
+                error = self._add(entry, extract_func)
+                if error is not None:
+                    return error
+
+            (entry/LAST_USED_FN).touch()
+            self._link_tree(entry/TREE_DIR, dest, umask)
+        except OSError:
+            if dest.exists():
+                shutil.rmtree(dest.as_posix(), ignore_errors=True)
+            return extract_func(dest)
+
+        return None
+
+    def _add(self, entry: Path, extract_func) -> Union[str, None]:
+        """Extract an archive into the cache, unless another builder beat us to it.
+
+        :returns: The extraction error message, if any.
+        :raises OSError: On problems with the cache directory.
+        """
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        lock = lockfile.LockFile(entry.with_name(entry.name + '.lock'),
+                                 expires_after=LOCK_EXPIRE)
+        with lock, lockfile.LockFilePoker(lock):
+            if (entry/TREE_DIR).is_dir():
+                return None
+
+            tmp_path = entry.with_name('{}.{}.{}.tmp'.format(
+                entry.name, os.getpid(), threading.get_ident()))
+            tmp_path.mkdir()
+            try:
+                error = extract_func(tmp_path/TREE_DIR)
+                if error is not None:
+                    return error
+
+                size = self._freeze(tmp_path/TREE_DIR)
+                (tmp_path/SIZE_FN).write_text(str(size))
+                (tmp_path/LAST_USED_FN).touch()
+                # An interrupted eviction could leave the entry without a tree.
+                if entry.exists():
+                    self._remove(entry)
+                tmp_path.rename(entry)
+            finally:
+                if tmp_path.exists():
+                    shutil.rmtree(tmp_path.as_posix(), ignore_errors=True)
+
+        self.evict(keep=entry.name)
+        return None
+
+    @staticmethod
+    def _freeze(tree: Path) -> int:
+        """Make every file in the tree read only (and every directory writable by
+        us, so the tree can be removed).
+
+        :returns: The total size of the files in the tree.
+        """
+
+        sizes = []
+
+        def freeze_dir(_, entries: List[utils.WalkEntry]):
+            """Fix the permissions of everything in a directory."""
+
+            size = 0
+            for entry in entries:
+                if entry.is_link:
+                    continue
+
+                mode = stat.S_IMODE(entry.stat.st_mode)
+                if entry.is_dir:
+                    if not mode & stat.S_IWUSR:
+                        os.chmod(entry.path, mode | stat.S_IWUSR)
+                else:
+                    size += entry.stat.st_size
+                    if mode & 0o222:
+                        os.chmod(entry.path, mode & ~0o222)
+
+            sizes.append(size)
+
+        if tree.is_dir():
+            utils.walk_tree(tree, freeze_dir)
+        else:
+            sizes.append(tree.stat().st_size)
+
+        return sum(sizes)
+
+    @staticmethod
+    def _link_tree(tree: Path, dest: Path, umask: int):
+        """Recreate the cached tree at dest, reflinking (or copying) each file.
+        Files are never hardlinked, as builds may modify them.
+
+        :raises OSError: When files can't be copied.
+        """
+
+        write_bits = 0o222 & ~umask
+        # Whether reflinks work here. Once they fail, we stop trying.
+        use_reflinks = [True]
+
+        def link_dir(src_dir: str, entries: List[utils.WalkEntry]):
+            """Make the directory's entries in dest."""
+
+            dst_dir = os.path.join(dest.as_posix(), os.path.relpath(src_dir, tree.as_posix()))
+            for entry in entries:
+                dst_path = os.path.join(dst_dir, entry.name)
+                if entry.is_link:
+                    os.symlink(os.readlink(entry.path), dst_path)
+                elif entry.is_dir:
+                    os.mkdir(dst_path)
+                    os.chmod(dst_path, stat.S_IMODE(entry.stat.st_mode))
+                else:
+                    if use_reflinks[0]:
+                        try:
+                            utils.reflink(entry.path, dst_path)
+                        except OSError:
+                            use_reflinks[0] = False
+
+                    if not use_reflinks[0]:
+                        shutil.copy2(entry.path, dst_path)
+
+                    os.chmod(dst_path, stat.S_IMODE(entry.stat.st_mode) | write_bits)
+
+        if not tree.is_dir():
+            raise NotADirectoryError("Cached source tree '{}' is missing.".format(tree))
+
+        dest.mkdir()
+        dest.chmod(stat.S_IMODE(tree.stat().st_mode))
+        utils.walk_tree(tree, link_dir)
+
+    def evict(self, keep: str = None):
+        """Remove the least recently used entries until the cache is under its size
+        limit. Only one process evicts at a time; if another already is, this does
+        nothing.
+
+        :param keep: An entry that shouldn't be evicted.
+        """
+
+        lock = lockfile.LockFile(self.cache_dir/'.evict.lock', timeout=0,
+                                 expires_after=LOCK_EXPIRE)
+        try:
+            lock.lock()
+        except TimeoutError:
+            return
+
+        try:
+            now = time.time()
+            entries = []
+            total = 0
+            for path in self.cache_dir.iterdir():
+                try:
+                    if path.name.endswith('.evict') or (
+                            path.name.endswith('.tmp')
+                            and path.stat().st_mtime < now - STALE_TMP):
+                        self._remove(path)
+                        continue
+
+                    if not path.is_dir() or path.suffix:
+                        continue
+
+                    size = int((path/SIZE_FN).read_text())
+                    last_used = (path/LAST_USED_FN).stat().st_mtime
+                except (OSError, ValueError):
+                    continue
+
+                total += size
+                entries.append((last_used, size, path))
+
+            entries.sort()
+            for last_used, size, path in entries:
+                if total <= self.max_size:
+                    break
+
+                if path.name == keep or last_used > now - EVICT_GRACE:
+                    continue
+
+                try:
+                    self._remove(path)
+                except OSError:
+                    continue
+                total -= size
+        finally:
+            lock.unlock()
+
+    @staticmethod
+    def _remove(path: Path):
+        """Remove a cache entry (or temp directory). It's renamed first so that it
+        disappears from the cache atomically."""
+
+        if not path.name.endswith('.evict'):
+            evict_path = path.with_name('{}.{}.evict'.format(path.name, os.getpid()))
+            path.rename(evict_path)
+            path = evict_path
+
+        shutil.rmtree(path.as_posix(), ignore_errors=True)
+
+
+_CACHES = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_cache(pav_cfg) -> SourceCache:
+    """Return the shared source cache for the given config's working_dir."""
+
+    working_dir = pav_cfg.working_dir
+
+    with _CACHES_LOCK:
+        cache = _CACHES.get(working_dir)
+        if cache is None:
+            cache = _CACHES[working_dir] = SourceCache(
+                working_dir/CACHE_DIR_NAME,
+                pav_cfg.get('source_cache_size', 0)*1024**2)
+
+    return cache
@@ -22,14 +22,25 @@ Usage: ::
     state = status.current()
 
     state.note
+
+Alongside each status file is a small index file (``<status_file>.idx``) that
+records the size of the status file when it was last indexed, the offset of the
+last status line, and how many times each state has been seen. This lets the
+current state and state history checks skip parsing the whole file. The index is
+only a cache; anything appended since it was written (by an older version of
+Pavilion, for instance) is picked up by reading just the new lines, and the status
+file format itself is unchanged. The index is rewritten after each status update,
+and whenever a reader finds it missing.
 """
 
 import datetime
+import json
 import os
 import pathlib
+import threading
 import time
 from io import BytesIO
-from typing import List, Union
+from typing import Dict, List, Tuple, Union
 
 
 class StatusError(RuntimeError):
@@ -277,6 +288,8 @@ appends of a size such that those writes should be atomic.
     states = STATES
     info_class = TestStatusInfo
 
+    INDEX_SUFFIX = '.idx'
+
     def __init__(self, path: Union[pathlib.Path, None]):
         """Create the status file object.
 
@@ -285,6 +298,15 @@ appends of a size such that those writes should be atomic.
 
         self.path = path
         self._dummy = BytesIO() if path is None else None
+        if path is None:
+            self.index_path = None
+        else:
+            self.index_path = path.with_name(path.name + self.INDEX_SUFFIX)
+
+        # The (indexed size, last line offset, state counts) of the status file.
+        self._index = None  # type: Union[None, Tuple[int, Union[int, None], Dict[str, int]]]
+        # The indexed size as of the last time we read or wrote the index file.
+        self._saved_index_size = 0
 
         if self.path is not None and not self.path.is_file():
             # Make sure we can open the file, and create it if it doesn't exist.
@@ -352,11 +374,146 @@ could be wrong with the file format."""
 
         return [self._parse_status_line(line) for line in lines]
 
+    @staticmethod
+    def _line_state(line: bytes) -> str:
+        """Get just the state from a status line."""
+
+        parts = line.split(b' ', 2)
+        if len(parts) < 2:
+            return ''
+
+        return parts[1].strip().decode('utf-8', 'ignore')
+
+    def _read_index(self):
+        """Read the index file, returning None if it's missing or broken."""
+
+        try:
+            with self.index_path.open() as index_file:
+                data = json.load(index_file)
+            size, last, counts = data['size'], data['last'], data['states']
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+
+        if not (isinstance(size, int) and (last is None or isinstance(last, int))
+                and isinstance(counts, dict)):
+            return None
+
+        return size, last, counts
+
+    def _write_index(self):
+        """Atomically write the index file, if it doesn't already cover everything
+        we've indexed. Failures are ignored, as the index can always be rebuilt
+        from the status file."""
+
+        if self.index_path is None or self._index is None:
+            return
+
+        size, last, counts = self._index
+        if size == self._saved_index_size:
+            return
+
+        self._saved_index_size = size
+        tmp_path = self.index_path.with_name('{}.{}.{}.tmp'.format(
+            self.index_path.name, os.getpid(), threading.get_ident()))
+        try:
+            with tmp_path.open('w') as tmp_file:
+                json.dump({'size': size, 'last': last, 'states': counts}, tmp_file)
+            tmp_path.rename(self.index_path)
+        except OSError:
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+
+    def _update_index(self, status_file) -> int:
+        """Bring the status index up to date with the given (open) status file,
+        reading only the lines added since it was last indexed.
+
+        :returns: The size of the status file.
+        """
+
+        status_file.seek(0, os.SEEK_END)
+        size = status_file.tell()
+
+        index = self._index
+        if index is None and self.index_path is not None:
+            index = self._read_index()
+            if index is not None:
+                self._saved_index_size = index[0]
+        rebuilt = index is None or index[0] > size
+        if rebuilt:
+            # The index is missing, or the status file was replaced or truncated,
+            # so start over.
+            index = (0, None, {})
+            self._saved_index_size = 0
+
+        offset, last, counts = index
+        if offset < size:
+            counts = dict(counts)
+            status_file.seek(offset)
+            # The last piece is either empty or a partially written line, which
+            # we'll pick up next time.
+            for line in status_file.read(size - offset).split(b'\n')[:-1]:
+                state = self._line_state(line)
+                counts[state] = counts.get(state, 0) + 1
+                last = offset
+                offset += len(line) + 1
+
+        self._index = offset, last, counts
+        if rebuilt:
+            # Save the rebuilt index so other readers don't have to do the same.
+            self._write_index()
+        return size
+
+    def _get_index(self):
+        """Return the up-to-date status index, or None if the status file
+        couldn't be read."""
+
+        if self.path is None:
+            self._update_index(self._dummy)
+            return self._index
+
+        try:
+            with self.path.open('rb') as status_file:
+                self._update_index(status_file)
+        except OSError:
+            return None
+
+        return self._index
+
+    def state_counts(self) -> Dict[str, int]:
+        """Return how many times each state appears in the status file, without
+        parsing the whole file."""
+
+        index = self._get_index()
+        if index is None:
+            return {self.states.STATUS_ERROR: 1}
+
+        return dict(index[2])
+
     def has_state(self, state) -> bool:
         """Check if the given state is somewhere in the history of this
         status file."""
 
-        return any([state == h.state for h in self.history()])
+        return state in self.state_counts()
+
+    def summary(self) -> Tuple[TestStatusInfo, List[str]]:
+        """Return the most recent status object, and a sorted list of every state
+        in the history, with a single read of the file."""
+
+        if self.path is not None:
+            try:
+                with self.path.open('rb') as status_file:
+                    current = self._current(status_file)
+            except OSError as err:
+                current = self.info_class(self.states.STATUS_ERROR,
+                                          "Could open status file at '{}': {}"
+                                          .format(self.path, err.args[0]))
+                return current, [current.state]
+        else:
+            current = self._current(self._dummy)
+
+        return current, sorted(self._index[2]) if self._index is not None else []
 
     def current(self) -> TestStatusInfo:
         """Return the most recent status object."""
@@ -378,6 +535,13 @@ could be wrong with the file format."""
         end_read_len = self.info_class.LINE_MAX + 16
 
         try:
+            size = self._update_index(status_file)
+            _, last, _ = self._index
+            if self._index[0] == size and last is not None:
+                # The index knows exactly where the last line is.
+                status_file.seek(last)
+                return self._parse_status_line(status_file.readline())
+
             status_file.seek(0, os.SEEK_END)
             file_len = status_file.tell()
             if file_len < end_read_len:
@@ -414,31 +578,52 @@ could be wrong with the file format."""
 
         return self.add_status(stinfo)
 
-    def add_status(self, status: TestStatusInfo) -> TestStatusInfo:
-        """Add the status object as a status for the test."""
+    def add_status(self, status: TestStatusInfo, sync: bool = False) -> TestStatusInfo:
+        """Add the status object as a status for the test.
+
+        :param status: The status to add.
+        :param sync: Sync the status file to disk before returning.
+        """
 
         if self.path is not None:
             try:
                 with self.path.open('ab') as status_file:
-                    return self._set(status_file, status)
+                    stinfo = self._set(status_file, status, sync)
             except OSError as err:
                 return self.info_class(self.states.STATUS_ERROR,
                                        "Could open status file at '{}': {}"
                                        .format(self.path, err.args[0]))
+
+            self._write_index()
+            return stinfo
         else:
             return self._set(self._dummy, status)
 
-    def _set(self, status_file, stinfo) -> TestStatusInfo:
+    def _set(self, status_file, stinfo, sync=False) -> TestStatusInfo:
         """Do the actual status setting step, given a file and the status object."""
 
         status_line = stinfo.status_line()
 
         try:
             status_file.write(status_line)
+            status_file.flush()
+            if sync:
+                os.fsync(status_file.fileno())
+            end = status_file.tell()
         except OSError as err:
-            stinfo = self.info_class(self.states.STATUS_ERROR,
-                                     "Could not write to status file at '{}': {}"
-                                     .format(self.path, err.args[0]))
+            return self.info_class(self.states.STATUS_ERROR,
+                                   "Could not write to status file at '{}': {}"
+                                   .format(self.path, err.args[0]))
+
+        start = end - len(status_line)
+        if self._index is not None and self._index[0] == start:
+            # Nothing else was written since we last looked, so just add our line.
+            counts = dict(self._index[2])
+            state = self._line_state(status_line)
+            counts[state] = counts.get(state, 0) + 1
+            self._index = end, start, counts
+        else:
+            self._get_index()
 
         return stinfo
 
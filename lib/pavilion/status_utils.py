@@ -126,6 +126,10 @@ def get_statuses(pav_cfg, tests: List[TestRun]):
     :param tests: A list of test ids to load.
     """
 
+    # Get the scheduler status of every incomplete test in bulk up front.
+    schedulers.prefetch_job_statuses(
+        pav_cfg, [test for test in tests if not test.complete])
+
     get_this_status = partial(get_status, pav_conf=pav_cfg)
 
     with ThreadPoolExecutor(pav_cfg['max_threads']) as pool:
@@ -3,6 +3,8 @@ utilize the YamlConfig library to define the config structure. Because of the
 dynamic nature of test configs, there are a few extra complications this module
 handles that are documented below.
 """
+
+# pylint: disable=too-many-lines
 import collections
 import copy
 import re
@@ -598,6 +600,22 @@ expected to be added to by various plugins.
                               "run instead, and set with user/group write permissions. "
                               "You may include path glob wildcards, "
                               "including the recursive '**'."),
+                yc.StrElem(
+                    'copy_mode', default='symlink',
+                    choices=['symlink', 'symlink_dirs', 'hardlink', 'reflink'],
+                    help_text="How to copy the build into each test run: symlink "
+                              "each file (the default), symlink whole directories "
+                              "that don't hold 'copy_files' (test writes to those "
+                              "go to the shared build), or hardlink or reflink "
+                              "each file. Files that can't be hardlinked or "
+                              "reflinked are symlinked instead."),
+                yc.StrElem(
+                    'cache_extracted', default='True',
+                    choices=['true', 'false', 'True', 'False'],
+                    help_text="Populate the build directory from Pavilion's cache "
+                              "of extracted source archives (see the "
+                              "'source_cache_size' option), rather than "
+                              "extracting the source archive each time."),
                 PathCategoryElem(
                     'create_files',
                     key_case=PathCategoryElem.KC_MIXED,
@@ -671,6 +689,17 @@ expected to be added to by various plugins.
                               "source, tracking changes by "
                               "file size/timestamp/hash."
                 ),
+                yc.StrElem(
+                    'source_hash', choices=['mtime', 'content'],
+                    default='mtime',
+                    help_text="How to tell when a source directory has changed "
+                              "(which requires a new build).\n"
+                              "  mtime - (default) Use the latest modification "
+                              "time of anything in the directory.\n"
+                              "  content - Hash the contents of every file. "
+                              "File hashes are cached, so only changed files "
+                              "are re-read."
+                ),
                 yc.KeyedElem(
                     'spack', elements=[
                         yc.ListElem(
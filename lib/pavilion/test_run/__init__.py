@@ -2,4 +2,5 @@
 
 from .test_attrs import TestAttributes, test_run_attr_transform
 from .test_run import TestRun
-from .utils import get_latest_tests, load_tests, id_pair_from_path, mass_status_update
+from .utils import get_latest_tests, load_tests, id_pair_from_path, mass_status_update, \
+    StatusUpdates
@@ -0,0 +1,385 @@
+"""Completed test runs can be compacted (see 'pav maint compact') by packing almost
+everything in the test run directory into a single zip archive. Zip files carry an
+index of their contents, so individual files can be read straight out of the archive
+without unpacking it.
+
+Only the attributes file (which summarizes the test's state, result, and
+completion) and the symlinks that other parts of Pavilion look for (the build
+origin, series, and job links) are left in the test run directory.
+
+Build files that are hardlinks or reflinks of the test's build origin (see the
+build 'copy_mode' option) are archived as symlinks to the original, just like a
+symlinked build, rather than as full copies.
+"""
+
+import errno
+import filecmp
+import io
+import os
+import posixpath
+import shutil
+import stat
+import zipfile
+from pathlib import Path
+from typing import Dict, Union
+
+ARCHIVE_FN = 'run.zip'
+
+KEEP_FILES = ('attributes', 'build_origin', 'series', 'job', ARCHIVE_FN)
+"""Files that are left in place when a test run is compacted."""
+
+SKIP_SUFFIXES = ('.tmp', '.idx')
+"""Files with these suffixes are temporary, or can be rebuilt, so they aren't
+archived."""
+
+MAX_LINK_DEPTH = 40
+
+
+def _is_link(info: zipfile.ZipInfo) -> bool:
+    """Whether the archive member is a symlink."""
+
+    return stat.S_ISLNK(info.external_attr >> 16)
+
+
+class RunArchive:
+    """The archive of a compacted test run."""
+
+    def __init__(self, test_path: Path):
+        """
+        :param test_path: The path to the test run directory.
+        """
+
+        self.test_path = test_path
+        self.path = test_path/ARCHIVE_FN
+        self._members = None  # type: Union[None, Dict[str, Union[zipfile.ZipInfo, None]]]
+
+    def members(self) -> Dict[str, Union[zipfile.ZipInfo, None]]:
+        """The archive's contents, by name. Directories don't have a trailing
+        slash. Directories that only exist implicitly (as the parent of other
+        members) have no info."""
+
+        if self._members is None:
+            members = {}
+            with zipfile.ZipFile(str(self.path)) as zfile:
+                for info in zfile.infolist():
+                    name = info.filename.rstrip('/')
+                    members[name] = info
+                    parent = posixpath.dirname(name)
+                    while parent and parent not in members:
+                        members[parent] = None
+                        parent = posixpath.dirname(parent)
+            self._members = members
+
+        return self._members
+
+    def resolve(self, rel_path: str) -> Union[str, Path]:
+        """Follow any symlinks in the given path relative to the test run directory.
+
+        :returns: The name of the archive member, or the real path when the path
+            (or the links in it) lead outside of the archive.
+        :raises FileNotFoundError: When the path doesn't exist in the archive.
+        """
+
+        members = self.members()
+        parts = [part for part in posixpath.normpath(rel_path).split('/')
+                 if part not in ('', '.')]
+
+        depth = 0
+        i = 0
+        while i < len(parts):
+            name = '/'.join(parts[:i+1])
+            if name.startswith('..') or (i == 0 and name in KEEP_FILES):
+                # These were never archived.
+                return self.test_path.joinpath(*parts)
+
+            if name not in members:
+                raise FileNotFoundError(
+                    errno.ENOENT, "No such file in run archive '{}'".format(self.path),
+                    rel_path)
+
+            info = members[name]
+            if info is not None and _is_link(info):
+                depth += 1
+                if depth > MAX_LINK_DEPTH:
+                    raise OSError(errno.ELOOP, "Too many levels of symbolic links",
+                                  rel_path)
+
+                with zipfile.ZipFile(str(self.path)) as zfile:
+                    target = zfile.read(info).decode()
+
+                if os.path.isabs(target):
+                    target_path = Path(target)
+                    try:
+                        target = target_path.relative_to(self.test_path).as_posix()
+                    except ValueError:
+                        return target_path.joinpath(*parts[i+1:])
+                else:
+                    target = posixpath.join(posixpath.dirname(name), target)
+
+                parts = ([part for part in posixpath.normpath(target).split('/')
+                          if part not in ('', '.')]
+                         + parts[i+1:])
+                i = 0
+                continue
+
+            i += 1
+
+        return '/'.join(parts)
+
+    def is_dir(self, name: str) -> bool:
+        """Whether the given (resolved) member is a directory."""
+
+        members = self.members()
+        return name == '' or (name in members
+                              and (members[name] is None or members[name].is_dir()))
+
+    def open(self, rel_path: str, mode: str = 'r'):
+        """Open the given file in the archive for reading.
+
+        :param rel_path: The path of the file, relative to the test run directory.
+        :param mode: 'r' or 'rb'.
+        """
+
+        if mode not in ('r', 'rb'):
+            raise OSError(errno.EROFS, "Run archives are read only",
+                          str(self.test_path/rel_path))
+
+        name = self.resolve(rel_path)
+        if isinstance(name, Path):
+            return name.open(mode)
+
+        if self.is_dir(name):
+            raise IsADirectoryError(errno.EISDIR, "Is a directory",
+                                    str(self.test_path/rel_path))
+
+        zfile = zipfile.ZipFile(str(self.path))
+        try:
+            # The member file keeps the archive file itself open until it's closed.
+            member = zfile.open(name)
+        finally:
+            zfile.close()
+
+        if mode == 'rb':
+            return member
+
+        return io.TextIOWrapper(member)
+
+
+class ArchivePath:
+    """A read only, path-like object for a file in a test run archive. This
+    supports enough of the pathlib.Path interface to be used in place of a path
+    for reading test run files."""
+
+    def __init__(self, archive: RunArchive, rel_path: str):
+        self.archive = archive
+        self.rel_path = rel_path
+
+    @property
+    def name(self) -> str:
+        """The file's name."""
+
+        return posixpath.basename(self.rel_path)
+
+    def with_name(self, name: str) -> 'ArchivePath':
+        """Return a path to a sibling file in the archive."""
+
+        return ArchivePath(self.archive,
+                           posixpath.join(posixpath.dirname(self.rel_path), name))
+
+    def with_suffix(self, suffix: str) -> 'ArchivePath':
+        """Return this path with a different suffix."""
+
+        return self.with_name(posixpath.splitext(self.name)[0] + suffix)
+
+    def __truediv__(self, other) -> 'ArchivePath':
+        return ArchivePath(self.archive, posixpath.join(self.rel_path, str(other)))
+
+    def as_posix(self) -> str:
+        """Where the file would be if the run wasn't compacted."""
+
+        return (self.archive.test_path/self.rel_path).as_posix()
+
+    def __str__(self):
+        return self.as_posix()
+
+    def __repr__(self):
+        return 'ArchivePath({!r}, {!r})'.format(str(self.archive.path), self.rel_path)
+
+    def __eq__(self, other):
+        return (isinstance(other, ArchivePath)
+                and self.archive.path == other.archive.path
+                and self.rel_path == other.rel_path)
+
+    def __hash__(self):
+        return hash((self.archive.path, self.rel_path))
+
+    def _resolve(self) -> Union[str, Path, None]:
+        try:
+            return self.archive.resolve(self.rel_path)
+        except OSError:
+            return None
+
+    def exists(self) -> bool:
+        """Whether the file exists in the archive."""
+
+        name = self._resolve()
+        if isinstance(name, Path):
+            return name.exists()
+        return name is not None
+
+    def is_file(self) -> bool:
+        """Whether this is a regular file in the archive."""
+
+        name = self._resolve()
+        if isinstance(name, Path):
+            return name.is_file()
+        return name is not None and not self.archive.is_dir(name)
+
+    def is_dir(self) -> bool:
+        """Whether this is a directory in the archive."""
+
+        name = self._resolve()
+        if isinstance(name, Path):
+            return name.is_dir()
+        return name is not None and self.archive.is_dir(name)
+
+    def open(self, mode: str = 'r'):
+        """Open the file for reading."""
+
+        return self.archive.open(self.rel_path, mode)
+
+    def read_bytes(self) -> bytes:
+        """Return the file's contents."""
+
+        with self.open('rb') as file:
+            return file.read()
+
+    def read_text(self) -> str:
+        """Return the file's contents as a string."""
+
+        with self.open() as file:
+            return file.read()
+
+    def _read_only(self, *_, **__):
+        raise OSError(errno.EROFS, "Run archives are read only", self.as_posix())
+
+    unlink = _read_only
+    rename = _read_only
+    touch = _read_only
+    mkdir = _read_only
+    symlink_to = _read_only
+
+
+def run_file(test_path: Path, rel_path: str) -> Union[Path, ArchivePath]:
+    """Return the path to the given file in a test run directory, which will be a
+    path into the run archive if the test run has been compacted."""
+
+    if (test_path/ARCHIVE_FN).exists():
+        return ArchivePath(RunArchive(test_path), rel_path)
+
+    return test_path/rel_path
+
+
+def _build_origin_copy(path: str, rel_path: str,
+                       origin_dir: Union[str, None]) -> Union[str, None]:
+    """Check whether the given file is a copy of the same file in the build origin,
+    such as a hardlink or reflink.
+
+    :returns: The path to the original file, or None.
+    """
+
+    if origin_dir is None or not rel_path.startswith('build/'):
+        return None
+
+    origin_path = os.path.join(origin_dir, rel_path[len('build/'):])
+    try:
+        file_stat = os.stat(path)
+        origin_stat = os.stat(origin_path)
+    except OSError:
+        return None
+
+    if os.path.samestat(file_stat, origin_stat):
+        return origin_path
+
+    if (not stat.S_ISREG(origin_stat.st_mode)
+            or file_stat.st_size != origin_stat.st_size):
+        return None
+
+    # There's no portable way to tell whether two files share their data (as
+    # reflinks do), so just check that the contents are the same.
+    try:
+        if filecmp.cmp(path, origin_path, shallow=False):
+            return origin_path
+    except OSError:
+        pass
+
+    return None
+
+
+def pack_run_dir(test_path: Path) -> int:
+    """Pack the contents of a test run directory into its run archive, and then
+    remove everything that was packed. If interrupted, this can safely be run
+    again. Symlinks are archived as links, not followed. Build files that are
+    copies of those in the build origin (hardlinks or reflinks) are archived as
+    symlinks to the originals.
+
+    :returns: The number of files and directories removed.
+    :raises OSError: On any error creating the archive or removing files.
+    """
+
+    archive_path = test_path/ARCHIVE_FN
+
+    origin_link = test_path/'build_origin'
+    origin_dir = os.path.realpath(str(origin_link)) if origin_link.is_dir() else None
+
+    if not archive_path.exists():
+        tmp_path = test_path/(ARCHIVE_FN + '.tmp')
+        with zipfile.ZipFile(str(tmp_path), 'w', compression=zipfile.ZIP_DEFLATED) \
+                as zfile:
+            for dirpath, dirnames, filenames in os.walk(str(test_path)):
+                rel_dir = os.path.relpath(dirpath, str(test_path))
+                rel_dir = '' if rel_dir == '.' else rel_dir
+
+                if rel_dir and not dirnames and not filenames:
+                    zfile.write(dirpath, rel_dir)
+
+                for name in sorted(dirnames) + sorted(filenames):
+                    rel_path = posixpath.join(rel_dir, name)
+                    if not rel_dir and (name in KEEP_FILES
+                                        or name.endswith(SKIP_SUFFIXES)):
+                        continue
+
+                    path = os.path.join(dirpath, name)
+                    if os.path.islink(path):
+                        link_target = os.readlink(path)
+                    elif name in filenames:
+                        link_target = _build_origin_copy(path, rel_path, origin_dir)
+                        if link_target is None:
+                            zfile.write(path, rel_path)
+                            continue
+                    else:
+                        continue
+
+                    info = zipfile.ZipInfo(rel_path)
+                    info.external_attr = (stat.S_IFLNK | 0o777) << 16
+                    zfile.writestr(info, link_target)
+
+                # Don't descend into (symlinked or) kept directories.
+                dirnames[:] = [name for name in dirnames
+                               if not os.path.islink(os.path.join(dirpath, name))
+                               and (rel_dir or name not in KEEP_FILES)]
+
+        tmp_path.rename(archive_path)
+
+    removed = 0
+    for path in test_path.iterdir():
+        if path.name in KEEP_FILES:
+            continue
+
+        if path.is_dir() and not path.is_symlink():
+            shutil.rmtree(str(path))
+        else:
+            path.unlink()
+        removed += 1
+
+    return removed
@@ -1,11 +1,13 @@
 import json
 import os
 from pathlib import Path
-from typing import Callable, Any
+from typing import Callable, Any, Union
 
 from pavilion import utils
 from pavilion.config import DEFAULT_CONFIG_LABEL
 from pavilion.errors import TestRunError
+from pavilion.status_file import TestStatusFile
+from .archive import ARCHIVE_FN, ArchivePath, RunArchive
 
 
 # pylint: disable=protected-access
@@ -57,6 +59,9 @@ class TestAttributes:
 
     COMPLETE_FN = 'RUN_COMPLETE'
 
+    STATUS_FN = 'status'
+    """File that tracks the tests's status."""
+
     def __init__(self, path: Path, load=True):
         """Initialize attributes.
         :param path: Path to the test directory.
@@ -71,6 +76,9 @@ class TestAttributes:
 
         self._status_file = None
 
+        # The run archive of compacted test runs (False if there isn't one).
+        self._archive = None
+
         self.results_path = self.path/'results.json'
         self._results = None
 
@@ -100,9 +108,11 @@ class TestAttributes:
                     "'{}': {}".format(key, val, self.id, err.args[0])
                 )
 
+        # Encoding to a string first is far faster than json.dump, which writes
+        # each piece separately.
         tmp_path = attr_path.with_suffix('.tmp')
         with tmp_path.open('w') as attr_file:
-            json.dump(attrs, attr_file)
+            attr_file.write(json.dumps(attrs))
         tmp_path.rename(attr_path)
 
     def load_attributes(self):
@@ -187,7 +197,7 @@ class TestAttributes:
 
         return attrs
 
-    LIST_ATTRS_EXCEPTIONS = ['complete']
+    LIST_ATTRS_EXCEPTIONS = ['archive', 'complete']
 
     @classmethod
     def list_attrs(cls):
@@ -257,6 +267,12 @@ class TestAttributes:
         """Returns whether the test is complete."""
 
         if not self._complete:
+            # Tests record their completion time in their attributes, so we
+            # usually don't need to look any further.
+            if self._attrs.get('complete_time') is not None:
+                self._complete = True
+                return True
+
             run_complete_path = self.path / self.COMPLETE_FN
             # This will force a meta-data update on the directory.
             list(self.path.iterdir())
@@ -271,6 +287,10 @@ class TestAttributes:
     def complete_time(self) -> float:
         """Returns the test completion timestamp."""
 
+        complete_time = self._attrs.get('complete_time')
+        if complete_time is not None:
+            return complete_time
+
         complete_path = self.path / self.COMPLETE_FN
 
         if complete_path.exists():
@@ -285,13 +305,38 @@ class TestAttributes:
     FAIL = 'FAIL'
     ERROR = 'ERROR'
 
+    @property
+    def archive(self) -> Union[RunArchive, None]:
+        """The run archive, if this test run has been compacted."""
+
+        if self._archive is None:
+            if (self.path/ARCHIVE_FN).exists():
+                self._archive = RunArchive(self.path)
+            else:
+                self._archive = False
+
+        return self._archive or None
+
+    def run_file(self, rel_path: str) -> Union[Path, ArchivePath]:
+        """Return the path to the given file (relative to the test run directory).
+        For compacted test runs, this is a read only path to the file in the run
+        archive."""
+
+        archive = self.archive
+        if archive is not None:
+            return ArchivePath(archive, rel_path)
+
+        return self.path/rel_path
+
     @property
     def results(self):
         """The test results. Returns a dictionary of basic information
         if the test has no results."""
-        if self.results_path.exists() and (
+
+        results_path = self.run_file(self.results_path.name)
+        if results_path.exists() and (
                 self._results is None or self._results['result'] is None):
-            with self.results_path.open() as results_file:
+            with results_path.open() as results_file:
                 self._results = json.load(results_file)
 
         if self._results is None:
@@ -309,6 +354,11 @@ class TestAttributes:
     def result(self):
         """The test result - PASS/FAIL/ERROR, or None if there isn't a result."""
 
+        # The final result of complete tests is saved with the attributes.
+        if (self._results is None and self._attrs.get('result') is not None
+                and self.complete):
+            return self._attrs['result']
+
         return self.results.get('result', None)
 
     @property
@@ -322,10 +372,6 @@ class TestAttributes:
         else:
             return '{}.{}'.format(self.cfg_label, self.id)
 
-    @property
-    def state(self) -> str:
-        """Returns the current state of the test."""
-
     build_only = basic_attr(
         name='build_only',
         doc="Only build this test, never run it.")
@@ -345,18 +391,35 @@ class TestAttributes:
 
         name='id',
         doc="The test run id (unique per working_dir at any given time).")
+    job_path = basic_attr(
+        name='job_path',
+        doc="The path to the job this test was scheduled under.")
     name = basic_attr(
         name='name',
         doc="The full name of the test.")
     rebuild = basic_attr(
         name='rebuild',
         doc="Whether or not this test will rebuild it's build.")
+    sched_name = basic_attr(
+        name='sched_name',
+        doc="The name of the scheduler this test runs under.")
     skipped = basic_attr(
         name='skipped',
         doc="Did this test's skip conditions evaluate as 'skipped'?")
     started = basic_attr(
         name='started',
         doc="The start time for this test run.")
+    state = basic_attr(
+        name='state',
+        doc="The test's state as of when its attributes were last saved. Once the test "
+            "is complete, this is its final state.")
+    state_time = basic_attr(
+        name='state_time',
+        doc="When the test's (saved) state was set.")
+    states = basic_attr(
+        name='states',
+        doc="Every state the test has had. This is only saved once the test is "
+            "complete.")
     suite_path = basic_attr(
         name='suite_path',
         doc="Path to the suite_file that defined this test run."
@@ -383,6 +446,61 @@ class TestAttributes:
 
 def test_run_attr_transform(path):
     """A dir_db transformer to convert a test_run path into a dict of test
-    attributes."""
-
-    return TestAttributes(path).attr_dict(serialize=True)
+    attributes. This also includes the test's current 'state', when that state
+    was set ('state_time'), and every state the test has ever had ('states'), so
+    state filters can be answered from the index."""
+
+    attrs = TestAttributes(path).attr_dict(serialize=True)
+
+    status_path = path/TestAttributes.STATUS_FN
+    try:
+        status_mtime = status_path.stat().st_mtime_ns
+    except OSError:
+        status_mtime = None
+
+    # Complete tests have their final state information in their attributes, unless
+    # their status was changed after that (like with 'pav set_status').
+    if attrs.get('states') is not None:
+        try:
+            attrs_mtime = (path/TestAttributes.ATTR_FILE_NAME).stat().st_mtime_ns
+        except OSError:
+            attrs_mtime = None
+
+        if status_mtime is None or (attrs_mtime is not None
+                                    and status_mtime <= attrs_mtime):
+            return attrs
+
+    if status_mtime is not None:
+        current, states = TestStatusFile(status_path).summary()
+        attrs['state'] = current.state
+        attrs['state_time'] = current.when
+        attrs['states'] = states
+    else:
+        attrs['state'] = None
+        attrs['state_time'] = None
+        attrs['states'] = []
+
+    return attrs
+
+
+def test_run_index_mtime(path) -> int:
+    """Test run index entries are stale whenever either the test run directory or
+    its status file (which is only ever appended to) changes. Returns the later
+    of the two mtimes, in ns. A test's status can change even after it's complete
+    (with 'pav set_status', for instance), so complete entries are checked too."""
+
+    mtime = path.stat().st_mtime_ns
+    try:
+        mtime = max(mtime, (path/TestAttributes.STATUS_FN).stat().st_mtime_ns)
+    except OSError:
+        pass
+
+    return mtime
+
+
+# The attributes that dir_db indexes should make directly searchable.
+test_run_attr_transform.index_columns = (
+    'complete', 'created', 'finished', 'name', 'result', 'started', 'state',
+    'states', 'sys_name', 'user')
+test_run_attr_transform.index_mtime = test_run_index_mtime
+test_run_attr_transform.index_recheck_complete = True
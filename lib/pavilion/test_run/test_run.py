@@ -27,6 +27,7 @@ from pavilion import utils
 from pavilion import create_files
 from pavilion import resolve
 from pavilion.build_tracker import BuildTracker, MultiBuildTracker
+from pavilion.completion_watcher import CompletionWatcher
 from pavilion.deferred import DeferredVariable
 from pavilion.errors import TestRunError, TestRunNotFoundError, TestConfigError, ResultError, \
     VariableError
@@ -36,6 +37,7 @@ from pavilion.status_file import TestStatusFile, STATES
 from pavilion.test_config.file_format import NO_WORKING_DIR
 from pavilion.test_config.utils import parse_timeout
 from pavilion.types import ID_Pair
+from . import archive
 from .test_attrs import TestAttributes
 
 
@@ -84,9 +86,6 @@ class TestRun(TestAttributes):
 
     NO_LABEL = '_none'
 
-    STATUS_FN = 'status'
-    """File that tracks the tests's status."""
-
     CANCEL_FN = 'cancel'
     """File that indicates that the test was cancelled."""
 
@@ -96,46 +95,79 @@ class TestRun(TestAttributes):
     BUILD_TEMPLATE_DIR = 'templates'
     """Directory that holds build templates."""
 
+    LAZY_ATTRS = {
+        'config': '_lazy_load_config',
+        'scheduler': '_lazy_load_config',
+        'test_version': '_lazy_load_config',
+        'build_local': '_lazy_load_config',
+        'run_timeout': '_lazy_load_config',
+        'concurrent': '_lazy_load_config',
+        'timeout_file': '_lazy_load_config',
+        'shebang': '_lazy_load_config',
+        'var_man': '_lazy_load_var_man',
+        'permute_vars': '_lazy_load_permute_vars',
+        'builder': '_lazy_load_builder',
+        'skip_reasons': '_lazy_load_skip_reasons',
+    }
+    """Attributes of lazily loaded tests that aren't loaded until they're first
+    used, and the method that loads each."""
+
     def __init__(self, pav_cfg: PavConfig, config, var_man=None,
-                 _id=None, rebuild=False, build_only=False):
+                 _id=None, rebuild=False, build_only=False, reserved_id=None,
+                 working_dir: Path = None):
         """Create an new TestRun object. If loading an existing test
     instance, use the ``TestRun.from_id()`` method.
 
     :param pav_cfg: The pavilion configuration.
-    :param dict config: The test configuration dictionary.
+    :param dict config: The test configuration dictionary. When loading an
+        existing test, this may be None to load the test lazily; the config,
+        variables, builder, and skip conditions are then only loaded when first
+        used.
     :param bool build_only: Only build this test run, do not run it.
     :param bool rebuild: After determining the build name, deprecate it and
         select a new, non-deprecated build.
     :param int _id: The test id of an existing test. (You should be using
-        TestRun.load)."""
+        TestRun.load).
+    :param reserved_id: An (id, path) tuple for a new test from
+        ``dir_db.reserve_ids()``, to use instead of creating a new id
+        directory.
+    :param working_dir: The working directory of an existing test. Required when
+        loading lazily."""
 
         self.saved = False
 
         new_test = _id is None
+        lazy = config is None
 
         # Just about every method needs this
         self._pav_cfg = pav_cfg
-        self.scheduler = config['scheduler']
+        self._lazy = lazy
 
-        # Get the working dir specific to where this test came from.
-        if config.get('working_dir', NO_WORKING_DIR) == NO_WORKING_DIR:
-            self.working_dir = Path(self._pav_cfg['working_dir'])
+        if lazy:
+            if new_test or working_dir is None:
+                raise RuntimeError("Only existing tests with a known working_dir "
+                                   "can be loaded lazily.")
+            self.working_dir = Path(working_dir)
         else:
-            self.working_dir = Path(config['working_dir'])
+            self.scheduler = config['scheduler']
+            # Get the working dir specific to where this test came from.
+            self.working_dir = self.get_working_dir(pav_cfg, config)
+            self.config = config
+            self._validate_config()
 
         tests_path = self.working_dir/self.RUN_DIR
 
-        self.config = config
-        self._validate_config()
-
         # Get an id for the test, if we weren't given one.
         if new_test:
             # These will be set by save() or on load.
-            try:
-                id_tmp, run_path = dir_db.create_id_dir(tests_path)
-            except (OSError, TimeoutError) as err:
-                raise TestRunError("Could not create test id directory at '{}'"
-                                   .format(tests_path), err)
+            if reserved_id is not None:
+                id_tmp, run_path = reserved_id
+            else:
+                try:
+                    id_tmp, run_path = dir_db.create_id_dir(tests_path)
+                except (OSError, TimeoutError) as err:
+                    raise TestRunError("Could not create test id directory at '{}'"
+                                       .format(tests_path), err)
             super().__init__(path=run_path, load=False)
             self._variables_path = self.path / 'variables'
             self.var_man = None
@@ -150,6 +182,7 @@ class TestRun(TestAttributes):
             self.created = time.time()
             self.name = self.make_name(config)
             self.rebuild = rebuild
+            self.sched_name = config['scheduler']
             self.cfg_label = config.get('cfg_label', self.NO_LABEL)
             suite_path = config.get('suite_path')
             if suite_path == '<no_suite>' or suite_path is None:
@@ -169,18 +202,100 @@ class TestRun(TestAttributes):
                 raise TestRunNotFoundError(
                     "No test with id '{}' could be found.".format(self.id))
 
-            self._variables_path = self.path / 'variables'
-            self.status = TestStatusFile(self.path / self.STATUS_FN)
+            # Compacted test runs are read from their run archive.
+            self._variables_path = self.run_file('variables')
+            self.status = TestStatusFile(self.run_file(self.STATUS_FN))
             self.suite_path = self.suite_path
 
-            try:
-                self.var_man = VariableSetManager.load(self._variables_path)
-            except VariableError as err:
-                raise TestRunError("Error loading variable set for test {}".format(self.id),
-                                   err)
+            if not lazy:
+                self._lazy_load_var_man()
+
+        self.run_log = self.path/'run.log'
+        self.build_log = self.path/'build.log'
+        self.results_log = self.path/'results.log'
+        self.build_origin_path = self.path/'build_origin'
+
+        self.build_script_path = self.path/'build.sh'  # type: Path
+        self.build_path = self.path/'build'
+
+        self.run_tmpl_path = self.path/'run.tmpl'
+        self.run_script_path = self.path/'run.sh'
+
+        # This will be set by the scheduler
+        self._job = None
+
+        self._results = None
+
+        if lazy:
+            # Everything else is loaded as needed.
+            return
 
         self.sys_name = self.var_man.get('sys_name', '<unknown>')
 
+        self._init_config_attrs()
+
+        self.permute_vars = self._get_permute_vars()
+
+        if not new_test:
+            self.builder = self._make_builder()
+
+        self.skip_reasons = self._evaluate_skip_conditions()
+        self.skipped = len(self.skip_reasons) != 0
+
+    def __getattr__(self, name):
+        """Load the lazily loaded attributes on first use. This is only called when
+        the attribute hasn't been set."""
+
+        loader = self.LAZY_ATTRS.get(name)
+        # Checking the instance dict directly keeps us from recursing when we
+        # haven't been fully initialized (such as when unpickling).
+        if loader is None or not self.__dict__.get('_lazy', False):
+            raise AttributeError("'{}' object has no attribute '{}'"
+                                 .format(type(self).__name__, name))
+
+        # Loading is idempotent, so it doesn't matter if two threads race to do it.
+        getattr(self, loader)()
+
+        return self.__dict__[name]
+
+    def _lazy_load_config(self):
+        """Load the test config, and the attributes that come from it."""
+
+        self.config = self._load_config(self.path)
+        self.scheduler = self.config['scheduler']
+        self._validate_config()
+        self._init_config_attrs()
+
+    def _lazy_load_var_man(self):
+        """Load the test's variables."""
+
+        try:
+            self.var_man = VariableSetManager.load(self._variables_path)
+        except VariableError as err:
+            raise TestRunError("Error loading variable set for test {}".format(self.id),
+                               err)
+
+    def _lazy_load_permute_vars(self):
+        """Get the permute vars from the config and variables."""
+
+        self.permute_vars = self._get_permute_vars()
+
+    def _lazy_load_builder(self):
+        """Create the builder for an existing test."""
+
+        self.builder = self._make_builder()
+
+    def _lazy_load_skip_reasons(self):
+        """Evaluate the skip conditions. The 'skipped' attribute itself is always
+        available from the saved attributes."""
+
+        self.skip_reasons = self._evaluate_skip_conditions()
+
+    def _init_config_attrs(self):
+        """Set the attributes that come directly from the test config."""
+
+        config = self.config
+
         self.test_version = config.get('test_version')
 
         # Mark the run to build locally.
@@ -204,38 +319,14 @@ class TestRun(TestAttributes):
             raise TestRunError("The run.concurrent test config key must be a positive integer. "
                                "Test '{}' got '{}'".format(self.full_id, self.concurrent))
 
-        self.run_log = self.path/'run.log'
-        self.build_log = self.path/'build.log'
-        self.results_log = self.path/'results.log'
-        self.build_origin_path = self.path/'build_origin'
-
         # Use run.log as the default run timeout file
         self.timeout_file = self.run_log
         run_timeout_file = config.get('run', {}).get('timeout_file')
         if run_timeout_file is not None:
             self.timeout_file = self.path/run_timeout_file
 
-        self.permute_vars = self._get_permute_vars()
-
         self.shebang = self.config.get('shebang', '#!/usr/bin/bash')
 
-        self.build_script_path = self.path/'build.sh'  # type: Path
-        self.build_path = self.path/'build'
-
-        self.run_tmpl_path = self.path/'run.tmpl'
-        self.run_script_path = self.path/'run.sh'
-
-        if not new_test:
-            self.builder = self._make_builder()
-
-        # This will be set by the scheduler
-        self._job = None
-
-        self._results = None
-
-        self.skip_reasons = self._evaluate_skip_conditions()
-        self.skipped = len(self.skip_reasons) != 0
-
     @property
     def id_pair(self) -> ID_Pair:
         """Returns an ID_pair (a tuple of the working dir and test id)."""
@@ -257,12 +348,15 @@ class TestRun(TestAttributes):
         else:
             return None
 
-    def save(self):
+    def save(self, build_hashes: builder.BuildHashCache = None):
         """Save the test configuration to file and create the builder. This
         essentially separates out a filesystem operations from creating a test,
         with the exception of creating the initial id directory. This
         should generally only be called once, after we create the test and
-        make sure we actually want it."""
+        make sure we actually want it.
+
+        :param build_hashes: Build hashes to share with other tests being saved
+            at the same time."""
 
         if self.skipped:
             raise RuntimeError("Skipped tests should never be saved.")
@@ -285,7 +379,7 @@ class TestRun(TestAttributes):
             config=self.config.get('build', {}),
             module_wrappers=self.config.get('module_wrappers', {}))
 
-        self.builder = self._make_builder()
+        self.builder = self._make_builder(build_hashes)
         self.build_name = self.builder.name
 
         self._write_script(
@@ -299,7 +393,7 @@ class TestRun(TestAttributes):
 
         self.saved = True
 
-    def _make_builder(self):
+    def _make_builder(self, build_hashes: builder.BuildHashCache = None):
 
         spack_config = (self.config.get('spack_config', {}) if self.spack_enabled()
                         else None)
@@ -321,6 +415,7 @@ class TestRun(TestAttributes):
                 working_dir=self.working_dir,
                 templates=templates,
                 build_name=self.build_name,
+                build_hashes=build_hashes,
             )
         except errors.TestBuilderError as err:
             raise TestRunError(
@@ -335,6 +430,10 @@ class TestRun(TestAttributes):
 
         templates = self.config.get('build', {}).get('templates', {})
         tmpl_dir = self.path/self.BUILD_TEMPLATE_DIR
+        if self.archive is not None:
+            # Compacted test runs are never built again.
+            return {tmpl_dir/tmpl_dest: tmpl_dest for tmpl_dest in templates.values()}
+
         if templates:
             if not tmpl_dir.exists():
                 try:
@@ -363,6 +462,16 @@ class TestRun(TestAttributes):
             raise TestRunError("Spack cannot be enabled without 'spack_path' "
                                "being defined in the pavilion config.")
 
+    @staticmethod
+    def get_working_dir(pav_cfg, config) -> Path:
+        """Return the working directory a new test with the given config should be
+        created in."""
+
+        if config.get('working_dir', NO_WORKING_DIR) == NO_WORKING_DIR:
+            return Path(pav_cfg['working_dir'])
+        else:
+            return Path(config['working_dir'])
+
     @classmethod
     def parse_raw_id(cls, pav_cfg, raw_test_id: str) -> ID_Pair:
         """Parse a raw test run id and return the label, working_dir, and id
@@ -403,12 +512,15 @@ class TestRun(TestAttributes):
         return cls.load(pav_cfg, working_dir, test_id)
 
     @classmethod
-    def load(cls, pav_cfg, working_dir: Path, test_id: int) -> 'TestRun':
+    def load(cls, pav_cfg, working_dir: Path, test_id: int, lazy: bool = False) -> 'TestRun':
         """Load an old TestRun object given a test id.
 
         :param pav_cfg: The pavilion config
         :param working_dir: The working directory where this test run lives.
         :param int test_id: The test's id number.
+        :param lazy: Only load the test's config, variables, builder, and skip
+            conditions when they're first used. Good for when only the test's
+            attributes, status, job, or results are needed.
         :rtype: TestRun
         """
 
@@ -419,6 +531,11 @@ class TestRun(TestAttributes):
                                "at '{}' as expected."
                                .format(test_id, path))
 
+        if lazy:
+            test_run = TestRun(pav_cfg, None, _id=test_id, working_dir=working_dir)
+            test_run.saved = True
+            return test_run
+
         config = cls._load_config(path)
 
         test_run = TestRun(pav_cfg, config, _id=test_id)
@@ -544,26 +661,71 @@ class TestRun(TestAttributes):
             except FileNotFoundError:
                 continue
 
+        self._save_config_json(config)
+
+    CONFIG_JSON_FN = 'config.json'
+    """A copy of the test config that's much faster to load than the YAML version.
+    The YAML config is still written, for people to read."""
+    CONFIG_JSON_VERSION = 1
+
+    def _save_config_json(self, config: dict):
+        """Save the (de-normalized) config in the fast JSON format. Failure isn't
+        fatal, as the YAML config can always be used instead."""
+
+        json_path = self.path/self.CONFIG_JSON_FN
+        tmp_path = json_path.with_suffix('.tmp')
+
+        try:
+            with tmp_path.open('w') as json_file:
+                json.dump({'version': self.CONFIG_JSON_VERSION, 'config': config},
+                          json_file)
+            tmp_path.rename(json_path)
+        except (OSError, TypeError, ValueError):
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+
+    @classmethod
+    def _load_config_json(cls, test_path: Path) -> Union[dict, None]:
+        """Load the JSON version of the config, if it exists and is usable."""
+
+        try:
+            with archive.run_file(test_path, cls.CONFIG_JSON_FN).open() as json_file:
+                data = json.load(json_file)
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(data, dict) or data.get('version') != cls.CONFIG_JSON_VERSION:
+            return None
+
+        config = data.get('config')
+        return config if isinstance(config, dict) else None
+
     @classmethod
     def _load_config(cls, test_path):
-        """Load a saved test configuration."""
-        config_path = test_path/'config'
+        """Load a saved test configuration. The JSON version is used when possible,
+        falling back to the YAML config (which is all older test runs have)."""
+        config_path = archive.run_file(test_path, 'config')
 
-        if not config_path.is_file():
-            raise TestRunError("Could not find config file for test at {}."
-                               .format(test_path))
+        config = cls._load_config_json(test_path)
 
-        try:
-            with config_path.open('r') as config_file:
-                # Because only string keys are allowed in test configs,
-                # this is a reasonable way to load them.
-                config = yaml.load(config_file)
-        except TypeError as err:
-            raise TestRunError("Bad config values for config '{}'"
-                               .format(config_path), err)
-        except (IOError, OSError) as err:
-            raise TestRunError("Error reading config file '{}'"
-                               .format(config_path), err)
+        if config is None:
+            if not config_path.is_file():
+                raise TestRunError("Could not find config file for test at {}."
+                                   .format(test_path))
+
+            try:
+                with config_path.open('r') as config_file:
+                    # Because only string keys are allowed in test configs,
+                    # this is a reasonable way to load them.
+                    config = yaml.load(config_file)
+            except TypeError as err:
+                raise TestRunError("Bad config values for config '{}'"
+                                   .format(config_path), err)
+            except (IOError, OSError) as err:
+                raise TestRunError("Error reading config file '{}'"
+                                   .format(config_path), err)
 
         # Re-normalize variable values.
         variables = config.get('variables', {})
@@ -786,14 +948,77 @@ class TestRun(TestAttributes):
         # run.
         complete_path = self.path/self.COMPLETE_FN
         complete_tmp_path = complete_path.with_suffix('.tmp')
+        complete_time = time.time()
         with complete_tmp_path.open('w') as run_complete:
-            json.dump(
-                {'complete': time.time()},
-                run_complete)
+            run_complete.write(json.dumps({'complete': complete_time}))
         complete_tmp_path.rename(complete_path)
 
         self._complete = True
 
+        # Record the final state of the test in the attributes, so readers don't
+        # have to look anywhere else.
+        current, states = self.status.summary()
+        self.state = current.state
+        self.state_time = current.when
+        self.states = states
+        self._attrs['complete_time'] = complete_time
+        self.save_attributes(update_state=False)
+
+    def save_attributes(self, update_state: bool = True):
+        """Save the attributes, which also serve as a summary of the test's
+        current state, completion, result, and job.
+
+        :param update_state: Update the saved state from the status file first.
+        """
+
+        if update_state and self.status is not None and not self.states:
+            current = self.status.current()
+            self.state = current.state
+            self.state_time = current.when
+
+        super().save_attributes()
+
+    def compact(self) -> int:
+        """Pack this (complete) test run into its run archive, leaving little more
+        than the attributes file behind. The test's files remain readable through
+        run_file(), and the test can still be loaded, but it can no longer be
+        changed. Compacting an already compacted test finishes any interrupted
+        compaction.
+
+        :returns: The number of files and directories removed from the test run
+            directory.
+        :raises TestRunError: If the test isn't complete, or on any error creating
+            the archive.
+        """
+
+        if not self.complete:
+            raise TestRunError("Test run {} can't be compacted until it's complete."
+                               .format(self.full_id))
+
+        if self.archive is None:
+            # Everything needed to list and filter the test has to be in the
+            # attributes file. Older test runs may not have all of it yet.
+            if self.states is None or self._attrs.get('complete_time') is None:
+                current, states = self.status.summary()
+                self.state = current.state
+                self.state_time = current.when
+                self.states = states
+                # Once compacted, the completion file is only in the archive.
+                self._attrs['complete_time'] = self.complete_time or current.when
+                self.save_attributes(update_state=False)
+
+        try:
+            removed = archive.pack_run_dir(self.path)
+        except OSError as err:
+            raise TestRunError("Could not compact test run {}".format(self.full_id), err)
+
+        # Everything is read from the archive from now on.
+        self._archive = None
+        self._variables_path = self.run_file('variables')
+        self.status = TestStatusFile(self.run_file(self.STATUS_FN))
+
+        return removed
+
     def cancel(self, reason: str):
         """Set the cancel file for this test, and denote in its status that it was
         cancelled."""
@@ -815,8 +1040,6 @@ class TestRun(TestAttributes):
 
         return (self.path/self.CANCEL_FN).exists()
 
-    WAIT_INTERVAL = 0.5
-
     def wait(self, timeout=None):
         """Wait for the test run to be complete. This works across hosts, as
         it simply checks for files in the run directory.
@@ -824,20 +1047,22 @@ class TestRun(TestAttributes):
         :param Union(None,float) timeout: How long to wait in seconds. If
             this is None, wait forever.
         :raises TimeoutError: if the timeout expires.
+        :raises TestRunError: if the test run directory is deleted.
         """
 
-        if timeout is not None:
-            timeout = time.time() + timeout
+        if self.complete:
+            return
 
-        while 1:
-            if self.complete:
+        with CompletionWatcher([self]) as watcher:
+            if watcher.wait(timeout):
                 return
 
-            time.sleep(self.WAIT_INTERVAL)
+            if watcher.vanished:
+                raise TestRunError("Test '{}' was deleted while waiting for it to "
+                                   "complete.".format(self.full_id))
 
-            if timeout is not None and time.time() > timeout:
-                raise TimeoutError("Timed out waiting for test '{}' to "
-                                   "complete".format(self.full_id))
+        raise TimeoutError("Timed out waiting for test '{}' to "
+                           "complete".format(self.full_id))
 
     def gather_results(self, run_result: int, regather: bool = False,
                        log_file: TextIO = None):
@@ -981,6 +1206,10 @@ of result keys.
 be set by the scheduler plugin as soon as it's known."""
 
         if self._job is None:
+            if self.job_path is not None:
+                self._job = Job(Path(self.job_path))
+                return self._job
+
             job_path = self.path/self.JOB_FN
             if job_path.exists():
                 self._job = Job(job_path)
@@ -1004,14 +1233,19 @@ be set by the scheduler plugin as soon as it's known."""
             self._add_warning("Could not create job link: {}".format(err))
 
         self._job = job
+        self.job_path = job.path.as_posix()
+        self.save_attributes()
 
     @property
     def complete_time(self):
-        """Returns the completion time from the completion file."""
+        """Returns the completion time from the attributes or completion file."""
 
         if not self.complete:
             return None
 
+        if self._attrs.get('complete_time') is not None:
+            return self._attrs['complete_time']
+
         run_complete_path = self.path/self.COMPLETE_FN
 
         try:
@@ -1,15 +1,20 @@
 """Utility functions for test run objects."""
 
+import logging
+import time
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, TextIO
+from typing import List, TextIO, NamedTuple, Dict
 
 from pavilion import dir_db, output
 from pavilion.config import PavConfig
 from pavilion.errors import TestRunError
+from pavilion.status_file import STATES, TestStatusInfo
 from pavilion.types import ID_Pair
 from .test_run import TestRun
 
+LOGGER = logging.getLogger(__name__)
+
 
 def get_latest_tests(pav_cfg: PavConfig, limit):
     """Returns ID's of latest test given a limit
@@ -52,23 +57,27 @@ def id_pair_from_path(path: Path) -> ID_Pair:
         raise TestRunError("Invalid test id '{}' for test at path '{}'"
                            .format(path.name, path.as_posix()))
 
-    working_dir = path.parents[1]
+    working_dir = dir_db.id_base_path(path).parent
     return ID_Pair((working_dir, test_id))
 
-def _load_test(pav_cfg, id_pair: ID_Pair):
+def _load_test(pav_cfg, id_pair: ID_Pair, lazy: bool = False):
     """Load a test object from an ID_Pair."""
 
     test_wd, test_id = id_pair
 
-    return TestRun.load(pav_cfg, test_wd, test_id)
+    return TestRun.load(pav_cfg, test_wd, test_id, lazy=lazy)
 
 
 LOADED_TESTS = {}
 
 
-def load_tests(pav_cfg, id_pairs: List[ID_Pair], errfile: TextIO) -> List['TestRun']:
+def load_tests(pav_cfg, id_pairs: List[ID_Pair], errfile: TextIO,
+               lazy: bool = True) -> List['TestRun']:
     """Load a set of tests in parallel.
 
+    :param lazy: Load the tests lazily (see TestRun.load()). Most commands only
+        need a test's attributes, status, and results, so this is the default.
+        Everything else is still loaded as soon as it's used.
     :raises TestRunError: When loading a test fails
     """
 
@@ -87,7 +96,7 @@ def load_tests(pav_cfg, id_pairs: List[ID_Pair], errfile: TextIO) -> List['TestR
     with ThreadPoolExecutor(max_workers=pav_cfg['max_threads']) as pool:
         results = []
         for pair in id_filtered_pairs:
-            results.append(pool.submit(_load_test, pav_cfg, pair))
+            results.append(pool.submit(_load_test, pav_cfg, pair, lazy))
 
         for result in results:
             try:
@@ -99,15 +108,72 @@ def load_tests(pav_cfg, id_pairs: List[ID_Pair], errfile: TextIO) -> List['TestR
     return tests
 
 
-def mass_status_update(tests: List[TestRun], state: str, message: str,
-                       set_complete=False):
-    """Update the status of all the given tests with the state and message."""
+StatusUpdates = NamedTuple("StatusUpdates", [('updated', int),
+                                             ('failed', Dict[str, str]),
+                                             ('duration', float)])
+"""The outcome of a mass status update: the number of tests updated, the errors
+for those that couldn't be (by test full id), and how long it all took."""
+
+STATUS_BATCH_SIZE = 256
+"""How many tests each thread updates at a time in a mass status update."""
 
-    def do_update(test):
-        test.status.set(state, message)
+
+def _update_status_batch(tests: List[TestRun], status: TestStatusInfo,
+                         set_complete: bool) -> Dict[str, str]:
+    """Add the given status to each of the tests, syncing each status file once,
+    and return any errors by test full id."""
+
+    failed = {}
+    for test in tests:
+        result = test.status.add_status(status, sync=True)
+        if result.state == STATES.STATUS_ERROR:
+            failed[test.full_id] = result.note
+            continue
 
         if set_complete:
-            test.set_run_complete()
+            try:
+                test.set_run_complete()
+            except (OSError, RuntimeError) as err:
+                failed[test.full_id] = "Could not mark test complete: {}".format(err)
+
+    return failed
+
+
+def mass_status_update(tests: List[TestRun], state: str, message: str,
+                       set_complete=False, max_threads: int = 16) -> StatusUpdates:
+    """Update the status of all the given tests with the state and message. The tests
+    are updated in batches (with a single, shared status line), and this returns only
+    once every update has been written and synced to disk. Each status file is synced
+    once, right after its line is appended; the completion marker (with
+    set_complete) is written but not synced.
+
+    :param tests: The tests to update.
+    :param state: The state to give each test.
+    :param message: The status note.
+    :param set_complete: Also mark each test as complete.
+    :param max_threads: The maximum number of threads to write with.
+    """
 
-    pool = ThreadPoolExecutor(max_workers=16)
-    pool.map(do_update, tests)
+    start = time.time()
+
+    status = TestStatusInfo(state, message)
+    batches = [tests[i:i + STATUS_BATCH_SIZE]
+               for i in range(0, len(tests), STATUS_BATCH_SIZE)]
+
+    failed = {}
+    if len(batches) > 1 and max_threads > 1:
+        with ThreadPoolExecutor(max_workers=min(max_threads, len(batches))) as pool:
+            for batch_failed in pool.map(
+                    lambda batch: _update_status_batch(batch, status, set_complete),
+                    batches):
+                failed.update(batch_failed)
+    else:
+        for batch in batches:
+            failed.update(_update_status_batch(batch, status, set_complete))
+
+    updates = StatusUpdates(len(tests) - len(failed), failed, time.time() - start)
+    LOGGER.debug("Set status %s on %d tests (%d failed) in %0.3fs (%0.1f tests/s).",
+                 state, updates.updated, len(failed), updates.duration,
+                 len(tests)/max(updates.duration, 1e-6))
+
+    return updates
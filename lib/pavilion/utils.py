@@ -5,13 +5,17 @@ plugins.
 """
 
 import datetime as dt
+import fcntl
 import os
 import re
 import shutil
+import stat
 import subprocess
+import threading
 import zipfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
-from typing import Iterator, Union, TextIO
+from typing import Iterator, Union, TextIO, Callable, Iterable, NamedTuple, Tuple
 from typing import List, Dict
 
 
@@ -112,9 +116,10 @@ def make_umask_filtered_copystat(umask: int):
         # follow symlinks (aka don't not follow symlinks)
         follow = follow_symlinks or not (os.path.islink(src) and os.path.islink(dst))
 
-        stat = os.stat(src, follow_symlinks=follow)
-        mode = stat.st_mode & 0o777 & ~umask
-        os.utime(dst, ns=(stat.st_atime_ns, stat.st_mtime_ns), follow_symlinks=follow)
+        src_stat = os.stat(src, follow_symlinks=follow)
+        mode = src_stat.st_mode & 0o777 & ~umask
+        os.utime(dst, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns),
+                 follow_symlinks=follow)
         try:
             os.chmod(dst, mode, follow_symlinks=follow)
         except NotImplementedError:
@@ -123,67 +128,212 @@ def make_umask_filtered_copystat(umask: int):
     return copystat
 
 
+WALK_THREADS = 16
+"""The size of the (shared) thread pool used to walk directory trees."""
+
+_WALK_POOL = None
+_WALK_POOL_PID = None
+_WALK_POOL_LOCK = threading.Lock()
+
+WalkEntry = NamedTuple('WalkEntry', [('path', str), ('name', str),
+                                     ('stat', os.stat_result), ('is_dir', bool),
+                                     ('is_link', bool)])
+"""An entry in a walked directory tree. The stat is of the link itself for
+symlinks, unless symlinks are being followed (and aren't broken). 'is_dir' is
+True for any directory that will be walked."""
+
+
+def _walk_pool() -> ThreadPoolExecutor:
+    """Return the thread pool shared by all tree walks in this process."""
+
+    global _WALK_POOL, _WALK_POOL_PID  # pylint: disable=global-statement
+
+    with _WALK_POOL_LOCK:
+        # The threads of a pool don't survive a fork.
+        if _WALK_POOL is None or _WALK_POOL_PID != os.getpid():
+            _WALK_POOL = ThreadPoolExecutor(WALK_THREADS, thread_name_prefix='tree_walk')
+            _WALK_POOL_PID = os.getpid()
+
+        return _WALK_POOL
+
+
+def _scan_dir(path: str, follow_symlinks: bool, on_dir) -> Tuple[List[WalkEntry], List[str]]:
+    """Stat each entry in the given directory, and call on_dir on them.
+
+    :returns: The directory's entries, and the sub-directories to walk next.
+    """
+
+    entries = []
+    with os.scandir(path) as scan:
+        for entry in scan:
+            is_link = entry.is_symlink()
+            entry_stat = entry.stat(follow_symlinks=False)
+            if is_link and follow_symlinks:
+                try:
+                    entry_stat = entry.stat()
+                except OSError:
+                    pass
+            entries.append(WalkEntry(entry.path, entry.name, entry_stat,
+                                     stat.S_ISDIR(entry_stat.st_mode), is_link))
+
+    sub_dirs = None
+    if on_dir is not None:
+        sub_dirs = on_dir(path, entries)
+
+    if sub_dirs is None:
+        sub_dirs = [entry.path for entry in entries if entry.is_dir]
+    else:
+        sub_dirs = [os.path.join(path, name) for name in sub_dirs]
+
+    return entries, sub_dirs
+
+
+def walk_tree(root: Union[str, Path],
+              on_dir: Callable[[str, List[WalkEntry]], Union[None, Iterable[str]]] = None,
+              follow_symlinks: bool = False,
+              on_error: Callable[[str, OSError], None] = None) -> List[WalkEntry]:
+    """Walk the directory tree under root, scanning directories in parallel in a
+    thread pool shared by every walk in this process. Everything is stat'ed just
+    once, with os.scandir.
+
+    :param root: The directory to walk.
+    :param on_dir: Called (in a walker thread) with the path to each directory and
+        its entries, before any of its sub-directories are walked. It may
+        return the names of the sub-directories to walk (None means all of them).
+        This must not start another walk.
+    :param follow_symlinks: Stat through symlinks, and walk symlinked directories.
+    :param on_error: Called with the path and error for each directory that
+        couldn't be scanned, after which the walk continues without it (like
+        os.walk's onerror). If not given, such errors are raised.
+    :returns: Every entry under root.
+    :raises OSError: When scanning a directory fails, and on_error wasn't given.
+    """
+
+    pool = _walk_pool()
+    results = []
+
+    root = str(root)
+    pending = {pool.submit(_scan_dir, root, follow_symlinks, on_dir): root}
+    try:
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    entries, sub_dirs = future.result()
+                except OSError as err:
+                    if on_error is None:
+                        raise
+                    on_error(path, err)
+                    continue
+
+                results.extend(entries)
+                for sub_dir in sub_dirs:
+                    future = pool.submit(_scan_dir, sub_dir, follow_symlinks, on_dir)
+                    pending[future] = sub_dir
+    except BaseException:
+        for future in pending:
+            future.cancel()
+        wait(pending)
+        raise
+
+    return results
+
+
 def copytree(src, dst, symlinks=False, ignore=None, copy_function=shutil.copy2,
              ignore_dangling_symlinks=False, copystat=shutil.copystat):
-    """This is identical to the python 3.6 copytree, except the user can provide
-    a copystat function."""
-    names = os.listdir(src)
-    if ignore is not None:
-        ignored_names = ignore(src, names)
-    else:
-        ignored_names = set()
+    """This works like the python 3.6 copytree, except the user can provide
+    a copystat function, and files are copied in parallel (see walk_tree())."""
 
-    os.makedirs(dst)
     errors = []
-    for name in names:
-        if name in ignored_names:
-            continue
-        srcname = os.path.join(src, name)
-        dstname = os.path.join(dst, name)
-        try:
-            if os.path.islink(srcname):
-                linkto = os.readlink(srcname)
-                if symlinks:
+    dirs = [(src, dst)]
+    os.makedirs(dst)
+
+    def copy_dir(src_dir: str, entries: List[WalkEntry]) -> List[str]:
+        """Copy the contents of the given directory, and make its sub-directories.
+        Returns the sub-directories to copy."""
+
+        dst_dir = os.path.join(dst, os.path.relpath(src_dir, src))
+
+        if ignore is not None:
+            ignored_names = ignore(src_dir, [entry.name for entry in entries])
+        else:
+            ignored_names = set()
+
+        sub_dirs = []
+        for entry in entries:
+            if entry.name in ignored_names:
+                continue
+
+            srcname = entry.path
+            dstname = os.path.join(dst_dir, entry.name)
+            try:
+                if entry.is_link and symlinks:
                     # We can't just leave it to `copy_function` because legacy
                     # code with a custom `copy_function` may rely on copytree
                     # doing the right thing.
-                    os.symlink(linkto, dstname)
-                    copystat(srcname, dstname, follow_symlinks=not symlinks)
+                    os.symlink(os.readlink(srcname), dstname)
+                    copystat(srcname, dstname, follow_symlinks=False)
+                elif entry.is_dir:
+                    os.mkdir(dstname)
+                    dirs.append((srcname, dstname))
+                    sub_dirs.append(entry.name)
+                elif (entry.is_link and ignore_dangling_symlinks
+                      and not os.path.exists(srcname)):
+                    continue
                 else:
-                    # ignore dangling symlink if the flag is on
-                    if not os.path.exists(linkto) and ignore_dangling_symlinks:
-                        continue
-                    # otherwise let the copy occurs. copy2 will raise an error
-                    if os.path.isdir(srcname):
-                        copytree(srcname, dstname, symlinks, ignore,
-                                 copy_function, ignore_dangling_symlinks, copystat)
-                    else:
-                        copy_function(srcname, dstname)
-                        copystat(srcname, dstname)
-            elif os.path.isdir(srcname):
-                copytree(srcname, dstname, symlinks, ignore, copy_function,
-                         ignore_dangling_symlinks, copystat)
-            else:
-                # Will raise a SpecialFileError for unsupported file types
-                copy_function(srcname, dstname)
-                copystat(srcname, dstname)
-        # catch the Error from the recursive copytree so that we can
-        # continue with other files
-        except shutil.Error as err:
-            errors.extend(str(err))
+                    # Will raise a SpecialFileError for unsupported file types
+                    # (and an error for broken symlinks).
+                    copy_function(srcname, dstname)
+                    copystat(srcname, dstname)
+            except OSError as why:
+                errors.append((srcname, dstname, str(why)))
+
+        return sub_dirs
+
+    def scan_error(src_dir: str, err: OSError):
+        """Record directories that couldn't be read, like any other copy error."""
+
+        errors.append((src_dir, os.path.join(dst, os.path.relpath(src_dir, src)),
+                       str(err)))
+
+    walk_tree(src, copy_dir, follow_symlinks=not symlinks, on_error=scan_error)
+
+    # Directory times have to be set after their contents are copied, deepest first.
+    for src_dir, dst_dir in reversed(dirs):
+        try:
+            copystat(src_dir, dst_dir)
         except OSError as why:
-            errors.append((srcname, dstname, str(why)))
-    try:
-        copystat(src, dst)
-    except OSError as why:
-        # Copying file access times may fail on Windows
-        if getattr(why, 'winerror', None) is None:
-            errors.append((src, dst, str(why)))
+            errors.append((src_dir, dst_dir, str(why)))
+
     if errors:
         raise shutil.Error(errors)
     return dst
 
 
+FICLONE = 0x40049409
+"""The Linux ioctl for making a reflink (copy on write) copy of a file."""
+
+
+def reflink(src: str, dst: str) -> None:
+    """Make a reflink copy of the file at src at dst, which shares the original's
+    data blocks until either is modified. The file's permissions and timestamps
+    are copied too.
+
+    :raises OSError: When the filesystem doesn't support reflinks (or the copy
+        fails for any other reason). Nothing is left at dst in that case.
+    """
+
+    with open(src, 'rb') as src_file, open(dst, 'xb') as dst_file:
+        try:
+            fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+        except OSError:
+            os.unlink(dst)
+            raise
+
+    shutil.copystat(src, dst)
+
+
 def path_is_external(path: Path):
     """Returns True if a path contains enough back 'up-references' to escape
     the base directory."""
@@ -360,9 +510,10 @@ def repair_symlinks(base: Path) -> None:
 
     base = base.resolve()
 
-    for file in flat_walk(base):
+    for entry in walk_tree(base):
 
-        if file.is_symlink():
+        if entry.is_link:
+            file = Path(entry.path)
             # Found a second thing that pathlib doesn't do (though a requst
             # for Path.readlink has already been merged in the Python develop
             # branch)
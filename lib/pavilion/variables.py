@@ -23,9 +23,10 @@ provided (sched).
 
 import collections
 import copy
+import itertools
 import json
 import time
-from typing import Union, List, Tuple
+from typing import Union, List, Tuple, Iterator
 
 import lark
 from pavilion import parsers
@@ -100,50 +101,58 @@ Usage: ::
 
     def get_permutations(self, used_per_vars: List[Tuple[str, str]]) \
             -> List["VariableSetManager"]:
+        """As per iter_permutations(), but return a list of all the permutations."""
+
+        return list(self.iter_permutations(used_per_vars))
+
+    def iter_permutations(self, used_per_vars: List[Tuple[str, str]]) \
+            -> Iterator["VariableSetManager"]:
         """
     For every combination of permutation variables (that were used),
-    return a new var_set manager that contains only a single value
+    yield a new var_set manager that contains only a single value
     (possibly a complex one) for each permutation var, in every possible
     permutation.
 
+    Permutations are only created as they're requested. Each is a copy-on-write
+    copy of this variable manager (see copy()), so the variables that aren't
+    permuted over aren't duplicated for every permutation.
+
     :param list[(str, str)] used_per_vars: A set of permutation variable names that
         were used, as a tuple of (var_set, var_name).
-    :return: A list of permuted variable managers.
+    :return: An iterator of permuted variable managers.
     """
 
-        # Get every a dictionary of var:idx for every combination of used
-        # permutation variables.
-        permutations = [{}]
-        for var_set, var in used_per_vars:
-            new_perms = []
+        used_per_vars = list(used_per_vars)
+        lengths = [self.len(var_set, var) for var_set, var in used_per_vars]
 
-            for old_perm in permutations:
-                for i in range(self.len(var_set, var)):
-                    new_perm = old_perm.copy()
-                    new_perm[(var_set, var)] = i
-                    new_perms.append(new_perm)
+        if all(length == 1 for length in lengths):
+            yield self
+            return
 
-            permutations = new_perms
+        # Every combination of value indexes for the used permutation variables.
+        for indexes in itertools.product(*[range(length) for length in lengths]):
+            var_man = self.copy()
 
-        permuted_var_mans = []
+            for (var_set, var), idx in zip(used_per_vars, indexes):
+                vlist = VariableList()
+                vlist.data = [copy.deepcopy(self.variable_sets[var_set][var][idx])]
 
-        if len(permutations) == 1:
-            return [self]
+                var_man.variable_sets[var_set].data[var] = vlist
 
-        # Create a new var set manager for each permutation.
-        for perm in permutations:
-            var_man = copy.deepcopy(self)
+            yield var_man
 
-            for (var_set, var), idx in perm.items():
-                new_list = [self.variable_sets[var_set][var][idx]]
-                vlist = VariableList()
-                vlist.data = copy.deepcopy(new_list)
+    def copy(self) -> "VariableSetManager":
+        """Return a copy-on-write copy of this variable set manager. The variable
+        lists are shared with the copy until either changes them."""
 
-                var_man.variable_sets[var_set].data[var] = vlist
+        var_man = VariableSetManager()
 
-            permuted_var_mans.append(var_man)
+        var_man.variable_sets = {name: var_set.copy()
+                                 for name, var_set in self.variable_sets.items()}
+        var_man.deferred = set(self.deferred)
+        var_man.resolved_user_vars = list(self.resolved_user_vars)
 
-        return permuted_var_mans
+        return var_man
 
     @classmethod
     def parse_key(cls, key):
@@ -306,9 +315,6 @@ index, sub_var) tuple.
         # We only want to resolve variable references in the variable section
         var_vars = self.variable_sets['var']
         unresolved_vars = {}
-        parser = parsers.strings.get_string_parser()
-        var_visitor = parsers.strings.StringVarRefVisitor()
-        transformer = parsers.StringTransformer(self)
         # A list of just the var name for those that we fully resolved.
         fully_resolved_vars = []
 
@@ -331,12 +337,11 @@ index, sub_var) tuple.
                         continue
 
                     try:
-                        tree = parser.parse(val)
-                        tree_vars = var_visitor.visit(tree)
+                        template = parsers.compile_text(val)
                     except (lark.LarkError, lark.LexError) as err:
                         raise VariableError(var=var, index=idx, sub_var=key, prior_error=err)
 
-                    unresolved_vars[('var', var, idx, key)] = (tree, tree_vars)
+                    unresolved_vars[('var', var, idx, key)] = (template, template.variables)
                     fully_resolved = False
 
             if fully_resolved:
@@ -355,7 +360,7 @@ index, sub_var) tuple.
         # tree until there are no unresolved variables left.
         while unresolved_vars:
             did_resolve = False
-            for uvar, (tree, variables) in unresolved_vars.copy().items():
+            for uvar, (template, variables) in unresolved_vars.copy().items():
                 resolvable_now = True
                 only_skipped_refs = True
                 for var_str in variables:
@@ -407,7 +412,7 @@ index, sub_var) tuple.
                     partially_resolved.add(var_name)
 
                     try:
-                        res_val = transformer.transform(tree)
+                        res_val = template.resolve(self)
                     except DeferredError:
                         res_val = None
                     except (StringParserError, ParserValueError) as err:
@@ -825,7 +830,25 @@ name."""
     def set_value(self, var, index, sub_var, value):
         """Set the value at the given location to value."""
 
-        self[var].set_value(index, sub_var, value)
+        var_list = self[var]
+        if var_list.shared:
+            # Get our own copy before changing anything.
+            var_list = self.data[var] = copy.deepcopy(var_list)
+
+        var_list.set_value(index, sub_var, value)
+
+    def copy(self) -> "VariableSet":
+        """Return a copy-on-write copy of this variable set. The variable lists are
+        shared until one of the sets changes a value, at which point that set gets
+        its own copy of the variable list."""
+
+        for var_list in self.data.values():
+            if isinstance(var_list, VariableList):
+                var_list.shared = True
+
+        variable_set = VariableSet(name=self.name)
+        variable_set.data = self.data.copy()
+        return variable_set
 
     def __contains__(self, item):
         return item in self.data
@@ -860,6 +883,8 @@ end up as a list (of one)."""
 """
 
         self.data = []
+        # Whether this list is shared by copy-on-write variable sets.
+        self.shared = False
 
         if values is not None:
             self._init_from_config(values)
@@ -3,6 +3,7 @@ import io
 import pathlib
 import shutil
 import stat
+import tarfile
 import threading
 import time
 import unittest
@@ -48,6 +49,43 @@ class BuilderTests(PavTestCase):
         self.assertEqual(len(reused), num_tests - 1)
         self.assertIn(STATES.BUILD_SUCCESS, states)
 
+    def test_shared_build_hashes(self):
+        """Builders with the same build inputs should only hash their build once."""
+
+        test_cfg = self._quick_test_cfg()
+        test_cfg['build']['cmds'] = ['echo shared']
+        other_cfg = self._quick_test_cfg()
+        other_cfg['build']['cmds'] = ['echo not shared']
+
+        tests = [self._quick_test(test_cfg, build=False, finalize=False) for _ in range(3)]
+        other = self._quick_test(other_cfg, build=False, finalize=False)
+
+        build_hashes = builder.BuildHashCache()
+        calls = []
+
+        def create(value):
+            calls.append(value)
+            time.sleep(0.1)
+            return value
+
+        keys = [test._make_builder(build_hashes)._build_key() for test in tests]
+        self.assertEqual(len(set(keys)), 1)
+        self.assertNotEqual(other._make_builder(build_hashes)._build_key(), keys[0])
+
+        threads = [threading.Thread(target=build_hashes.get, args=(keys[0], lambda: create('a')))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(calls, ['a'])
+        self.assertEqual(build_hashes.get(keys[0], lambda: create('b')), 'a')
+
+        # Sharing the hash shouldn't change it.
+        for test in tests + [other]:
+            shared = test._make_builder(builder.BuildHashCache())
+            self.assertEqual(shared.build_hash, test.builder.build_hash)
+
     def test_setup_build_dir(self):
         """Make sure we can correctly handle all of the various archive
         formats."""
@@ -200,6 +238,28 @@ class BuilderTests(PavTestCase):
             test = self._quick_test(config, build=False, finalize=False)
             self.assertFalse(test.build())
 
+    def test_cached_extract_edits(self):
+        """Builds that edit their extracted source files in place shouldn't affect
+        other builds from the same archive."""
+
+        config = self._quick_test_cfg()
+        config['build']['source_path'] = 'file_tests.tgz'
+        config['build']['cmds'] = ['echo changed >> real.txt']
+        edit_test = self._quick_test(config)
+        edited = (edit_test.path/'build'/'real.txt').read_text()
+
+        config = self._quick_test_cfg()
+        config['build']['source_path'] = 'file_tests.tgz'
+        config['build']['cmds'] = ['true']
+        test = self._quick_test(config)
+        self.assertNotEqual(edit_test.builder.name, test.builder.name)
+
+        with tarfile.open(str(self.TEST_DATA_ROOT/'pav_config_dir'/'test_src'/
+                              'file_tests.tgz')) as tar:
+            original = tar.extractfile('file_tests/real.txt').read().decode()
+        self.assertEqual(edited, original + 'changed\n')
+        self.assertEqual((test.path/'build'/'real.txt').read_text(), original)
+
     def test_copy_build(self):
         """Check that builds are copied correctly."""
 
@@ -253,6 +313,48 @@ class BuilderTests(PavTestCase):
             self.assertTrue(sym.is_symlink(),
                             msg="{} is not a symlink".format(sym))
 
+    def test_copy_modes(self):
+        """Check the alternate build copy modes."""
+
+        config = self._quick_test_cfg()
+        config['build']['source_path'] = 'file_tests.tgz'
+        config['build']['copy_files'] = ['rec/rec2/real*']
+        config['build']['copy_mode'] = 'symlink_dirs'
+
+        test = self._quick_test(config)
+        build = test.path/'build'
+
+        for sym in 'wild', 'sym.txt', 'rec/sym_r1.txt', 'rec/rec2/sym_r2.txt':
+            self.assertTrue((build/sym).is_symlink(), msg=sym)
+        for real_dir in 'rec', 'rec/rec2':
+            self.assertFalse((build/real_dir).is_symlink(), msg=real_dir)
+            self.assertTrue((build/real_dir).is_dir(), msg=real_dir)
+        self.assertFalse((build/'rec/rec2/real_r2.txt').is_symlink())
+        self.assertEqual(sorted(path.name for path in (build/'wild').iterdir()),
+                         ['real_wild1.dat', 'real_wild2.dat', 'sym.dat'])
+        notes = [status.note for status in test.status.history()
+                 if status.state == STATES.BUILD_COPIED]
+        self.assertIn('symlink_dirs copy', notes[0])
+
+        config['build']['copy_mode'] = 'hardlink'
+        test = self._quick_test(config)
+        build = test.path/'build'
+        orig = test.build_origin_path.resolve()
+
+        self.assertFalse((build/'wild/sym.dat').is_symlink())
+        self.assertTrue((build/'wild/sym.dat').samefile(orig/'wild/sym.dat'))
+        # Files to copy are still copied.
+        self.assertFalse((build/'rec/rec2/real_r2.txt').samefile(
+            orig/'rec/rec2/real_r2.txt'))
+
+        # Reflinks may not be supported here, but either way the build should
+        # get copied.
+        config['build']['copy_mode'] = 'reflink'
+        test = self._quick_test(config)
+        build = test.path/'build'
+        self.assertEqual((build/'wild/sym.dat').read_text(),
+                         (test.build_origin_path/'wild/sym.dat').read_text())
+
     @unittest.skipIf(wget.missing_libs(),
                      "The wget module is missing required libs.")
     def test_src_urls(self):
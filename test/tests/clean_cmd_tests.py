@@ -2,6 +2,7 @@ import time
 
 from pavilion import arguments
 from pavilion import commands
+from pavilion import parsers
 from pavilion import plugins
 from pavilion.unittest import PavTestCase
 
@@ -38,6 +39,25 @@ class CancelCmdTests(PavTestCase):
 
         self.assertEqual(clean_cmd.run(self.pav_cfg, args), 0)
 
+    def test_clean_template_cache(self):
+        """Test that clean removes the on-disk template cache."""
+
+        cache_dir = self.pav_cfg.working_dir/parsers.TEMPLATE_CACHE_DIR
+        parsers.compile_text.cache_clear()
+        with parsers.template_cache_dir(cache_dir):
+            parsers.compile_text('clean {{cache}} test {}'.format(time.time()))
+        self.assertTrue(list(cache_dir.glob('*/*/*.pkl')))
+
+        args = arguments.get_parser().parse_args([
+            'clean'
+        ])
+
+        clean_cmd = commands.get_command(args.command_name)
+        clean_cmd.silence()
+
+        self.assertEqual(clean_cmd.run(self.pav_cfg, args), 0)
+        self.assertEqual(list(cache_dir.iterdir()), [])
+
     def test_clean_wait(self):
         """Test clean command after waiting for tests to finish."""
 
@@ -0,0 +1,128 @@
+"""Test the completion watcher."""
+
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from pavilion import completion_watcher
+from pavilion.completion_watcher import CompletionWatcher
+from pavilion.unittest import PavTestCase
+
+
+class DummyRun:
+    """Something with a path and a completion file, like a test run."""
+
+    COMPLETE_FN = 'DONE'
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.mkdir(parents=True)
+        self.checks = 0
+
+    @property
+    def complete(self):
+        self.checks += 1
+        return (self.path/self.COMPLETE_FN).exists()
+
+    def finish(self):
+        """Write the completion file the way test runs do."""
+        tmp_path = self.path/'DONE.tmp'
+        tmp_path.touch()
+        tmp_path.rename(self.path/self.COMPLETE_FN)
+
+
+class CompletionWatcherTests(PavTestCase):
+
+    def set_up(self):
+        self.watch_path = self.pav_cfg.working_dir/'watcher_test'
+        shutil.rmtree(self.watch_path, ignore_errors=True)
+
+    def tear_down(self):
+        shutil.rmtree(self.watch_path, ignore_errors=True)
+
+    def test_watcher(self):
+        """Check that completions are noticed, with and without inotify."""
+
+        for use_inotify in True, False:
+            shutil.rmtree(self.watch_path, ignore_errors=True)
+            runs = [DummyRun(self.watch_path/str(i)) for i in range(5)]
+            runs[0].finish()
+
+            with CompletionWatcher(runs, use_inotify=use_inotify) as watcher:
+                self.assertEqual(watcher.wait(0), [runs[0]])
+                self.assertEqual(len(watcher), 4)
+                self.assertEqual(watcher.wait(0.3), [])
+
+                # Let the polling back off, then finish one from another thread.
+                time.sleep(1)
+                timer = threading.Timer(0.2, runs[3].finish)
+                timer.start()
+                start = time.time()
+                self.assertEqual(watcher.wait(10), [runs[3]])
+                timer.join()
+                if use_inotify and watcher.uses_inotify:
+                    # Inotify should notice right away, rather than at the next poll.
+                    self.assertLess(time.time() - start, 1)
+                else:
+                    self.assertLess(time.time() - start,
+                                    CompletionWatcher.MAX_INTERVAL + 1)
+
+                # Removed items aren't watched.
+                watcher.remove(runs[4])
+                runs[4].finish()
+                checks = runs[4].checks
+                runs[1].finish()
+                self.assertEqual(watcher.wait(10), [runs[1]])
+                self.assertEqual(runs[4].checks, checks)
+                self.assertEqual(len(watcher), 1)
+
+    def test_inotify_filtering(self):
+        """Only the creation of the completion file should trigger a check of an
+        item between full checks."""
+
+        run = DummyRun(self.watch_path/'1')
+        watcher = CompletionWatcher([run])
+        if not watcher.uses_inotify:
+            self.skipTest("Inotify isn't available.")
+
+        self.assertEqual(watcher.wait(0), [])
+        checks = run.checks
+        (run.path/'other_file').touch()
+        self.assertEqual(watcher.wait(0), [])
+        self.assertEqual(run.checks, checks)
+        watcher.close()
+
+    def test_scan(self):
+        """Full checks should only ask items with a completion file whether they're
+        complete, and items whose directory vanishes should be dropped."""
+
+        runs = [DummyRun(self.watch_path/str(i)) for i in range(3)]
+        with CompletionWatcher(runs, use_inotify=False) as watcher:
+            self.assertEqual(watcher.wait(0), [])
+            self.assertEqual([run.checks for run in runs], [0, 0, 0])
+
+            runs[1].finish()
+            self.assertEqual(watcher.wait(10), [runs[1]])
+            self.assertEqual(runs[1].checks, 1)
+
+            for run in runs[0], runs[2]:
+                shutil.rmtree(str(run.path))
+            # This would wait forever if vanished items were still watched.
+            self.assertEqual(watcher.wait(), [])
+            self.assertEqual(len(watcher), 0)
+            self.assertEqual(watcher.vanished, [runs[0], runs[2]])
+
+    def test_fs_type(self):
+        """Check filesystem type lookups."""
+
+        mounts = [('/a/b', 'nfs'), ('/a', 'ext4'), ('/', 'xfs')]
+        self.assertEqual(completion_watcher.fs_type('/a/b/c', mounts), 'nfs')
+        self.assertEqual(completion_watcher.fs_type('/a/bc', mounts), 'ext4')
+        self.assertEqual(completion_watcher.fs_type('/c', mounts), 'xfs')
+        self.assertIsNotNone(completion_watcher.fs_type(self.pav_cfg.working_dir))
+
+        for fstype in 'nfs4', 'lustre', 'fuse.sshfs', 'unknownfs', None:
+            self.assertFalse(completion_watcher.is_local_fs(fstype))
+        for fstype in 'ext4', 'xfs', 'tmpfs':
+            self.assertTrue(completion_watcher.is_local_fs(fstype))
@@ -1,8 +1,12 @@
 """Test directory database operations."""
 
+import copy
 import io
 import json
+import os
 import shutil
+import sqlite3
+import time
 from pathlib import Path
 
 from pavilion import dir_db
@@ -15,6 +19,14 @@ def entry_transform(path: Path):
         return json.load(file)
 
 
+def column_transform(path: Path):
+    """Like entry_transform, but with some indexed columns."""
+    return entry_transform(path)
+
+
+column_transform.index_columns = ('a', 'b', 'd')
+
+
 class DirDBTests(unittest.PavTestCase):
 
     def test_index(self):
@@ -85,6 +97,235 @@ class DirDBTests(unittest.PavTestCase):
 
         shutil.rmtree(index_path.as_posix())
 
+    def test_index_backends(self):
+        """Check that select gives the same results with each index backend, and that
+        filtering and ordering pushed to the index work."""
+
+        index_path = self.pav_cfg.working_dir/'test_index'  # type: Path
+        shutil.rmtree(index_path, ignore_errors=True)
+        index_path.mkdir()
+
+        for i in range(30):
+            self._make_entry(index_path, i, complete=bool(i % 5), d=i % 3)
+
+        def filter_func(data):
+            return data['d'] == 1 and data['a'] > 10
+
+        filter_func.index_filters = [
+            dir_db.IndexFilter('d', '=', 1),
+            dir_db.IndexFilter('a', '>', 10),
+            dir_db.IndexFilter('b', 'glob', 's_*'),
+            # Not an indexed column, so this should be ignored.
+            dir_db.IndexFilter('3', '=', 'bad_value'),
+        ]
+
+        def order_func(data):
+            return data['a']
+
+        order_func.index_key = 'a'
+
+        results = {}
+        for backend in dir_db.INDEX_BACKENDS:
+            pav_cfg = copy.copy(self.pav_cfg)
+            pav_cfg['index_backend'] = backend
+
+            for limit in None, 3:
+                results[backend, limit] = dir_db.select(
+                    pav_cfg, index_path, filter_func=filter_func,
+                    transform=column_transform, order_func=order_func,
+                    order_asc=False, limit=limit)
+
+        self.assertTrue((index_path/dir_db.INDEX_DIR/'column_transform.db').exists())
+        self.assertTrue((index_path/dir_db.INDEX_DIR/'column_transform.pkl').exists())
+
+        # The database should use the rollback journal, not WAL.
+        conn = sqlite3.connect(str(index_path/dir_db.INDEX_DIR/'column_transform.db'))
+        try:
+            self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'delete')
+        finally:
+            conn.close()
+
+        expected = [i for i in range(29, 5, -1) if i % 3 == 1]
+        for limit in None, 3:
+            for backend in dir_db.INDEX_BACKENDS:
+                self.assertEqual([data['id'] for data in results[backend, limit].data],
+                                 expected[:limit])
+                self.assertEqual(dir_db.paths_to_ids(results[backend, limit].paths),
+                                 expected[:limit])
+
+        # Removed and changed (incomplete) entries should be picked up.
+        shutil.rmtree((index_path/'22').as_posix())
+        self._make_entry(index_path, 15, complete=False, d=1)
+        expected.remove(22)
+        expected = sorted(expected + [15], reverse=True)
+        for backend in dir_db.INDEX_BACKENDS:
+            pav_cfg = copy.copy(self.pav_cfg)
+            pav_cfg['index_backend'] = backend
+            found = dir_db.select(pav_cfg, index_path, filter_func=filter_func,
+                                  transform=column_transform, order_func=order_func,
+                                  order_asc=False)
+            self.assertEqual([data['id'] for data in found.data], expected)
+
+        shutil.rmtree(index_path.as_posix())
+
+    def test_index_refresh(self):
+        """Check that refreshes skip work when nothing has changed."""
+
+        index_path = self.pav_cfg.working_dir/'test_index'  # type: Path
+
+        for backend in dir_db.INDEX_BACKENDS:
+            shutil.rmtree(index_path, ignore_errors=True)
+            index_path.mkdir()
+
+            pav_cfg = copy.copy(self.pav_cfg)
+            pav_cfg['index_backend'] = backend
+
+            entries = {}
+            for i in range(10):
+                entries[i] = self._make_entry(index_path, i, complete=bool(i % 5))
+            self._age(index_path, *range(10))
+
+            def get_index(refresh_period):
+                return dir_db.index(pav_cfg, id_dir=index_path, idx_name='test',
+                                    transform=entry_transform,
+                                    refresh_period=refresh_period)
+
+            # An index left in the id_dir by older versions of Pavilion.
+            old_idx = index_path/'test.pkl'
+            old_idx.write_bytes(b'')
+            self._age(index_path)
+
+            self.assertEqual(get_index(0), entries)
+            if backend == 'sqlite':
+                self.assertFalse(old_idx.exists())
+
+            # Nothing changed, so the index shouldn't be rewritten.
+            idx_file = index_path/dir_db.INDEX_DIR/('test.pkl' if backend == 'pickle'
+                                                    else 'test.db')
+            # The refresh time is still recorded, so the refresh period is honored.
+            stamp_file = (idx_file if backend == 'pickle'
+                          else idx_file.with_suffix(dir_db.SQLiteIndex.STAMP_SUFFIX))
+            os.utime(stamp_file.as_posix(), (1, 1))
+            idx_stat = idx_file.stat()
+            self.assertEqual(get_index(0), entries)
+            self.assertEqual(idx_file.stat().st_ino, idx_stat.st_ino)
+            if backend == 'sqlite':
+                self.assertEqual(idx_file.stat().st_mtime_ns, idx_stat.st_mtime_ns)
+            self.assertGreater(stamp_file.stat().st_mtime, 1)
+
+            # Changes to existing incomplete entries wait for the refresh period.
+            new_entry = self._make_entry(index_path, 5, complete=False, d=1)
+            self._age(index_path, 5)
+            self.assertEqual(get_index(1000), entries)
+            entries[5] = new_entry
+            self.assertEqual(get_index(0), entries)
+
+            # New and removed entries are always noticed.
+            entries[12] = self._make_entry(index_path, 12)
+            shutil.rmtree((index_path/'3').as_posix())
+            del entries[3]
+            self.assertEqual(get_index(1000), entries)
+
+        shutil.rmtree(index_path.as_posix())
+
+    def test_reserve_ids(self):
+        """Check reserving blocks of ids."""
+
+        id_dir = self.pav_cfg.working_dir/'test_reserve'  # type: Path
+        shutil.rmtree(id_dir, ignore_errors=True)
+        id_dir.mkdir()
+
+        reserved = dir_db.reserve_ids(id_dir, 5)
+        self.assertEqual([id_ for id_, _ in reserved], [1, 2, 3, 4, 5])
+        self.assertTrue(all(path.is_dir() for _, path in reserved))
+        self.assertEqual(dir_db.create_id_dir(id_dir)[0], 6)
+
+        # Ids in the way are skipped, even without a valid next_id file.
+        for id_ in range(7, 40):
+            (id_dir/str(id_)).mkdir()
+        (id_dir/dir_db.PKEY_FN).write_text('bad')
+        reserved = dir_db.reserve_ids(id_dir, 3)
+        self.assertEqual([id_ for id_, _ in reserved], [40, 41, 42])
+
+        # Only unused (empty) directories are released.
+        (reserved[0][1]/'data').write_text('used')
+        dir_db.release_ids(reserved)
+        self.assertEqual([path.exists() for _, path in reserved], [True, False, False])
+
+        # A stale next_id just means more probing.
+        (id_dir/dir_db.PKEY_FN).write_text('2')
+        self.assertEqual(dir_db.create_id_dir(id_dir)[0], 41)
+        self.assertEqual(dir_db.reserve_ids(id_dir, 0), [])
+
+        shutil.rmtree(id_dir.as_posix())
+
+    def test_sharded_layout(self):
+        """Check that id directories can be migrated to (and from) the sharded
+        layout, and that everything works the same once they are."""
+
+        id_dir = self.pav_cfg.working_dir/'test_sharded'  # type: Path
+        shutil.rmtree(id_dir, ignore_errors=True)
+        id_dir.mkdir()
+
+        entries = {}
+        for id_ in list(range(1, 20)) + [1234, 123456]:
+            entries[id_] = self._make_entry(id_dir, id_)
+        (id_dir/'not_an_id').mkdir()
+
+        def get_ids(**kwargs):
+            return sorted(dir_db.paths_to_ids(
+                dir_db.select(self.pav_cfg, id_dir, **kwargs).paths))
+
+        self.assertEqual(
+            dir_db.index(self.pav_cfg, id_dir, 'test', entry_transform), entries)
+
+        moved = dir_db.migrate_layout(id_dir)
+        self.assertEqual(len(moved), len(entries))
+        self.assertTrue(dir_db.is_sharded(id_dir))
+        self.assertEqual(dir_db.make_id_path(id_dir, 1234), id_dir/'00'/'12'/'1234')
+        self.assertEqual(dir_db.make_id_path(id_dir, 123456), id_dir/'12'/'34'/'123456')
+        self.assertEqual(moved[id_dir/'12'], id_dir/'00'/'00'/'12')
+        self.assertTrue((id_dir/'not_an_id').exists())
+        self.assertEqual(dir_db.id_base_path(dir_db.make_id_path(id_dir, 1234)), id_dir)
+        self.assertEqual(dir_db.id_base_path(id_dir/'1234'), id_dir)
+
+        # The existing index is still valid, and notices new (sharded) entries.
+        reserved = dir_db.reserve_ids(id_dir, 2)
+        self.assertEqual([id_ for id_, _ in reserved], [20, 21])
+        self.assertEqual(reserved[0][1], id_dir/'00'/'00'/'20')
+        for id_, _ in reserved:
+            entries[id_] = self._make_entry(id_dir/'00'/'00', id_)
+        self.assertEqual(
+            dir_db.index(self.pav_cfg, id_dir, 'test', entry_transform), entries)
+        self.assertEqual(get_ids(transform=entry_transform), sorted(entries))
+        self.assertEqual(get_ids(), sorted(entries))
+
+        count, _ = dir_db.delete(self.pav_cfg, id_dir, lambda data: data['id'] > 1000,
+                                 transform=entry_transform)
+        self.assertEqual(count, 2)
+        self.assertEqual(get_ids(), list(range(1, 22)))
+
+        # And back again.
+        moved = dir_db.migrate_layout(id_dir, sharded=False)
+        self.assertEqual(len(moved), 21)
+        self.assertFalse(dir_db.is_sharded(id_dir))
+        self.assertEqual(sorted(path.name for path in id_dir.iterdir()
+                                if not path.name.startswith('.')),
+                         sorted([str(i) for i in range(1, 22)] + ['not_an_id']))
+        self.assertEqual(get_ids(transform=entry_transform), list(range(1, 22)))
+
+        shutil.rmtree(id_dir.as_posix())
+
+    @staticmethod
+    def _age(index_path, *ids):
+        """Push back the mtime of the given entries (and the index dir) so the
+        changes aren't treated as racy."""
+
+        old = time.time() - 100
+        for id_ in ids:
+            os.utime(str(index_path/str(id_)), (old, old))
+        os.utime(str(index_path), (old, old))
+
     def _make_entry(self, index_path, id_, complete=True, d=0):
         value = {'a': id_ * 2,
                  'id': id_,
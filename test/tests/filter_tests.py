@@ -221,6 +221,50 @@ class FiltersTest(PavTestCase):
         self.assertFalse(t_filter2(test.attr_dict()))
         self.assertTrue(t_filter2(test2.attr_dict()))
 
+        # The index carries the state information, and notices status changes.
+        # Only look at our tests; other test modules may leave tests behind.
+        working_dir = self.pav_cfg.working_dir/'test_runs'
+        ours = (test.id, test2.id)
+
+        def select_ours(t_filt):
+            """Select our tests, letting the index pre-filter on state."""
+
+            def filter_func(attrs):
+                return attrs['id'] in ours and t_filt(attrs)
+            filter_func.index_filters = t_filt.index_filters
+
+            return dir_db.select(self.pav_cfg, working_dir, filter_func=filter_func,
+                                 transform=test_run_attr_transform,
+                                 idx_refresh_period=0).data
+
+        found = select_ours(t_filter)
+        self.assertEqual([attrs['id'] for attrs in found], [test2.id])
+        self.assertEqual(found[0]['state'], STATES.RUN_DONE)
+        self.assertIn(STATES.RUNNING, found[0]['states'])
+
+        test.status.set(STATES.RUN_DONE, "Pretend it ran.")
+        found = select_ours(t_filter)
+        self.assertEqual(sorted(attrs['id'] for attrs in found),
+                         sorted([test.id, test2.id]))
+        found = select_ours(t_filter2)
+        self.assertEqual([attrs['id'] for attrs in found], [test2.id])
+
+        # Status changes after completion should still be seen, through the index
+        # (which re-checks complete tests) and its filters.
+        test2.set_run_complete()
+        found = select_ours(t_filter)
+        self.assertIn(test2.id, [attrs['id'] for attrs in found])
+
+        time.sleep(0.01)
+        test2.status.set(STATES.COMPLETE, "Changed after completion.")
+        t_filter3 = filters.make_test_run_filter(state=STATES.COMPLETE)
+        for t_filt, expected in (t_filter, [test.id]), (t_filter3, [test2.id]):
+            found = select_ours(t_filt)
+            self.assertEqual([attrs['id'] for attrs in found], expected)
+        self.assertTrue(t_filter3(test_run_attr_transform(test2.path)))
+        self.assertIn(dir_db.IndexFilter('state', '=', STATES.COMPLETE),
+                      t_filter3.index_filters)
+
     def test_filter_series_states(self):
         """Check series filtering."""
 
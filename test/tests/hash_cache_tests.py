@@ -0,0 +1,113 @@
+"""Test the build source hash cache."""
+
+import hashlib
+import os
+import shutil
+import time
+
+from pavilion import hash_cache
+from pavilion.hash_cache import HashCache
+from pavilion.unittest import PavTestCase
+
+
+class HashCacheTests(PavTestCase):
+
+    def set_up(self):
+        self.hash_path = self.pav_cfg.working_dir/'hash_cache_test'
+        shutil.rmtree(self.hash_path, ignore_errors=True)
+        self.src_path = self.hash_path/'src'
+        self.cache_path = self.hash_path/'cache'
+
+        for i in range(3):
+            sub_dir = self.src_path/'dir{}'.format(i)
+            sub_dir.mkdir(parents=True)
+            for j in range(5):
+                (sub_dir/'file{}'.format(j)).write_text('contents {} {}'.format(i, j))
+
+    def tear_down(self):
+        shutil.rmtree(self.hash_path, ignore_errors=True)
+
+    def test_file_hash(self):
+        """File hashes should be cached (on disk) until the file changes."""
+
+        file_path = self.src_path/'dir0'/'file0'
+        cache = HashCache(self.cache_path)
+
+        self.assertEqual(cache.file_hash(file_path),
+                         hashlib.sha256(b'contents 0 0').digest())
+        # No more sidecar hash files.
+        self.assertEqual(len(list(file_path.parent.glob('.*.hash'))), 0)
+
+        # Nothing is written until the cache is flushed, and then only once.
+        cache.file_hash(self.src_path/'dir0'/'file1')
+        self.assertFalse(self.cache_path.exists())
+        cache.flush()
+        self.assertEqual(len(list(self.cache_path.iterdir())), 1)
+
+        # A new cache (like from another pav command) should use the saved hash.
+        fake_hash = b'not a real hash'
+        cache = HashCache(self.cache_path)
+        table = cache._load_table(cache._table_name(file_path.parent))
+        key, _ = table[str(file_path)]
+        table[str(file_path)] = (key, fake_hash)
+        self.assertEqual(cache.file_hash(file_path), fake_hash)
+
+        file_path.write_text('new contents')
+        self.assertEqual(cache.file_hash(file_path),
+                         hashlib.sha256(b'new contents').digest())
+
+    def test_dir_hash(self):
+        """Check both directory hashing modes."""
+
+        cache = HashCache(self.cache_path, threads=4)
+
+        latest = time.time() - 100
+        file_path = self.src_path/'dir2'/'file3'
+        os.utime(str(file_path), (latest, latest))
+        for path in self.src_path.rglob('*'):
+            if path != file_path:
+                os.utime(str(path), (latest - 50, latest - 50))
+        os.utime(str(self.src_path), (latest - 50, latest - 50))
+
+        self.assertEqual(cache.dir_hash(self.src_path),
+                         '{} {:0.5f}'.format(self.src_path, latest).encode())
+        # The source directory itself should be left alone.
+        self.assertEqual(self.src_path.stat().st_mtime, latest - 50)
+
+        content_hash = cache.dir_hash(self.src_path, mode=hash_cache.MODE_CONTENT)
+        cache.flush()
+        # The same contents elsewhere give the same hash.
+        copy_path = self.hash_path/'src_copy'
+        shutil.copytree(str(self.src_path), str(copy_path))
+        self.assertEqual(cache.dir_hash(copy_path, mode=hash_cache.MODE_CONTENT),
+                         content_hash)
+
+        # Editing a file deep in the tree (which doesn't touch the top directory)
+        # is noticed right away, in both modes.
+        top_mtime = self.src_path.stat().st_mtime_ns
+        file_path.write_text('changed')
+        self.assertEqual(self.src_path.stat().st_mtime_ns, top_mtime)
+        new_hash = cache.dir_hash(self.src_path, mode=hash_cache.MODE_CONTENT)
+        self.assertNotEqual(new_hash, content_hash)
+        self.assertEqual(cache.dir_hash(self.src_path), '{} {:0.5f}'.format(
+            self.src_path, file_path.stat().st_mtime).encode())
+
+        # Adding (or removing) files is noticed too.
+        (self.src_path/'new_file').write_text('new')
+        self.assertNotEqual(cache.dir_hash(self.src_path, mode=hash_cache.MODE_CONTENT),
+                            new_hash)
+        (self.src_path/'new_file').unlink()
+        self.assertEqual(cache.dir_hash(self.src_path, mode=hash_cache.MODE_CONTENT),
+                         new_hash)
+        cache.flush()
+
+        # A new cache uses the saved file hashes, which only cover what's still there.
+        cache = HashCache(self.cache_path)
+        table = cache._load_table(cache._table_name(self.src_path))
+        self.assertEqual(len(table), 15)
+        self.assertNotIn(str(self.src_path/'new_file'), table)
+        self.assertEqual(cache.dir_hash(self.src_path, mode=hash_cache.MODE_CONTENT),
+                         new_hash)
+
+        with self.assertRaises(ValueError):
+            cache.dir_hash(self.src_path, mode='bogus')
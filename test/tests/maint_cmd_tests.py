@@ -1,10 +1,15 @@
 import json
 import shutil
 import tempfile
+import time
+import zipfile
 from pathlib import Path
 
 from pavilion import arguments
 from pavilion import commands
+from pavilion import dir_db
+from pavilion.series.info import SeriesInfo
+from pavilion.test_run import TestRun
 from pavilion.unittest import PavTestCase
 
 
@@ -57,3 +62,159 @@ class MaintCmdTest(PavTestCase):
         self.assertEqual(err, '')
 
         self._cmp_files(tmp_path, self.pav_cfg.result_log)
+
+    def test_migrate_layout(self):
+        """Check migrating the test run directories to and from the sharded layout."""
+
+        working_dir = self.pav_cfg.working_dir
+        runs_dir = working_dir/'test_runs'
+        test = self._quick_test()
+
+        # Something to link to the test, like a series does.
+        series_id, series_path = dir_db.create_id_dir(working_dir/'series')
+        link = series_path/'test_sets'/'a_set'/str(test.id)
+        link.parent.mkdir(parents=True)
+        link.symlink_to(test.path)
+
+        maint_cmd = commands.get_command('maint')
+        maint_cmd.silence()
+        parser = arguments.get_parser()
+
+        try:
+            args = parser.parse_args(['maint', 'migrate_layout', '--series'])
+            self.assertEqual(maint_cmd.run(self.pav_cfg, args), 0)
+            _, err = maint_cmd.clear_output()
+            self.assertEqual(err, '')
+
+            self.assertTrue(dir_db.is_sharded(runs_dir))
+            sharded_path = dir_db.make_id_path(runs_dir, test.id)
+            self.assertNotEqual(sharded_path, test.path)
+            self.assertTrue(sharded_path.is_dir())
+            sharded_series = dir_db.make_id_path(working_dir/'series', series_id)
+            self.assertNotEqual(sharded_series, series_path)
+            sharded_link = sharded_series/link.relative_to(series_path)
+            self.assertEqual(sharded_link.resolve(), sharded_path.resolve())
+
+            loaded = TestRun.load(self.pav_cfg, working_dir, test.id)
+            self.assertEqual(loaded.path, sharded_path)
+            self.assertEqual(loaded.name, test.name)
+
+            new_test = self._quick_test()
+            self.assertEqual(dir_db.id_base_path(new_test.path), runs_dir)
+
+            # Series should still be found by id.
+            sinfo = SeriesInfo.load(self.pav_cfg, 's{}'.format(series_id))
+            self.assertEqual(sinfo.path, sharded_series)
+        finally:
+            args = parser.parse_args(['maint', 'migrate_layout', '--flat', '--series'])
+            self.assertEqual(maint_cmd.run(self.pav_cfg, args), 0)
+            maint_cmd.clear_output()
+
+        self.assertFalse(dir_db.is_sharded(runs_dir))
+        self.assertEqual(link.resolve(), (runs_dir/str(test.id)).resolve())
+        self.assertTrue((runs_dir/str(new_test.id)).is_dir())
+        self.assertEqual(SeriesInfo.load(self.pav_cfg, 's{}'.format(series_id)).path,
+                         series_path)
+
+        # The bare series would confuse other tests.
+        shutil.rmtree(series_path.as_posix())
+
+    def test_compact(self):
+        """Check compacting old test runs, and reading them afterwards."""
+
+        old_test = self._quick_test()
+        old_test.run()
+        old_test.save_results(old_test.gather_results(0))
+        old_test.set_run_complete()
+        old_test.created = time.time() - 60*60*24*60
+        old_test.save_attributes()
+
+        new_test = self._quick_test()
+        new_test.run()
+        new_test.set_run_complete()
+
+        run_log = old_test.run_log.read_text()
+        run_tmpl = old_test.run_tmpl_path.read_text()
+        results = old_test.results
+        before = TestRun.load(self.pav_cfg, old_test.working_dir, old_test.id)
+        history = [status.as_dict() for status in before.status.history()]
+
+        maint_cmd = commands.get_command('maint')
+        maint_cmd.silence()
+        parser = arguments.get_parser()
+        args = parser.parse_args(['maint', 'compact', '--older-than', '1 week'])
+        self.assertEqual(maint_cmd.run(self.pav_cfg, args), 0)
+        _, err = maint_cmd.clear_output()
+        self.assertEqual(err, '')
+
+        self.assertFalse((new_test.path/'run.zip').exists())
+        self.assertEqual(sorted(path.name for path in old_test.path.iterdir()),
+                         ['attributes', 'build_origin', 'run.zip'])
+
+        loaded = TestRun.load(self.pav_cfg, old_test.working_dir, old_test.id)
+        self.assertEqual(loaded.config, before.config)
+        self.assertEqual(loaded.var_man.as_dict(), before.var_man.as_dict())
+        self.assertEqual(loaded.results, results)
+        self.assertEqual([status.as_dict() for status in loaded.status.history()],
+                         history)
+        self.assertEqual(loaded.status.current().as_dict(), history[-1])
+        self.assertTrue(loaded.complete)
+        self.assertTrue(loaded.run_file('build').is_dir())
+
+        cat_cmd = commands.get_command('cat')
+        cat_cmd.silence()
+        args = parser.parse_args(['cat', old_test.full_id, 'run.tmpl'])
+        cat_cmd.run(self.pav_cfg, args)
+        out, _ = cat_cmd.clear_output()
+        self.assertEqual(out, run_tmpl + '\n')
+
+        log_cmd = commands.get_command('log')
+        log_cmd.silence()
+        args = parser.parse_args(['log', 'run', old_test.full_id])
+        self.assertEqual(log_cmd.run(self.pav_cfg, args), 0)
+        out, _ = log_cmd.clear_output()
+        self.assertEqual(out, run_log)
+
+        # Compacting again doesn't change anything.
+        args = parser.parse_args(['maint', 'compact', '--older-than', '1 week'])
+        self.assertEqual(maint_cmd.run(self.pav_cfg, args), 0)
+        out, _ = maint_cmd.clear_output()
+        self.assertIn('Compacted 0 test runs', out)
+
+    def test_compact_hardlinks(self):
+        """Hardlinked build files should be archived as links to the build origin,
+        not as full copies."""
+
+        cfg = self._quick_test_cfg()
+        cfg['build']['cmds'] = ['head -c 100000 /dev/urandom > data.bin',
+                                'echo "original" > copied.txt']
+        cfg['build']['copy_mode'] = 'hardlink'
+        cfg['build']['copy_files'] = ['copied.txt']
+        cfg['run']['cmds'] = ['echo "output" > run_out.txt']
+
+        test = self._quick_test(cfg)
+        test.run()
+        test.set_run_complete()
+        test.created = time.time() - 60*60*24*60
+        test.save_attributes()
+
+        origin = test.build_origin_path.resolve()
+        self.assertTrue((test.build_path/'data.bin').samefile(origin/'data.bin'))
+        data = (origin/'data.bin').read_bytes()
+
+        maint_cmd = commands.get_command('maint')
+        maint_cmd.silence()
+        args = arguments.get_parser().parse_args(
+            ['maint', 'compact', '--older-than', '1 week'])
+        self.assertEqual(maint_cmd.run(self.pav_cfg, args), 0)
+
+        archive = test.path/'run.zip'
+        self.assertLess(archive.stat().st_size, len(data))
+        with zipfile.ZipFile(str(archive)) as zfile:
+            self.assertEqual(zfile.read('build/data.bin').decode(),
+                             (origin/'data.bin').as_posix())
+
+        loaded = TestRun.load(self.pav_cfg, test.working_dir, test.id)
+        self.assertEqual(loaded.run_file('build/data.bin').read_bytes(), data)
+        self.assertEqual(loaded.run_file('build/copied.txt').read_text(), 'original\n')
+        self.assertEqual(loaded.run_file('build/run_out.txt').read_text(), 'output\n')
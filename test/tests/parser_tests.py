@@ -368,3 +368,61 @@ class ParserTests(unittest.PavTestCase):
                 self.fail(
                     "Failed to fail on '{}', parsed to: '{}'"
                     .format(string, result))
+
+    def test_template_cache(self):
+        """Check that compiled string templates are cached, both in memory and on
+        disk, and give the same results every time."""
+
+        cache_dir = self.pav_cfg.working_dir/'template_cache_test'
+        string = r'\{{ [~{{more_ints}}-\~~_] {{ int1 + 1 }}'
+        expected = '{{ 0-~_1-~ 2'
+
+        parsers.compile_text.cache_clear()
+        try:
+            parsers.set_template_cache_dir(cache_dir)
+
+            self.assertEqual(parsers.parse_text(string, self.var_man), expected)
+            self.assertIs(parsers.compile_text(string), parsers.compile_text(string))
+            # Resolving a template shouldn't change it.
+            self.assertEqual(parsers.parse_text(string, self.var_man), expected)
+
+            cache_files = list(cache_dir.glob('*/*/*.pkl'))
+            self.assertEqual(len(cache_files), 1)
+
+            # A fresh process would load the template from disk.
+            parsers.compile_text.cache_clear()
+            self.assertEqual(parsers.parse_text(string, self.var_man), expected)
+
+            # Broken cache files are ignored (and replaced).
+            parsers.compile_text.cache_clear()
+            cache_files[0].write_bytes(b'garbage')
+            self.assertEqual(parsers.parse_text(string, self.var_man), expected)
+            parsers.compile_text.cache_clear()
+            self.assertIsNotNone(parsers._load_template(string))
+
+            # Templates anyone else could have written are never loaded.
+            cache_files[0].chmod(0o620)
+            self.assertIsNone(parsers._load_template(string))
+            cache_files[0].chmod(0o600)
+
+            # Bad strings aren't cached.
+            with self.assertRaises(StringParserError):
+                parsers.parse_text('{{ 1 +}}', self.var_man)
+            self.assertEqual(len(list(cache_dir.glob('*/*/*.pkl'))), 1)
+
+            # Pruning removes old grammar versions, and then the oldest templates.
+            user_dir = cache_files[0].parent.parent
+            (user_dir/'old_version').mkdir()
+            parsers.compile_text('{{ int1 + 2 }}')
+            parsers.prune_template_cache(user_dir, cache_files[0].stat().st_size)
+            self.assertEqual([path.name for path in user_dir.iterdir()],
+                             [cache_files[0].parent.name])
+            self.assertEqual(len(list(cache_dir.glob('*/*/*.pkl'))), 1)
+        finally:
+            parsers.set_template_cache_dir(None)
+            parsers.compile_text.cache_clear()
+
+        # The cache is only used within the context.
+        with parsers.template_cache_dir(cache_dir):
+            self.assertIsNotNone(parsers._template_path(string))
+        self.assertIsNone(parsers._template_path(string))
@@ -392,6 +392,45 @@ class ResolverTests(PavTestCase):
 
             self.assertIn(comb_dict, combinations)
 
+    def test_resolver_pool(self):
+        """Check that the resolver keeps its worker pool, and chunks tests by config."""
+
+        ptests = self.resolver.load(['permute_on_ref.multi'])
+        pool = self.resolver._pool
+        self.assertIsNotNone(pool)
+        ptests2 = self.resolver.load(['permute_on_ref.multi'])
+        self.assertIs(self.resolver._pool, pool)
+        self.assertEqual(sorted(ptest.config['run']['cmds'][0] for ptest in ptests),
+                         sorted(ptest.config['run']['cmds'][0] for ptest in ptests2))
+
+        self.resolver.close()
+        self.assertIsNone(self.resolver._pool)
+
+        raw_test = {
+            'variables': {'foo': [str(i) for i in range(20)]},
+            'permute_on': ['foo'],
+            'subtitle': '{{foo}}',
+            'scheduler': 'raw',
+        }
+        unresolved = []
+        for name in 'a', 'b':
+            cfg = copy.deepcopy(raw_test)
+            cfg['name'] = name
+            rproto = resolver.RawProtoTest(resolver.TestRequest(name), cfg,
+                                           self.resolver._base_var_man)
+            unresolved.extend(rproto.resolve_permutations())
+
+        chunks = self.resolver._chunk_ptests(unresolved)
+        self.assertEqual(sum(len(chunk) for chunk in chunks), 40)
+        for chunk in chunks:
+            self.assertEqual(len({id(ptest.config) for ptest in chunk}), 1)
+
+        # Resolving the chunks still gives each permutation its own values.
+        resolved = self.resolver._resolve_escapes(unresolved)
+        self.assertEqual(self.resolver.errors, [])
+        self.assertEqual(sorted(int(ptest.config['subtitle']) for ptest in resolved),
+                         sorted(list(range(20))*2))
+
     def test_permute_on_ref(self):
         """A regression test to make sure we handle references in the complex part
         of a permuted variable correctly."""
@@ -951,8 +990,9 @@ class ResolverTests(PavTestCase):
         """Check that incremental loading is both incremental and loading."""
 
         # Incremental loading allows us to break up the resolution of tests
-        # so they get their scheduler information last minute. It's not perfect -
-        # permutations can span multiple load sets.
+        # so they get their scheduler information last minute. Permutations are
+        # generated lazily, so those that spill into the next batch get new sched info
+        # too.
         # The dummy scheduler counts the mumber of times we've reset it, and we add
         # that to the test name to check that the tests actually got new sched info.
         requests = []
@@ -967,16 +1007,17 @@ class ResolverTests(PavTestCase):
         # A bunch of separate requests for a permuted test that's smaller than batch size
         requests += ['incremental.permuted_odd']*6
         answers.append(['permuted_odd.4']*7)
-        answers.append(['permuted_odd.4']*2 + ['permuted_odd.5']*5)
+        answers.append(['permuted_odd.5']*7)
         # A permuted test too big for the batch size
         requests += ['incremental.permuted_big', 'incremental.permuted_odd']
-        answers.append(['permuted_odd.5'] + ['permuted_odd.6']*3 + ['permuted_big.6']*3)
-        answers.append(['permuted_big.6']*7)
-        # A multiplied test, plus testing the remainders.
+        answers.append(['permuted_odd.6']*4 + ['permuted_big.6']*3)
+        answers.append(['permuted_big.7']*7)
+        # A multiplied test, plus testing the remainders. Each permutation is resolved
+        # once for all of its repeats, so those can spill into the next batch.
         requests += ['5*incremental.permuted_odd']
         answers.append(['permuted_odd.8']*7)
-        answers.append(['permuted_odd.8']*2 + ['permuted_odd.9']*5)
-        answers.append(['permuted_odd.9'] + ['permuted_odd.10']*3)
+        answers.append(['permuted_odd.8'] + ['permuted_odd.9']*6)
+        answers.append(['permuted_odd.9']*4)
         answers.reverse()
 
         for tests in self.resolver.load_iter(requests, batch_size=7,
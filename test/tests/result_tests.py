@@ -19,7 +19,7 @@ from pavilion import resolver
 from pavilion import result
 from pavilion import test_run
 from pavilion import utils
-from pavilion.result import base
+from pavilion.result import base, parse
 from pavilion.errors import ResultError
 from pavilion.result_parsers import base_classes
 from pavilion.test_run import TestRun
@@ -28,6 +28,13 @@ from pavilion.unittest import PavTestCase
 LOGGER = logging.getLogger(__name__)
 
 
+def iter_only_file(text):
+    """A file-like object that can only be read forward."""
+
+    file = io.StringIO(text)
+    return type('ForwardFile', (), {'readline': file.readline})()
+
+
 class ResultParserTests(PavTestCase):
 
     def __init__(self, *args, **kwargs):
@@ -1070,6 +1077,110 @@ class ResultParserTests(PavTestCase):
         for key in expected:
             self.assertEqual(results[key], expected[key])
 
+    def test_single_pass_parsing(self):
+        """Make sure parsing many keys in a single pass gets the same results as
+        parsing each key separately."""
+
+        lines = []
+        for i in range(200):
+            lines.append('step {} time: {}.5 flops: {}'.format(i, i % 7, i * 3))
+            if i % 10 == 0:
+                lines.extend(['Table', 'a b c', '{} 2 3'.format(i), '', 'Sums'])
+            if i % 25 == 0:
+                lines.append('Sums: {}, {}, {}'.format(i, i + 1, i % 3))
+        text = '\n'.join(lines) + '\n'
+
+        configs = [
+            ('regex', 'time', {'regex': r'time: (\d+\.\d+)'}),
+            ('regex', 'times', {'regex': r'time: (\d+)', 'match_select': 'all'}),
+            ('regex', 'utimes', {'regex': r'time: (\d+)', 'match_select': 'uniq'}),
+            ('regex', 'last_flops', {'regex': r'flops: (\d+)', 'match_select': 'last'}),
+            ('regex', 'step_fl', {'regex': r'step (\d+) .* flops: (\d+)',
+                                  'match_select': '-3'}),
+            ('regex', 'whole', {'regex': r'^Sums.*', 'match_select': '2'}),
+            ('regex', 'backref', {'regex': r'(\d)\1', 'match_select': 'all'}),
+            ('regex', 'after_table', {'regex': r'(\d+) 2 3', 'match_select': 'all',
+                                      'preceded_by': ['^Table$', '']}),
+            ('regex', 'in_table', {'regex': r'^(\d+)', 'match_select': 'all',
+                                   'for_lines_matching': r'^\d+ 2',
+                                   'preceded_by': ['a b c']}),
+            ('regex', 'missing', {'regex': r'nope'}),
+            ('split', 'sums', {'sep': ',', 'match_select': 'all',
+                               'for_lines_matching': '^Sums:'}),
+            ('table', 'table', {'match_select': 'last', 'preceded_by': ['^Table$']}),
+        ]
+
+        key_sets = []
+        for parser_name, key, rconf in configs:
+            parser = base_classes.get_plugin(parser_name)
+            rconf = parser.set_parser_defaults(rconf, {})
+            key_sets.append(parse.KeySet(parser_name, key, rconf))
+
+        expected = {}
+        for key_set in key_sets:
+            parser = base_classes.get_plugin(key_set.parser_name)
+            res, _ = parse.parse_result(key_set.key, copy.deepcopy(key_set.config),
+                                        io.StringIO(text), parser)
+            expected[key_set.key] = res
+
+        key_parsers = [parse.KeyParser(copy.deepcopy(key_set)) for key_set in key_sets]
+        parse.parse_keys(io.StringIO(text), key_parsers)
+        found = {kparser.key: kparser.result() for kparser in key_parsers}
+
+        self.assertEqual(found, expected)
+        # Make sure this actually tests something.
+        self.assertEqual(found['utimes'], ['0', '1', '2', '3', '4', '5', '6'])
+        self.assertEqual(len(found['after_table']), 20)
+        self.assertIsNone(found['missing'])
+
+        # Regex keys alone shouldn't need to seek, and get the same results.
+        regex_parsers = [parse.KeyParser(copy.deepcopy(key_set)) for key_set in key_sets
+                         if key_set.parser_name == 'regex']
+        self.assertFalse(any(kparser.needs_seek for kparser in regex_parsers))
+        parse.parse_keys(iter_only_file(text), regex_parsers)
+        for kparser in regex_parsers:
+            self.assertEqual(kparser.result(), expected[kparser.key])
+
+    def test_mmap_parsing(self):
+        """Check that parsing memory mapped files gets the same results as in
+        memory parsing."""
+
+        path = self.pav_cfg.working_dir/'mmap_results.txt'
+        with path.open('w', newline='') as file:
+            for i in range(100):
+                file.write('Table\r\nx y\r\n{} {}\r\n\r\n'.format(i, i*2))
+                file.write('val: {} \u00e9\n'.format(i))
+
+        with parse.MappedFile(path) as mfile, path.open() as file:
+            for line in mfile:
+                self.assertEqual(line, file.readline())
+            self.assertEqual(mfile.readline(), '')
+            mfile.seek(7)
+            self.assertEqual(mfile.read(5), 'x y\n')
+            self.assertEqual(mfile.tell(), 12)
+
+        configs = [
+            ('table', 'table', {'match_select': 'all', 'preceded_by': ['^Table$']}),
+            ('regex', 'vals', {'regex': r'val: (\d+)', 'match_select': 'last'}),
+            ('split', 'split', {'match_select': '3', 'for_lines_matching': 'val'}),
+        ]
+        key_sets = []
+        for parser_name, key, rconf in configs:
+            parser = base_classes.get_plugin(parser_name)
+            rconf = parser.set_parser_defaults(rconf, {})
+            key_sets.append(parse.KeySet(parser_name, key, rconf))
+
+        results = {}
+        for threshold in 0, 1024**3:
+            presults, _ = parse.process_file(
+                (path, copy.deepcopy(key_sets), threshold))
+            results[threshold] = {pres.key: pres.value for pres in presults}
+
+        self.assertEqual(results[0], results[1024**3])
+        self.assertEqual(len(results[0]['table']), 100)
+        self.assertEqual(results[0]['table'][5], {'5': {'y': '10'}})
+        self.assertEqual(results[0]['split'], ['val:', '3', '\u00e9'])
+
     def test_flatten_results(self):
         """Make sure result flattening works as expected, as well as regular
         result output while we're at it."""
@@ -5,6 +5,7 @@ import shutil
 from pavilion import arguments
 from pavilion import commands
 from pavilion import plugins
+from pavilion.series.test_set import TestSet
 from pavilion.status_file import STATES
 from pavilion.unittest import PavTestCase
 
@@ -136,6 +137,31 @@ class RunCmdTests(PavTestCase):
                              msg='Test {} status: {}'
                              .format(test.id, test.status.current()))
 
+    def test_node_builds(self):
+        """On node builds should run in parallel from the _run command, and tests
+        should still run (or fail) as their builds finish."""
+
+        test_set = TestSet(self.pav_cfg, 'node_builds',
+                           ['build_parallel.nodes1', 'build_parallel.nodes1',
+                            'build_parallel.nodes2', 'build_parallel_fail.nodes1'])
+        tests = test_set.make()
+        self.assertEqual(len(set(test.builder.name for test in tests)), 3)
+
+        run_cmd = commands.get_command('_run')
+        run_cmd.silence()
+        arg_parser = arguments.get_parser()
+        args = arg_parser.parse_args(['_run'] + [test.full_id for test in tests])
+        self.assertEqual(run_cmd.run(self.pav_cfg, args), 0)
+
+        for test in tests:
+            self.assertTrue(test.complete)
+            if test.name == 'build_parallel_fail.nodes1':
+                self.assertEqual(test.status.current().state, STATES.BUILD_FAILED)
+            else:
+                self.assertEqual(test.results['result'], 'PASS',
+                                 msg='Test {} status: {}'
+                                 .format(test.id, test.status.current()))
+
     def test_run_status(self):
         """Tests run command with status flag."""
 
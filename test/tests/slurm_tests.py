@@ -201,6 +201,57 @@ class SlurmTests(PavTestCase):
         self.assertEqual(sched_status.state, STATES.SCHED_STARTUP)
         self.assertIn('COMPLETED', sched_status.note)
 
+    def test_bulk_job_status(self):
+        """Check that job statuses are gathered with a single squeue/sacct query."""
+
+        queries = []
+
+        class FakeSlurm(Slurm):
+            """Slurm with canned squeue/sacct output."""
+
+            @staticmethod
+            def _status_query(cmd, timeout=10):
+                queries.append(cmd[0])
+                if cmd[0] == 'squeue':
+                    return ('101|PENDING|Priority\n'
+                            '102|RUNNING|None\n'
+                            'slurm_load_jobs error: Invalid job id specified\n')
+                else:
+                    return '103|CANCELLED by 1234\n'
+
+        slurm = FakeSlurm()
+        sys_name = sys_vars.get_vars(True)['sys_name']
+
+        tests = []
+        for job_id in '101', '102', '103', '104':
+            test = self._quick_test(name='bulk_status', finalize=False)
+            test.status.set(STATES.SCHEDULED, "not really though.")
+            job = jobs.Job.new(self.pav_cfg, [test])
+            job.info = {'id': job_id, 'sys_name': sys_name}
+            test.job = job
+            tests.append(test)
+
+        slurm.prefetch_job_statuses(self.pav_cfg, tests)
+        self.assertEqual(queries, ['squeue', 'sacct'])
+
+        # Cached statuses should be used without any further queries.
+        slurm.prefetch_job_statuses(self.pav_cfg, tests[:3])
+        self.assertEqual(slurm.job_status(self.pav_cfg, tests[0]).state,
+                         STATES.SCHEDULED)
+        self.assertIn('Priority', slurm.job_status(self.pav_cfg, tests[0]).note)
+        self.assertEqual(slurm.job_status(self.pav_cfg, tests[1]).state,
+                         STATES.SCHED_STARTUP)
+        self.assertEqual(slurm.job_status(self.pav_cfg, tests[2]).state,
+                         STATES.SCHED_CANCELLED)
+        self.assertEqual(tests[2].status.current().state, STATES.SCHED_CANCELLED)
+        self.assertEqual(queries, ['squeue', 'sacct'])
+
+        # Job 104 wasn't found, so it will be retried once the cache times out.
+        self.assertNotIn(tests[3].job.name, slurm._job_statuses)
+        time.sleep(slurm.JOB_STATUS_TIMEOUT)
+        slurm.prefetch_job_statuses(self.pav_cfg, tests)
+        self.assertEqual(queries, ['squeue', 'sacct'] * 2)
+
     @unittest.skipIf(not has_slurm(), "Only runs on a system with slurm.")
     def test_sched_vars(self):
         """Make sure the scheduler vars are reasonable when not on a node."""
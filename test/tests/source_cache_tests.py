@@ -0,0 +1,124 @@
+"""Test the extracted source cache."""
+
+import os
+import shutil
+import tarfile
+import time
+
+from pavilion import extract
+from pavilion import source_cache
+from pavilion.source_cache import SourceCache
+from pavilion.unittest import PavTestCase
+
+
+class SourceCacheTests(PavTestCase):
+
+    def set_up(self):
+        self.cache_test_path = self.pav_cfg.working_dir/'source_cache_test'
+        shutil.rmtree(self.cache_test_path, ignore_errors=True)
+        self.cache_test_path.mkdir()
+
+        self.archives = []
+        for i in range(3):
+            src = self.cache_test_path/'src{}'.format(i)/'src'
+            (src/'sub').mkdir(parents=True)
+            (src/'file').write_text('file {}'.format(i))
+            (src/'sub'/'data').write_text('x' * 1000)
+            (src/'link').symlink_to('file')
+
+            archive = self.cache_test_path/'src{}.tgz'.format(i)
+            with tarfile.open(str(archive), 'w:gz') as tar:
+                tar.add(str(src), arcname='src')
+            self.archives.append(archive)
+
+    def tear_down(self):
+        for path, _, _ in os.walk(str(self.cache_test_path)):
+            os.chmod(path, 0o775)
+        shutil.rmtree(self.cache_test_path, ignore_errors=True)
+
+    def _extract(self, cache, i, dest, calls):
+        """Extract the i'th archive through the cache, counting real extractions."""
+
+        def extract_func(path):
+            calls.append(path)
+            return extract.extract_tarball(self.archives[i], path, 0o002)
+
+        return cache.extract(cache.key(str(i).encode(), 0o002), dest, 0o002, extract_func)
+
+    def test_source_cache(self):
+        """Archives should only be extracted once, and builds populated from
+        the cache."""
+
+        cache = SourceCache(self.cache_test_path/'cache', 10*1024**2)
+        calls = []
+
+        dest1 = self.cache_test_path/'build1'
+        dest2 = self.cache_test_path/'build2'
+        self.assertIsNone(self._extract(cache, 0, dest1, calls))
+        self.assertIsNone(self._extract(cache, 0, dest2, calls))
+        self.assertEqual(len(calls), 1)
+
+        for dest in dest1, dest2:
+            self.assertEqual((dest/'file').read_text(), 'file 0')
+            self.assertEqual((dest/'sub'/'data').read_text(), 'x' * 1000)
+            self.assertEqual(os.readlink(str(dest/'link')), 'file')
+
+        # The files are reflinked (or copied) from the cache, which is read only.
+        # Each build gets its own writable files.
+        cached = cache.cache_dir/cache.key(b'0', 0o002)/source_cache.TREE_DIR
+        self.assertFalse(os.stat(str(cached/'file')).st_mode & 0o222)
+        dest_stat = os.stat(str(dest2/'file'))
+        self.assertNotEqual(dest_stat.st_ino, os.stat(str(cached/'file')).st_ino)
+        self.assertTrue(dest_stat.st_mode & 0o200)
+
+        # Editing a build's files in place doesn't change the cache.
+        with (dest1/'file').open('a') as file:
+            file.write(' changed')
+        dest5 = self.cache_test_path/'build5'
+        self.assertIsNone(self._extract(cache, 0, dest5, calls))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual((dest5/'file').read_text(), 'file 0')
+        self.assertEqual((cached/'file').read_text(), 'file 0')
+
+        # Without a size limit, nothing is cached.
+        calls = []
+        no_cache = SourceCache(self.cache_test_path/'no_cache', 0)
+        self.assertIsNone(self._extract(no_cache, 0, self.cache_test_path/'build3', calls))
+        self.assertEqual(len(calls), 1)
+        self.assertFalse(no_cache.cache_dir.exists())
+
+        # Extraction errors are passed through.
+        self.assertIsNotNone(cache.extract(
+            'bad', self.cache_test_path/'build4', 0o002, lambda path: 'oops'))
+
+    def test_source_cache_evict(self):
+        """The least recently used entries should be evicted when the cache is
+        too big."""
+
+        orig_grace = source_cache.EVICT_GRACE
+        source_cache.EVICT_GRACE = 0
+        try:
+            # Each extracted archive is a bit over 1000 bytes.
+            cache = SourceCache(self.cache_test_path/'cache', 2500)
+            calls = []
+            self._extract(cache, 0, self.cache_test_path/'build0', calls)
+            time.sleep(0.05)
+            self._extract(cache, 1, self.cache_test_path/'build1', calls)
+            time.sleep(0.05)
+            # Using the first entry again makes the second the least recently used.
+            self._extract(cache, 0, self.cache_test_path/'build0b', calls)
+            time.sleep(0.05)
+            self._extract(cache, 2, self.cache_test_path/'build2', calls)
+            self.assertEqual(len(calls), 3)
+
+            entries = sorted(path.name for path in cache.cache_dir.iterdir()
+                             if path.is_dir())
+            self.assertEqual(entries, sorted([cache.key(b'0', 0o002),
+                                              cache.key(b'2', 0o002)]))
+
+            # Evicted entries are simply extracted again.
+            self._extract(cache, 1, self.cache_test_path/'build1b', calls)
+            self.assertEqual(len(calls), 4)
+            self.assertEqual((self.cache_test_path/'build1b'/'file').read_text(), 'file 1')
+        finally:
+            source_cache.EVICT_GRACE = orig_grace
@@ -8,6 +8,7 @@ from pavilion import schedulers
 from pavilion import status_file
 from pavilion.series.series import TestSeries
 from pavilion.test_config import file_format
+from pavilion.test_run import TestRun
 from pavilion.unittest import PavTestCase
 
 
@@ -232,6 +233,38 @@ class StatusCmdTests(PavTestCase):
 
         # TODO: Test that the above have actually been set.
 
+    def test_status_broken_config(self):
+        """A test whose config can't be loaded should get an error status rather
+        than break the status command."""
+
+        test = self._quick_test(build=False, finalize=False)
+        test.status.set(status_file.STATES.SCHEDULED, "faker")
+        for config_fn in 'config', test.CONFIG_JSON_FN:
+            config_path = test.path/config_fn
+            if config_path.exists():
+                config_path.unlink()
+
+        status_cmd = commands.get_command('status')
+        status_cmd.silence()
+        parser = argparse.ArgumentParser()
+        status_cmd._setup_arguments(parser)
+        args = parser.parse_args(['-j', 'test.{}'.format(test.id)])
+        self.assertEqual(status_cmd.run(self.pav_cfg, args), 0)
+
+        out, _ = status_cmd.clear_output()
+        self.assertIn('Error getting test status', out)
+
+    def test_prefetch_lazy(self):
+        """Prefetching job statuses shouldn't need to load test configs."""
+
+        test = self._quick_test(build=False, finalize=False)
+        self.assertEqual(test.sched_name, 'raw')
+
+        lazy_test = TestRun.load(self.pav_cfg, test.working_dir, test.id, lazy=True)
+        self.assertEqual(lazy_test.sched_name, 'raw')
+        schedulers.prefetch_job_statuses(self.pav_cfg, [lazy_test])
+        self.assertNotIn('config', lazy_test.__dict__)
+
     def test_status_summary(self):
         # Testing that status works with summary flag
         status_cmd = commands.get_command('status')
@@ -60,6 +60,59 @@ class StatusTests(PavTestCase):
             self.assertLessEqual(len(lines[-1]), TestStatusInfo.LINE_MAX)
 
         fn.unlink()
+        if status.index_path.exists():
+            status.index_path.unlink()
+
+    def test_status_index(self):
+        """The status index should stay in sync with the status file, even when
+        it's written to by something that doesn't know about the index."""
+
+        fn = Path(tempfile.mktemp())
+        status = TestStatusFile(fn)
+        status.set(STATES.CREATED, 'created')
+        # The index file is written with every status update.
+        self.assertEqual(status._read_index()[0], fn.stat().st_size)
+        for i in range(200):
+            status.set(STATES.RUNNING, 'running {}'.format(i))
+        self.assertEqual(status._read_index()[0], fn.stat().st_size)
+
+        # Readers write the index when it's missing.
+        status.index_path.unlink()
+        self.assertEqual(TestStatusFile(fn).current().note, 'running 199')
+        self.assertEqual(status._read_index()[0], fn.stat().st_size)
+
+        # Append like an older Pavilion version would, including a partial line.
+        with fn.open('ab') as status_file:
+            status_file.write(TestStatusInfo(STATES.RUN_DONE, 'done').status_line())
+            status_file.write(b'1234.5 RESULTS')
+
+        for stat_obj in status, TestStatusFile(fn):
+            self.assertTrue(stat_obj.has_state(STATES.RUN_DONE))
+            self.assertFalse(stat_obj.has_state(STATES.RESULTS))
+            self.assertEqual(stat_obj.current().state, STATES.RESULTS)
+            self.assertEqual(
+                stat_obj.state_counts(),
+                {STATES.STATUS_CREATED: 1, STATES.CREATED: 1, STATES.RUNNING: 200,
+                 STATES.RUN_DONE: 1})
+
+        with fn.open('ab') as status_file:
+            status_file.write(b' results\n')
+        status.set(STATES.RUNNING, 'running again')
+        current, states = TestStatusFile(fn).summary()
+        self.assertEqual(current.state, STATES.RUNNING)
+        self.assertEqual(current.note, 'running again')
+        self.assertIn(STATES.RESULTS, states)
+        self.assertEqual(status.state_counts()[STATES.RUNNING], 201)
+
+        # A replaced status file means the index has to be rebuilt.
+        with fn.open('wb') as status_file:
+            status_file.write(TestStatusInfo(STATES.CREATED, 'new').status_line())
+        self.assertEqual(TestStatusFile(fn).state_counts(), {STATES.CREATED: 1})
+        self.assertEqual(status.current().note, 'new')
+
+        fn.unlink()
+        if status.index_path.exists():
+            status.index_path.unlink()
 
     def test_atomicity(self):
         """Making sure the status file can be written to atomically."""
@@ -107,4 +160,9 @@ class StatusTests(PavTestCase):
             # the date.
             self.assertIsNot(entry.when, None)
 
+        # Whichever process wrote the index last, it should still be accurate.
+        self.assertEqual(status.state_counts(), {STATES.RUNNING: len(history)})
+
         fn.unlink()
+        if status.index_path.exists():
+            status.index_path.unlink()
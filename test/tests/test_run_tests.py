@@ -1,9 +1,13 @@
 """Test the 'TestRun' object'"""
 
 import io
+import os
 
 from pavilion.errors import TestRunError
-from pavilion.test_run import TestRun
+from pavilion.status_file import STATES
+from pavilion.test_run import TestRun, TestAttributes, test_run_attr_transform, \
+    mass_status_update
+from pavilion.test_run import utils as test_run_utils
 from pavilion.unittest import PavTestCase
 from pavilion.variables import VariableSetManager
 
@@ -63,6 +67,28 @@ class TestRunTests(PavTestCase):
                 orig_val, loaded_val,
                 msg="Mismatch for key {}.\n{}\n{}".format(key, orig_val, loaded_val))
 
+        # Lazily loaded tests only load things when they're used, but should otherwise
+        # be the same.
+        lazy = TestRun.load(self.pav_cfg, orig.working_dir, orig.id, lazy=True)
+        for key in TestRun.LAZY_ATTRS:
+            self.assertNotIn(key, lazy.__dict__)
+        self.assertEqual(lazy.status.current().state, loaded.status.current().state)
+        self.assertNotIn('config', lazy.__dict__)
+        self.assertEqual(lazy.builder.name, loaded.builder.name)
+        for key in set(loaded.__dict__.keys()) - {'_attrs', '_lazy', 'builder'}:
+            self.assertEqual(getattr(lazy, key), getattr(loaded, key),
+                             msg="Mismatch for lazy key {}.".format(key))
+        with self.assertRaises(AttributeError):
+            lazy.not_an_attribute
+
+        # Older tests (and any with a bad JSON config) fall back to the YAML config.
+        json_config = TestRun._load_config(orig.path)
+        (orig.path/TestRun.CONFIG_JSON_FN).write_text('{"version": 0}')
+        self.assertEqual(TestRun._load_config(orig.path), json_config)
+        (orig.path/TestRun.CONFIG_JSON_FN).unlink()
+        self.assertEqual(TestRun.load(self.pav_cfg, orig.working_dir, orig.id).config,
+                         orig.config)
+
     def test_run(self):
         """Perform basic create test on the test run object."""
         config1 = {
@@ -124,6 +150,81 @@ class TestRunTests(PavTestCase):
                                msg="Test should have failed due to timeout."):
             test.run()
 
+    def test_summary(self):
+        """The attributes of complete tests should summarize everything about them."""
+
+        test = self._quick_test()
+        incomplete = self._quick_test(build=False, finalize=False)
+
+        test.status.set(STATES.COMPLETE, "All done.")
+        test.set_run_complete()
+
+        # None of the other files are needed once the test is complete.
+        complete_time = test.complete_time
+        (test.path/TestRun.COMPLETE_FN).unlink()
+        test.status.set(STATES.RUNNING, "Not really.")
+
+        attrs = TestAttributes(test.path)
+        self.assertTrue(attrs.complete)
+        self.assertEqual(attrs.complete_time, complete_time)
+        self.assertEqual(attrs.state, STATES.COMPLETE)
+        self.assertIn(STATES.CREATED, attrs.states)
+        self.assertNotIn(STATES.RUNNING, attrs.states)
+        self.assertEqual(test_run_attr_transform(test.path)['state'], STATES.COMPLETE)
+
+        # Incomplete tests still get their state from the status file.
+        attrs = TestAttributes(incomplete.path)
+        self.assertFalse(attrs.complete)
+        self.assertIsNone(attrs.states)
+        incomplete.status.set(STATES.RUNNING, "Running now.")
+        self.assertEqual(test_run_attr_transform(incomplete.path)['state'],
+                         STATES.RUNNING)
+
+    def test_mass_status_update(self):
+        """Mass status updates should finish all their writes before returning,
+        and report the tests that couldn't be updated."""
+
+        tests = [self._quick_test(build=False, finalize=False) for _ in range(5)]
+
+        # Break one test's status file.
+        bad_test = tests[2]
+        bad_test.status.path.unlink()
+        bad_test.status.path.mkdir()
+
+        # Each status file should be synced exactly once.
+        synced = []
+        orig_fsync = os.fsync
+
+        def fsync(fd):
+            synced.append(os.readlink('/proc/self/fd/{}'.format(fd)))
+            orig_fsync(fd)
+
+        orig_batch_size = test_run_utils.STATUS_BATCH_SIZE
+        test_run_utils.STATUS_BATCH_SIZE = 2
+        os.fsync = fsync
+        try:
+            updates = mass_status_update(tests, STATES.SCHED_ERROR, "Sched error.",
+                                         set_complete=True, max_threads=4)
+        finally:
+            os.fsync = orig_fsync
+            test_run_utils.STATUS_BATCH_SIZE = orig_batch_size
+
+        self.assertEqual(
+            sorted(synced),
+            sorted(str(test.status.path.resolve()) for test in tests if test is not bad_test))
+        self.assertEqual(updates.updated, 4)
+        self.assertEqual(list(updates.failed.keys()), [bad_test.full_id])
+        self.assertGreater(updates.duration, 0)
+
+        for test in tests:
+            if test is bad_test:
+                self.assertFalse(test.complete)
+                continue
+            self.assertTrue(test.complete)
+            current = TestAttributes(test.path).state
+            self.assertEqual(current, STATES.SCHED_ERROR)
+            self.assertEqual(test.status.current().note, "Sched error.")
+
     def test_create_file(self):
         """Ensure runtime file creation is working correctly."""
 
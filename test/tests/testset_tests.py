@@ -1,5 +1,9 @@
 """Tests for the test_set module."""
 
+import copy
+
+from pavilion import build_times
+from pavilion.resolver import TestConfigResolver
 from pavilion.series.test_set import TestSet
 from pavilion.errors import TestSetError
 from pavilion.unittest import PavTestCase
@@ -62,6 +66,33 @@ class TestSetTests(PavTestCase):
         with self.assertRaises(TestSetError):
             ts3.make()
 
+    def test_make_closes_resolver(self):
+        """The resolver's worker pool should be shut down however test creation
+        ends."""
+
+        closed = []
+        orig_close = TestConfigResolver.close
+
+        def close(resolver):
+            closed.append(resolver)
+            orig_close(resolver)
+
+        TestConfigResolver.close = close
+        try:
+            with self.assertRaises(TestSetError):
+                TestSet(self.pav_cfg, "test_close1", ['invalid']).make()
+            self.assertEqual(len(closed), 1)
+
+            # Abandoning the iterator part way through.
+            ts2 = TestSet(self.pav_cfg, "test_close2", ['build_parallel']*2,
+                          simultaneous=8)
+            tests_iter = ts2.make_iter()
+            next(tests_iter)
+            tests_iter.close()
+            self.assertEqual(len(closed), 2)
+        finally:
+            TestConfigResolver.close = orig_close
+
     def test_make_iter(self):
         """Check that test creation batching works."""
 
@@ -74,8 +105,12 @@ class TestSetTests(PavTestCase):
         # Make sure we make batches of half the simultanious limit.
         for batch in ts2.make_iter():
             self.assertEqual(len(batch), sizes.pop(0))
+            # Tests are made in parallel, but are still in order.
+            ids = [test.id for test in batch]
+            self.assertEqual(ids, sorted(ids))
 
         self.assertFalse(sizes)
+        self.assertEqual(ts2.tests, sorted(ts2.tests, key=lambda test: test.id))
 
 
     def test_build(self):
@@ -96,6 +131,46 @@ class TestSetTests(PavTestCase):
         ts3.make()
         ts3.build()
 
+    def test_build_order(self):
+        """Each unique build should only be built once, the longest builds should
+        go first, and build times should be recorded."""
+
+        ts1 = TestSet(self.pav_cfg, "test_build_order1", ['pass_fail']*2)
+        ts1.make(rebuild=True)
+        ts1.build()
+
+        times = build_times.load(self.pav_cfg)
+        builders = {}
+        for test in ts1.tests:
+            if test.builder.build_duration is not None:
+                self.assertNotIn(test.builder.name, builders)
+                builders[test.builder.name] = test
+                self.assertEqual(times.estimate(test.builder.build_hash, test.name),
+                                 test.builder.build_duration)
+        self.assertEqual(set(builders), set(test.builder.name for test in ts1.tests))
+
+        # With one build at a time, the build that took longest before goes first.
+        pav_cfg = copy.deepcopy(self.pav_cfg)
+        pav_cfg.build_threads = 1
+        ts2 = TestSet(pav_cfg, "test_build_order2", ['build_parallel.local*'])
+        tests = {test.name: test for test in ts2.make()}
+        local1 = tests['build_parallel.local1']
+        local2 = tests['build_parallel.local2']
+
+        times = build_times.load(pav_cfg)
+        times.record(local1.builder.build_hash, local1.name, 1)
+        times.record(local2.builder.build_hash, local2.name, 100)
+        times.save()
+
+        ts2.build()
+
+        def build_start(test):
+            """When the test's build started."""
+            return min(status.when for status in test.status.history()
+                       if status.state == 'BUILDING')
+
+        self.assertLess(build_start(local2), build_start(local1))
+
     def test_rebuild(self):
         """Check that rebuilds are handled properly."""
 
@@ -4,6 +4,7 @@ import datetime as dt
 import subprocess as sp
 import getpass
 import os
+import shutil
 import tempfile
 from pathlib import Path
 
@@ -139,3 +140,86 @@ class UtilsTests(unittest.PavTestCase):
                     self.assertFalse(Path(os.readlink(str(path))).is_absolute())
                 with path.open() as file:
                     self.assertEqual(file.read(), answer)
+
+    def test_walk_tree(self):
+        """Check the parallel tree walker, and the copytree built on it."""
+
+        tmpdir = Path(tempfile.mkdtemp())
+        try:
+            src = tmpdir/'src'
+            paths = set()
+            for i in range(5):
+                for j in range(5):
+                    sub_dir = src/'d{}'.format(i)/'e{}'.format(j)
+                    sub_dir.mkdir(parents=True)
+                    paths.add(sub_dir.parent)
+                    paths.add(sub_dir)
+                    for k in range(3):
+                        (sub_dir/'f{}'.format(k)).write_text('{} {} {}'.format(i, j, k))
+                        paths.add(sub_dir/'f{}'.format(k))
+            (src/'link').symlink_to('d1')
+            (src/'broken').symlink_to('nowhere')
+            paths.add(src/'link')
+            paths.add(src/'broken')
+
+            entries = utils.walk_tree(src)
+            self.assertEqual({Path(entry.path) for entry in entries}, paths)
+            for entry in entries:
+                self.assertEqual(entry.is_link, entry.name in ('link', 'broken'))
+                self.assertEqual(entry.is_dir, Path(entry.path).is_dir()
+                                 and not entry.is_link)
+
+            # Following symlinks walks the linked directory too.
+            entries = utils.walk_tree(src, follow_symlinks=True)
+            self.assertEqual(len(entries), len(paths) + 5 + 5*3)
+
+            # The directory callback can limit the walk.
+            entries = utils.walk_tree(
+                src, lambda path, ents: [ent.name for ent in ents if ent.name == 'd0'])
+            self.assertEqual(len(entries), 7 + 5)
+
+            dst = tmpdir/'dst'
+            os.utime(str(src/'d2'), (1000, 1000))
+            utils.copytree(str(src), str(dst), symlinks=True)
+            for path in paths:
+                copy = dst/path.relative_to(src)
+                if path.is_symlink():
+                    self.assertEqual(os.readlink(str(copy)), os.readlink(str(path)))
+                elif path.is_file():
+                    self.assertEqual(copy.read_text(), path.read_text())
+                else:
+                    self.assertTrue(copy.is_dir())
+            # Directory stats are copied after their contents.
+            self.assertEqual((dst/'d2').stat().st_mtime, 1000)
+
+            # Broken links are errors when following links, unless ignored.
+            with self.assertRaises(shutil.Error):
+                utils.copytree(str(src), str(tmpdir/'dst2'))
+            utils.copytree(str(src), str(tmpdir/'dst3'), ignore_dangling_symlinks=True,
+                           ignore=shutil.ignore_patterns('e4'))
+            self.assertTrue((tmpdir/'dst3'/'link'/'e0'/'f0').is_file())
+            self.assertFalse((tmpdir/'dst3'/'link').is_symlink())
+            self.assertFalse((tmpdir/'dst3'/'d0'/'e4').exists())
+            self.assertFalse((tmpdir/'dst3'/'broken').exists())
+
+            # Directories that can't be scanned are copy errors too, and don't stop
+            # the rest of the copy.
+            src2 = tmpdir/'src2'
+            utils.copytree(str(src), str(src2), symlinks=True)
+
+            def remove_d3(path, names):
+                if path == str(src2):
+                    shutil.rmtree(str(src2/'d3'))
+                return set()
+
+            scan_errors = []
+            utils.walk_tree(src2, on_error=lambda path, err: scan_errors.append(path))
+            self.assertEqual(scan_errors, [])
+            with self.assertRaises(shutil.Error) as context:
+                utils.copytree(str(src2), str(tmpdir/'dst4'), symlinks=True,
+                               ignore=remove_d3)
+            self.assertEqual({error[0] for error in context.exception.args[0]},
+                             {str(src2/'d3')})
+            self.assertTrue((tmpdir/'dst4'/'d4'/'e4'/'f2').is_file())
+        finally:
+            shutil.rmtree(str(tmpdir))
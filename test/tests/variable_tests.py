@@ -279,3 +279,38 @@ class TestVariables(PavTestCase):
             self.assertIn(values, answers)
 
 
+
+    def test_permutation_copies(self):
+        """Permutations share unchanged variables with their parent, but changing
+        them shouldn't affect anything else."""
+
+        var_man = variables.VariableSetManager()
+        var_man.add_var_set('var', {
+            'a': ['1', '2', '3'],
+            'b': ['{{a}}-{{c}}'],
+            'c': ['x', 'y'],
+        })
+        var_man.resolve_references(partial=True, skip_deps=['a'])
+
+        perms = var_man.iter_permutations([('var', 'a')])
+        first = next(perms)
+        # Nothing has changed, so the lists are shared.
+        self.assertIs(first.variable_sets['var'].data['b'],
+                      var_man.variable_sets['var'].data['b'])
+
+        rest = list(perms)
+        self.assertEqual(len(rest), 2)
+
+        first.resolve_references()
+        self.assertEqual(first['var.b'], '1-x')
+        # Now they aren't.
+        self.assertIsNot(first.variable_sets['var'].data['b'],
+                         var_man.variable_sets['var'].data['b'])
+        for perm in rest:
+            self.assertEqual(perm['var.b'], '{{a}}-{{c}}')
+        self.assertEqual(var_man['var.b'], '{{a}}-{{c}}')
+
+        rest[1].resolve_references()
+        self.assertEqual(rest[1]['var.b'], '3-x')
+        self.assertEqual(first['var.b'], '1-x')
+        self.assertEqual([perm['var.a'] for perm in [first] + rest], ['1', '2', '3'])
@@ -0,0 +1,91 @@
+"""
+Test config load benchmark.
+
+Usage: python3 config_load_bench.py [num_runs] [test_run_dir]
+
+Compares how long it takes to load the saved configs of many test runs from
+the YAML config file versus the JSON config file. If an existing test run
+directory is given, its config is used for every run. Otherwise a moderately
+sized sample config is used. Runs default to 1000.
+"""
+
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+libdir = (Path(__file__).resolve().parents[2]/'lib').as_posix()
+sys.path.append(libdir)
+
+import yc_yaml as yaml
+from pavilion.test_run import TestRun
+
+if '--help' in sys.argv or '-h' in sys.argv:
+    print(__doc__)
+    sys.exit(1)
+
+num_runs = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+if len(sys.argv) > 2:
+    config = TestRun._load_config(Path(sys.argv[2]))
+else:
+    config = {
+        'name': 'bench',
+        'suite': 'bench_suite',
+        'scheduler': 'slurm',
+        'variables': {
+            'nodes': ['1', '2', '4', '8'],
+            'compilers': [{'name': 'gcc', 'version': '12.2.0'},
+                          {'name': 'intel', 'version': '2023.1'}],
+        },
+        'schedule': {'nodes': '4', 'tasks_per_node': 'all', 'partition': 'standard'},
+        'build': {
+            'source_path': 'bench.tgz',
+            'modules': ['gcc/12.2.0', 'openmpi'],
+            'env': {'CC': 'mpicc', 'CFLAGS': '-O3 -march=native'},
+            'cmds': ['./configure --prefix=$(pwd)/install', 'make -j 8', 'make install'],
+        },
+        'run': {
+            'modules': ['gcc/12.2.0', 'openmpi'],
+            'env': {'OMP_NUM_THREADS': '4'},
+            'cmds': ['srun -N 4 ./bench {}'.format(i) for i in range(20)],
+        },
+        'result_parse': {
+            'regex': {'gflops': {'regex': r'GFLOPS:\s+(\d+\.\d+)', 'action': 'store'}},
+        },
+        'result_evaluate': {'perf': 'gflops > 100'},
+    }
+
+tmp_dir = Path(tempfile.mkdtemp())
+try:
+    paths = []
+    for i in range(num_runs):
+        path = tmp_dir/str(i)
+        path.mkdir()
+        with (path/'config').open('w') as config_file:
+            yaml.dump(config, config_file)
+        paths.append(path)
+
+    start = time.time()
+    for path in paths:
+        TestRun._load_config(path)
+    yaml_time = time.time() - start
+
+    for path in paths:
+        # Use the test run's own writer, so the format matches exactly.
+        fake_run = TestRun.__new__(TestRun)
+        fake_run.path = path
+        fake_run._save_config_json(config)
+
+    start = time.time()
+    for path in paths:
+        TestRun._load_config(path)
+    json_time = time.time() - start
+
+    print("Loaded {} test configs.".format(num_runs))
+    print("  YAML: {:0.3f}s".format(yaml_time))
+    print("  JSON: {:0.3f}s ({:0.1f}x faster)"
+          .format(json_time, yaml_time/max(json_time, 1e-9)))
+finally:
+    shutil.rmtree(tmp_dir.as_posix())
@@ -0,0 +1,97 @@
+"""
+Build tree operation benchmark.
+
+Usage: python3 tree_walk_bench.py [num_files] [files_per_dir]
+
+Builds a synthetic source tree (100,000 files by default, 100 per directory),
+then times copying it and fixing its build permissions the old, serial way
+(os.walk, shutil.copytree) against the parallel tree walker in pavilion.utils.
+The walker mostly hides per-file latency, so expect the biggest gains on parallel
+or network filesystems; run it from a directory on one by setting TMPDIR.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+libdir = (Path(__file__).resolve().parents[2]/'lib').as_posix()
+sys.path.append(libdir)
+
+from pavilion import utils
+from pavilion.builder import TestBuilder
+
+if '--help' in sys.argv or '-h' in sys.argv:
+    print(__doc__)
+    sys.exit(1)
+
+num_files = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+files_per_dir = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+
+def serial_fix_perms(root_path: Path):
+    """The os.walk based permission fixer that the builder used to use."""
+
+    for path, _, files in os.walk(root_path.as_posix()):
+        path = Path(path)
+        for file in files:
+            file_path = path/file
+            file_path.chmod(file_path.stat().st_mode & ~0o222)
+
+        path_mode = path.stat().st_mode
+        if (path_mode & 0o220) != 0o220:
+            path.chmod(path_mode | 0o220)
+
+
+def reset_perms(root_path: Path):
+    """Make everything writable again, so the next fixer has work to do."""
+
+    for path, _, files in os.walk(root_path.as_posix()):
+        for file in files:
+            os.chmod(os.path.join(path, file), 0o664)
+
+
+def timed(func, *args, **kwargs) -> float:
+    """Return how long the function call took."""
+
+    start = time.time()
+    func(*args, **kwargs)
+    return time.time() - start
+
+
+tmp_dir = Path(tempfile.mkdtemp())
+try:
+    src = tmp_dir/'src'
+    for i in range(num_files):
+        sub_dir = src/'d{}'.format(i // (files_per_dir*10))/'e{}'.format(i // files_per_dir)
+        if i % files_per_dir == 0:
+            sub_dir.mkdir(parents=True)
+        (sub_dir/'f{}'.format(i)).write_text(str(i))
+
+    copy_kwargs = {'copy_function': shutil.copyfile, 'symlinks': True}
+
+    serial_copy = timed(shutil.copytree, src.as_posix(), (tmp_dir/'serial').as_posix(),
+                        **copy_kwargs)
+    parallel_copy = timed(utils.copytree, src.as_posix(), (tmp_dir/'parallel').as_posix(),
+                          **copy_kwargs)
+
+    reset_perms(src)
+    serial_perms = timed(serial_fix_perms, src)
+    reset_perms(src)
+    # The fixer doesn't use any builder state.
+    parallel_perms = timed(TestBuilder._fix_build_permissions, None, src)
+
+    print("Tree of {} files, {} per directory ({} walker threads).".format(
+        num_files, files_per_dir, utils.WALK_THREADS))
+    print("  Copy (serial):     {:0.3f}s".format(serial_copy))
+    print("  Copy (parallel):   {:0.3f}s ({:0.1f}x faster)"
+          .format(parallel_copy, serial_copy/max(parallel_copy, 1e-9)))
+    print("  Perms (serial):    {:0.3f}s".format(serial_perms))
+    print("  Perms (parallel):  {:0.3f}s ({:0.1f}x faster)"
+          .format(parallel_perms, serial_perms/max(parallel_perms, 1e-9)))
+finally:
+    for path, _, _ in os.walk(tmp_dir.as_posix()):
+        os.chmod(path, 0o775)
+    shutil.rmtree(tmp_dir.as_posix())